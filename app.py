@@ -1,218 +1,414 @@
 import os
+import sys
+import hmac
 import logging
+import time
+import threading
 import uuid  # NEW: Import uuid to generate unique room IDs
-import pandas as pd
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash
+from flask import Flask, Response, abort, render_template, request, redirect, url_for, jsonify, flash, g
 from flask_socketio import SocketIO, join_room, emit
-
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-app = Flask(__name__)
+from socketio import PubSubManager
+from room_store import create_room_store
+from room_manager import RoomManager, RoomMoved
+from room_commands import RoomCommands
+from timing_wheel import TimingWheel
+from round_timers import RoomTimers
+from question_bank import (DEFAULT_QUESTIONS_FILE, get_question_bank, installed_banks, load_question_bank,
+                           start_question_bank_watcher, when_loaded)
+from bank_store import BankStore, UploadTooLarge
+import offload
+from game_state import GameState
+from game_log import GameLog
+import game_actions
+from game_actions import ActionResult, REQUIRED_QUESTION_COUNT
+from state_protocol import build_state_payload, diff_state, RoomSnapshot, make_packet
+from spectators import SpectatorBroadcaster, spectator_room
+from assets import AssetManifest
+import metrics
+from metrics import log_event
+
+logging.basicConfig(level=os.environ.get('FEUD_LOG_LEVEL', 'INFO'), format='%(asctime)s - %(levelname)s - %(message)s')
+# static/ is served by static_asset below, under content-hashed URLs.
+app = Flask(__name__, static_folder=None)
 app.secret_key = 'your_secret_key_here'
-socketio = SocketIO(app)
-
-MAX_ANSWERS = 10
-REQUIRED_QUESTION_COUNT = 4
-EXCEL_REQUIRED_COLUMNS = [
-    'Question Number', 'Survey Question',
-    'Answer 1', 'Answer 1 points',
-    'Answer 2', 'Answer 2 points',
-    'Answer 3', 'Answer 3 points',
-    'Answer 4', 'Answer 4 points',
-    'Answer 5', 'Answer 5 points',
-    'Answer 6', 'Answer 6 points',
-    'Answer 7', 'Answer 7 points',
-    'Answer 8', 'Answer 8 points',
-    'Answer 9', 'Answer 9 points',
-    'Answer 10', 'Answer 10 points'
-]
-
-# Dictionary to hold a separate GameState per room.
-room_game_states = {}
-
-class GameState:
-    def __init__(self):
-        self.all_questions = []
-        self.chosen_questions = []
-        self.current_question_index = -1
-        self.team1_name = ""
-        self.team2_name = ""
-        self.team1_score = 0
-        self.team2_score = 0
-        self.faceoff_winner = None
-        self.current_control_team = None
-        self.is_steal_attempt = False
-        self.answers_revealed = []
-        self.team_in_play_strikes = 0
-        self.current_question = None
-        self.question_shown_to_contestants = False
-        self.faceoff_done = False
-
-    def load_questions_from_excel(self, file_path: str) -> int:
-        logging.info(f"Loading questions from {file_path}")
-        df = pd.read_excel(file_path)
-        for col in EXCEL_REQUIRED_COLUMNS:
-            if col not in df.columns:
-                error_msg = f"Missing required column: {col}"
-                logging.error(error_msg)
-                raise ValueError(error_msg)
-        self.all_questions = []
-        for _, row in df.iterrows():
-            q_data = {
-                'question_number': row.get('Question Number', None),
-                'question': row.get('Survey Question', ''),
-                'answers': []
-            }
-            for i in range(1, MAX_ANSWERS + 1):
-                ans_col = f'Answer {i}'
-                pts_col = f'Answer {i} points'
-                ans_val = row.get(ans_col)
-                pts_val = row.get(pts_col)
-                if pd.notna(ans_val) and pd.notna(pts_val):
-                    try:
-                        q_data['answers'].append((str(ans_val), int(pts_val)))
-                    except ValueError:
-                        logging.warning(f"Invalid points value for question {q_data['question_number']} answer {i}")
-                        break
-                else:
-                    break
-            self.all_questions.append(q_data)
-        logging.info(f"Loaded {len(self.all_questions)} questions.")
-        return len(self.all_questions)
-
-    def set_round_questions_and_teams(self, chosen_indices, team1_name, team2_name):
-        logging.info(f"Setting round with question indices: {chosen_indices}")
-        self.chosen_questions = [self.all_questions[int(i)] for i in chosen_indices]
-        self.team1_name = team1_name.strip()
-        self.team2_name = team2_name.strip()
-        self.team1_score = 0
-        self.team2_score = 0
-        self.current_question_index = -1
-        self.current_question = None
-        self.faceoff_done = False
-
-    def start_next_question(self):
-        self.current_question_index += 1
-        if self.current_question_index >= len(self.chosen_questions):
-            logging.info("No more questions left.")
-            self.current_question = None
-            return False
-        self.current_question = self.chosen_questions[self.current_question_index]
-        self.answers_revealed = [False] * len(self.current_question['answers'])
-        self.faceoff_winner = None
-        self.current_control_team = None
-        self.is_steal_attempt = False
-        self.team_in_play_strikes = 0
-        self.question_shown_to_contestants = False
-        self.faceoff_done = False
-        logging.info(f"Starting question: {self.current_question['question']}")
-        return True
-
-    def get_current_question_text(self):
-        return self.current_question['question'] if self.current_question else ""
-
-    def get_team_name(self, team_num):
-        return self.team1_name if team_num == 1 else self.team2_name
-
-    def set_faceoff_winner(self, winner_team):
-        self.faceoff_winner = int(winner_team)
-        logging.info(f"Face-off winner set to Team {self.faceoff_winner}")
-
-    def apply_play_pass(self, play):
-        if self.faceoff_winner is None:
-            raise RuntimeError("Face-off winner not set")
-        self.current_control_team = self.faceoff_winner if play else (2 if self.faceoff_winner == 1 else 1)
-        logging.info(f"Play/Pass applied. Current control team: {self.current_control_team}")
-
-    def reveal_answer_by_index(self, index):
-        if index < 0 or index >= len(self.answers_revealed):
-            logging.error("Invalid index in reveal_answer_by_index")
-            return
-        if not self.answers_revealed[index]:
-            self.answers_revealed[index] = True
-            logging.info(f"Answer revealed at index {index}: {self.current_question['answers'][index][0]}")
-
-    def add_strike(self):
-        self.team_in_play_strikes += 1
-        logging.info(f"Strike added. Total strikes: {self.team_in_play_strikes}")
-        return self.team_in_play_strikes
-
-    def enable_steal_attempt(self):
-        self.is_steal_attempt = True
-        logging.info("Steal attempt enabled.")
-
-    def check_all_answers_revealed(self):
-        return all(self.answers_revealed)
-
-    def award_points(self, team_num):
-        total = 0
-        for (answer, pts), revealed in zip(self.current_question['answers'], self.answers_revealed):
-            if revealed:
-                total += pts
-        if team_num == 1:
-            self.team1_score += total
-        else:
-            self.team2_score += total
-        logging.info(f"Awarded {total} points to Team {team_num}")
-        return total
-
-    def steal_successful(self):
-        stealing_team = 1 if self.current_control_team == 2 else 2
-        logging.info(f"Steal successful. Team {stealing_team} gets points.")
-        return stealing_team
-
-    def scores(self):
-        return self.team1_score, self.team2_score
-
-    def set_scores(self, t1, t2):
-        self.team1_score = t1
-        self.team2_score = t2
-        logging.info(f"Scores manually set: Team1 - {t1}, Team2 - {t2}")
+# Set FEUD_REDIS_URL to share rooms and Socket.IO broadcasts between several workers.
+REDIS_URL = os.environ.get('FEUD_REDIS_URL')
+socketio = SocketIO(app, message_queue=REDIS_URL)
+
+def write_unbuffered(wsgi_app):
+    # eventlet's server holds back response writes until 4 KB have accumulated, which would
+    # stall small streamed events (see /api/spectate). Set outside Flask-SocketIO's
+    # middleware, which hands Flask a copy of the environ.
+    def middleware(environ, start_response):
+        environ['eventlet.minimum_write_chunk_size'] = 0
+        return wsgi_app(environ, start_response)
+    return middleware
+
+app.wsgi_app = write_unbuffered(app.wsgi_app)
+# Requests waiting on a question-bank parse yield to other sockets while they wait.
+offload.set_sleep(socketio.sleep)
+# Room lifecycle: rooms idle this long are evicted, and at most this many stay live.
+ROOM_IDLE_TTL = int(os.environ.get('FEUD_ROOM_IDLE_TTL', 6 * 3600))
+MAX_LIVE_ROOMS = int(os.environ.get('FEUD_MAX_ROOMS', 1000))
+ROOM_SWEEP_INTERVAL = 60
+# If set, evicted rooms are saved here and restored on their next access.
+ROOM_SNAPSHOT_DIR = os.environ.get('FEUD_ROOM_SNAPSHOT_DIR')
+# Seconds between checks of the question files for changes.
+QUESTION_POLL_INTERVAL = float(os.environ.get('FEUD_QUESTION_POLL', 2))
+# If set (and FEUD_REDIS_URL is not), rooms are persisted to this SQLite file and survive restarts.
+SQLITE_PATH = os.environ.get('FEUD_SQLITE_PATH')
+# If set, every room's actions are logged here so a crashed worker can recover its games.
+EVENT_LOG_DIR = os.environ.get('FEUD_EVENT_LOG_DIR')
+# Uploaded question banks are kept here; uploads are disabled unless FEUD_ADMIN_TOKEN is set.
+BANK_DIR = os.environ.get('FEUD_BANK_DIR', 'question_banks')
+ADMIN_TOKEN = os.environ.get('FEUD_ADMIN_TOKEN')
+MAX_UPLOAD_BYTES = int(os.environ.get('FEUD_MAX_UPLOAD_MB', 20)) * 1024 * 1024
+# Leaves room for the multipart framing around the file itself.
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 64 * 1024
+# Spectators get at most one state message per room in this many seconds.
+SPECTATOR_INTERVAL = float(os.environ.get('FEUD_SPECTATOR_INTERVAL', 0.05))
+SSE_KEEPALIVE_INTERVAL = 15
+# Set by shard_router.py for the workers it starts; enables the /_shard room migration endpoints.
+SHARD_TOKEN = os.environ.get('FEUD_SHARD_TOKEN')
+# Round clock lengths in seconds, and how often a running clock pushes its remaining time.
+TIMER_DURATIONS = {
+    'answer': float(os.environ.get('FEUD_ANSWER_SECONDS', 20)),
+    'steal': float(os.environ.get('FEUD_STEAL_SECONDS', 10)),
+    'fast_money': float(os.environ.get('FEUD_FAST_MONEY_SECONDS', 20)),
+}
+TIMER_TICK_INTERVAL = float(os.environ.get('FEUD_TIMER_TICK', 1.0))
+TIMER_WHEEL_TICK = 0.05
 
 # NEW: Function to generate a new room ID automatically.
 def generate_room_id():
     return str(uuid.uuid4())
 
+def new_game_state():
+    state = GameState()
+    # Never wait for a parse here; the room shows "loading" until the bank is ready.
+    state.load_questions_from_excel(DEFAULT_QUESTIONS_FILE, block=False)
+    return state
+
+def forget_room(room_id):
+    with room_snapshots_lock:
+        room_snapshots.pop(room_id, None)
+    game_log.forget(room_id)
+    spectators.forget(room_id)
+    room_commands.forget(room_id)
+    room_timers.stop(room_id, notify=False)
+
+# Action history per room, for undo/redo and crash recovery.
+game_log = GameLog(GameState.from_dict, log_dir=EVENT_LOG_DIR)
+
+bank_store = BankStore(BANK_DIR, MAX_UPLOAD_BYTES)
+# Rooms choose uploaded banks by id; only files in the store can be chosen.
+game_actions.set_bank_resolver(bank_store.path_for)
+
+# Holds a separate GameState per room.
+room_store = create_room_store(REDIS_URL, state_factory=GameState.from_dict, room_ttl=ROOM_IDLE_TTL,
+                               sqlite_path=SQLITE_PATH)
+room_manager = RoomManager(room_store, GameState.from_dict, new_game_state,
+                           idle_ttl=ROOM_IDLE_TTL, max_rooms=MAX_LIVE_ROOMS,
+                           snapshot_dir=ROOM_SNAPSHOT_DIR, on_evict=forget_room,
+                           recover=game_log.recover)
+
 def get_game_state_for_room(room_id):
-    if room_id not in room_game_states:
-        room_game_states[room_id] = GameState()
-        if os.path.exists("ff_questions.xlsx"):
-            try:
-                room_game_states[room_id].load_questions_from_excel("ff_questions.xlsx")
-            except Exception as e:
-                logging.error("Error loading questions: " + str(e))
+    state = room_manager.get(room_id)
+    state.refresh_loading_bank()
+    return state
+
+# Mutations of one room run one at a time; different rooms run side by side.
+room_commands = RoomCommands(event_factory=socketio.server.eio.create_event)
+
+def _perform_action(room, name, params):
+    state = get_game_state_for_room(room)
+    if name in TIMER_ACTIONS:
+        # Clocks are not game state, so they are neither logged nor undone.
+        return TIMER_ACTIONS[name](room, params)
+    if name == 'undo':
+        result = game_log.undo(room, state)
+    elif name == 'redo':
+        result = game_log.redo(room, state)
+    else:
+        result = game_log.perform(room, state, name, params)
+    if result.ok:
+        update_round_timer(room, state, name)
+    broadcast_state(room)
+    return result
+
+def perform_action(room, name, params, key=None):
+    """Run a moderator action (or undo/redo) on a room, record it in the game log and broadcast it.
+
+    The action waits for the room's earlier commands. A ``key`` already used
+    for this room returns the earlier attempt's result without running again.
+    """
+    return room_commands.run(room, lambda: _perform_action(room, name, params), key=key)
+
+def start_timer(room, params):
+    try:
+        msg = room_timers.start(room, params.get('kind') or 'answer', params.get('seconds'))
+    except (TypeError, ValueError) as e:
+        return ActionResult.failed(str(e))
+    return ActionResult().add('info', f"{msg['kind'].replace('_', ' ').capitalize()} clock started: "
+                                      f"{msg['duration']:g} seconds.")
+
+def stop_timer(room, params):
+    room_timers.stop(room)
+    return ActionResult().add('info', "Clock stopped.")
+
+TIMER_ACTIONS = {'start_timer': start_timer, 'stop_timer': stop_timer}
+
+# What a game action does to the room's clock. A new question, a finished
+# round, undo and redo stop it. While the answer clock is in use, every reveal
+# or strike gives the next answer a fresh clock, and the third strike switches
+# to the steal clock.
+TIMER_STOPPING_ACTIONS = ('setup_round', 'start', 'steal_success', 'steal_failed', 'undo', 'redo')
+
+def update_round_timer(room, state, name):
+    clock = room_timers.current(room)
+    if clock is None:
+        return
+    if name in TIMER_STOPPING_ACTIONS:
+        room_timers.stop(room)
+    elif name in ('reveal', 'strike') and clock.kind == 'answer':
+        if state.is_steal_attempt:
+            room_timers.start(room, 'steal')
+        elif state.current_question is None or state.check_all_answers_revealed():
+            room_timers.stop(room)
         else:
-            logging.error("ff_questions.xlsx not found.")
-    return room_game_states[room_id]
+            room_timers.start(room, 'answer')
+
+# Which action a clock running out stands for: an answer that didn't come is a
+# strike, a steal that didn't come fails. The Fast Money clock only shows it ran out.
+TIMER_EXPIRY_ACTIONS = {'answer': 'strike', 'steal': 'steal_failed'}
+
+def expire_timer(room, clock):
+    def run():
+        if not room_timers.is_current(room, clock):
+            return None  # stopped or restarted while this waited its turn
+        metrics.timer_expiries.inc(clock.kind)
+        log_event('timer_expired', room=room, kind=clock.kind)
+        action = TIMER_EXPIRY_ACTIONS.get(clock.kind)
+        return _perform_action(room, action, {}) if action else None
+    try:
+        room_commands.run(room, run)
+    except Exception:
+        logging.exception(f"Timer expiry failed in room {room}")
+
+def send_timer(room, pkt):
+    send_packet(pkt, room=room)
+    spectators.push(room, pkt)
+
+# One wheel drives every room's clock; see round_timers.
+timer_wheel = TimingWheel(tick=TIMER_WHEEL_TICK)
+room_timers = RoomTimers(timer_wheel, send_timer, expire_timer, TIMER_DURATIONS,
+                         tick_interval=TIMER_TICK_INTERVAL, spawn=socketio.start_background_task)
+
+# Everything a moderator can do, by event name.
+ROOM_ACTIONS = list(game_actions.ACTIONS) + ['undo', 'redo'] + list(TIMER_ACTIONS)
+
+BANK_ANNOUNCE_INTERVAL = 0.5
+
+def announce_question_banks(seen):
+    """Tell every socket about question banks that finished loading since the last call."""
+    for path, version in installed_banks():
+        if seen.get(path) != version:
+            seen[path] = version
+            send_packet(make_packet('question_bank_ready', {'version': version}))
+
+def announce_question_banks_forever():
+    seen = {}
+    while True:
+        socketio.sleep(BANK_ANNOUNCE_INTERVAL)
+        try:
+            announce_question_banks(seen)
+        except Exception:
+            logging.exception("Announcing question banks failed")
+
+def sweep_idle_rooms():
+    while True:
+        socketio.sleep(ROOM_SWEEP_INTERVAL)
+        try:
+            room_manager.sweep()
+        except Exception:
+            logging.exception("Room sweep failed")
+
+# Replaced by asgi_app.py when the async server owns the sockets.
+packet_sender = None
+
+def set_packet_sender(sender):
+    global packet_sender
+    packet_sender = sender
+
+def send_packet(pkt, room=None, sid=None):
+    if packet_sender is not None:
+        packet_sender(pkt, room=room, sid=sid)
+        return
+    server = socketio.server
+    if sid is not None:
+        server._send_packet(server.manager.eio_sid_from_sid(sid, '/'), pkt)
+        return
+    if isinstance(server.manager, PubSubManager):
+        # Go through the message queue so clients on other workers get it too.
+        socketio.emit(pkt.data[0], pkt.data[1], to=room)
+        return
+    if '/' not in server.manager.rooms:
+        return  # no client has ever connected
+    for _, eio_sid in server.manager.get_participants('/', room):
+        server._send_packet(eio_sid, pkt)
+
+def packet_size(pkt):
+    encoded = pkt.encode()
+    if isinstance(encoded, list):
+        return sum(len(part) for part in encoded)
+    return len(encoded)
+
+def emit_state(pkt, kind, room):
+    t0 = time.perf_counter()
+    send_packet(pkt, room=room)
+    metrics.broadcast_emit.observe(time.perf_counter() - t0, kind)
+    metrics.broadcast_bytes.observe(packet_size(pkt), kind)
+
+# Batches state changes for the read-only spectator channel.
+spectators = SpectatorBroadcaster(lambda pkt, room: send_packet(pkt, room=room), SPECTATOR_INTERVAL,
+                                  sleep=socketio.sleep)
+
+# Latest snapshot per room; also the baseline the next state_patch is diffed against.
+room_snapshots = {}
+room_snapshots_lock = threading.Lock()
 
 def broadcast_state(room):
+    """Commit the room's state, refresh its snapshot and push changes to clients. Returns the snapshot.
+
+    Snapshot versions are the room store's versions, so every worker agrees on
+    them. Only the worker that committed a change emits it.
+    """
+    t0 = time.perf_counter()
     state = get_game_state_for_room(room)
-    data = {
-        "question_shown": state.question_shown_to_contestants,
-        "current_question": {
-            "question": state.current_question['question'] if state.current_question and state.question_shown_to_contestants else "",
-            "answers": [
-                {"text": ans[0], "points": ans[1], "revealed": rev}
-                for ans, rev in zip(state.current_question['answers'], state.answers_revealed)
-            ]
-        } if state.current_question else None,
-        "team1_score": state.team1_score,
-        "team2_score": state.team2_score,
-        "team1_name": state.team1_name,
-        "team2_name": state.team2_name,
-        "current_control_team": state.current_control_team,
-        "strikes": state.team_in_play_strikes,
-        "is_steal_attempt": state.is_steal_attempt,
-        "current_question_index": state.current_question_index + 1,
-        "total_questions": len(state.chosen_questions)
-    }
-    socketio.emit('state_update', data, room=room)
+    version, changed = room_store.commit(room, state)
+    with room_snapshots_lock:
+        snap = room_snapshots.get(room)
+        if snap is not None and snap.version == version:
+            return snap
+        new_snap = room_snapshots[room] = RoomSnapshot(version, build_state_payload(state))
+        if changed:
+            if snap is not None and snap.version == version - 1:
+                changes = diff_state(snap.payload, new_snap.payload)
+                pkt, kind = make_packet('state_patch', {"version": version, "base": version - 1, "changes": changes}), 'patch'
+            else:
+                pkt, kind = new_snap.packet, 'full'
+            metrics.broadcast_build.observe(time.perf_counter() - t0)
+            emit_state(pkt, kind, room)
+            spectators.publish(room, new_snap)
+    return new_snap
+
+def snapshot_for_client(room, spectator):
+    snap = broadcast_state(room)
+    return spectators.snapshot_for(room, snap) if spectator else snap
+
+ROOM_MOVED_MESSAGE = "This room has moved to another server. Reload the page to reconnect."
 
 @socketio.on('join')
 def on_join(data):
     room = data.get('room', 'default')
-    join_room(room)
-    logging.info(f"Client joined room: {room}")
-    broadcast_state(room)
+    spectator = bool(data.get('spectator'))
+    try:
+        snap = snapshot_for_client(room, spectator)
+    except RoomMoved:
+        return  # the router is about to close this socket; it reconnects to the new worker
+    # Spectators only ever get the batched updates of their own channel.
+    join_room(spectator_room(room) if spectator else room)
+    log_event("client_joined", room=room, spectator=spectator)
+    # Only the new client needs the full snapshot; everyone else is already current.
+    send_packet(snap.packet, sid=request.sid)
+    timer_pkt = room_timers.packet(room)
+    if timer_pkt is not None:
+        send_packet(timer_pkt, sid=request.sid)
+
+@socketio.on('resync')
+def on_resync(data):
+    # Sent by a client that missed a patch (version gap).
+    try:
+        snap = snapshot_for_client(data.get('room', 'default'), bool(data.get('spectator')))
+    except RoomMoved:
+        return
+    send_packet(snap.packet, sid=request.sid)
+
+def register_socket_action(name):
+    def handler(data):
+        data = data or {}
+        room = data.get('room', 'default')
+        try:
+            with metrics.socket_action_duration.time(name):
+                result = perform_action(room, name, data, key=data.get('key'))
+                snap = broadcast_state(room)
+        except RoomMoved:
+            return dict(ActionResult.failed(ROOM_MOVED_MESSAGE).to_dict(), version=None)
+        metrics.socket_actions.inc(name, str(result.ok).lower())
+        # Returned to the client as the Socket.IO acknowledgement.
+        return dict(result.to_dict(), version=snap.version)
+    socketio.on_event(name, handler)
+
+# Moderator actions over the socket; the POST routes below remain as a fallback.
+for action_name in ROOM_ACTIONS:
+    register_socket_action(action_name)
+
+def room_socket_counts(manager):
+    """Connected sockets per room on this worker, for the feud_room_sockets gauge."""
+    rooms = manager.rooms.get('/', {})
+    # Every socket also sits in a room named after its own sid; leave those out.
+    return {(room,): len(sids) for room, sids in list(rooms.items()) if room is not None and room not in sids}
+
+def register_socket_gauges(manager):
+    metrics.REGISTRY.gauge('feud_connected_sockets', "Sockets connected to this worker.",
+                           lambda: len(manager.rooms.get('/', {}).get(None, ())))
+    metrics.REGISTRY.gauge('feud_room_sockets', "Sockets connected to this worker per room.",
+                           lambda: room_socket_counts(manager), ('room',))
+
+metrics.REGISTRY.gauge('feud_spectator_streams', "Server-Sent Events spectator streams open on this worker.",
+                       spectators.stream_count)
+metrics.REGISTRY.gauge('feud_running_timers', "Round clocks running on this worker.", room_timers.running_count)
+metrics.REGISTRY.gauge('feud_live_rooms', "Rooms held by this worker.", lambda: room_manager.stats()['live'])
+metrics.REGISTRY.gauge('feud_room_events', "Room lifecycle events since start.",
+                       lambda: {(k,): v for k, v in room_manager.stats().items() if k != 'live'}, ('event',))
+register_socket_gauges(socketio.server.manager)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        metrics.http_duration.observe(time.perf_counter() - started, endpoint)
+        metrics.http_requests.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+assets = AssetManifest(os.path.join(app.root_path, 'static'))
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = assets.url_name(values['filename'])
+
+@app.context_processor
+def asset_helpers():
+    return {'audio_sources': assets.audio_sources}
+
+@app.context_processor
+def action_key_helper():
+    # One key per rendered form; see room_commands.
+    return {'new_action_key': lambda: uuid.uuid4().hex}
+
+@app.route('/static/<path:filename>', endpoint='static')
+def static_asset(filename):
+    return assets.response(filename)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
 # Updated index route to generate a new room automatically if none is provided.
 @app.route('/')
@@ -235,183 +431,378 @@ def contestant():
     state = get_game_state_for_room(room)
     return render_template('contestant.html', state=state, room=room)
 
+@app.route('/spectator')
+def spectator():
+    # The contestant board, read-only on the spectator channel; ?sse=1 uses Server-Sent Events instead of Socket.IO.
+    room = request.args.get('room', 'default')
+    state = get_game_state_for_room(room)
+    return render_template('contestant.html', state=state, room=room, spectator=True,
+                           sse=request.args.get('sse') == '1')
+
+def open_spectator_stream(room):
+    """Register a spectator SSE stream, primed with the room's snapshot and running clock."""
+    stream = spectators.open_stream(room, broadcast_state(room))
+    timer_pkt = room_timers.packet(room)
+    if timer_pkt is not None:
+        stream.append(timer_pkt.sse())
+    return stream
+
+@app.route('/api/spectate')
+def spectate_events():
+    """Server-Sent Events stream of a room's spectator channel: a state_update, then state_patch events."""
+    room = request.args.get('room', 'default')
+    stream = open_spectator_stream(room)
+
+    def events():
+        idle = 0.0
+        try:
+            while True:
+                if stream:
+                    idle = 0.0
+                    while stream:
+                        yield stream.popleft()
+                elif idle >= SSE_KEEPALIVE_INTERVAL:
+                    idle = 0.0
+                    yield b": keepalive\n\n"
+                spectators.sleep(spectators.interval)
+                idle += spectators.interval
+        finally:
+            spectators.close_stream(room, stream)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/instructions')
 def instructions():
     room = request.args.get('room', 'default')
     return render_template('instructions.html', room=room)
 
+@app.route('/api/rooms/stats')
+def room_stats():
+    return jsonify(room_manager.stats())
+
+# Used by shard_router.py to move rooms between workers; only reachable with its token.
+@app.before_request
+def guard_shard_endpoints():
+    if request.path.startswith('/_shard/') and not (
+            SHARD_TOKEN and hmac.compare_digest(request.headers.get('X-Feud-Shard-Token', ''), SHARD_TOKEN)):
+        abort(404)
+
+@app.errorhandler(RoomMoved)
+def room_moved(e):
+    # A request routed here before the room moved; the router sends the retry to the new worker.
+    return jsonify(ok=False, error=ROOM_MOVED_MESSAGE), 409
+
+@app.route('/_shard/rooms')
+def shard_rooms():
+    return jsonify(rooms=room_store.room_ids())
+
+@app.route('/_shard/export', methods=['POST'])
+def shard_export():
+    room = request.args.get('room', 'default')
+    # Runs as a room command, so actions already queued for the room are applied first. Until
+    # /_shard/moved, requests that still reach this worker get RoomMoved rather than a new room.
+    released = room_commands.run(room, lambda: room_manager.release(room, moving=True))
+    if released is None:
+        return jsonify(error="No such room"), 404
+    state, version = released
+    return jsonify(state=state.to_dict(), version=version)
+
+@app.route('/_shard/import', methods=['POST'])
+def shard_import():
+    room = request.args.get('room', 'default')
+    data = request.get_json()
+    state = GameState.from_dict(data['state'])
+    # Keeps the room's protocol version, so clients that reconnect see it continue.
+    room_commands.run(room, lambda: room_manager.adopt(room, state, data.get('version', 0)))
+    return jsonify(ok=True)
+
+@app.route('/_shard/moved', methods=['POST'])
+def shard_moved():
+    # The router has closed this worker's connections to the room; nothing routes here for it now.
+    room_manager.clear_moved(request.args.get('room', 'default'))
+    return jsonify(ok=True)
+
 @app.route('/api/state')
 def api_state():
     room = request.args.get('room', 'default')
-    state = get_game_state_for_room(room)
-    data = {
-        "question_shown": state.question_shown_to_contestants,
-        "current_question": {
-            "question": state.current_question['question'] if state.current_question and state.question_shown_to_contestants else "",
-            "answers": [
-                {"text": ans[0], "points": ans[1], "revealed": rev}
-                for ans, rev in zip(state.current_question['answers'], state.answers_revealed)
-            ]
-        } if state.current_question else None,
-        "team1_score": state.team1_score,
-        "team2_score": state.team2_score,
-        "team1_name": state.team1_name,
-        "team2_name": state.team2_name,
-        "current_control_team": state.current_control_team,
-        "strikes": state.team_in_play_strikes,
-        "is_steal_attempt": state.is_steal_attempt,
-        "current_question_index": state.current_question_index + 1,
-        "total_questions": len(state.chosen_questions)
-    }
-    if state.current_question is None and state.current_question_index >= len(state.chosen_questions):
-        t1, t2 = state.scores()
-        if t1 > t2:
-            winner = {"name": state.team1_name, "points": t1}
-        elif t2 > t1:
-            winner = {"name": state.team2_name, "points": t2}
-        else:
-            winner = {"name": "Tie", "points": t1}
-        data["winner"] = winner
-    return jsonify(data)
+    snap = broadcast_state(room)
+    if snap.etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(snap.body, mimetype='application/json')
+    response.set_etag(snap.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+QUESTION_PAGE_SIZE = 50
+MAX_QUESTION_PAGE_SIZE = 200
+
+def int_arg(name, default=None):
+    try:
+        return int(request.args[name])
+    except (KeyError, ValueError):
+        return default
+
+@app.route('/api/questions')
+def api_questions():
+    """Search the room's question bank: ?q=&min_answers=&max_answers=&min_points=&max_points=&offset=&limit=
+
+    With ``sample=N``, returns N random matches instead of a page.
+    """
+    room = request.args.get('room', 'default')
+    # Round setup always chooses from the newest bank.
+    bank = get_game_state_for_room(room).latest_question_bank(block=False)
+    if bank.loading:
+        return jsonify({'total': 0, 'offset': 0, 'items': [], 'bank_version': None, 'loading': True})
+    index = bank.index
+    ids = index.search(request.args.get('q', ''),
+                       min_answers=int_arg('min_answers'), max_answers=int_arg('max_answers'),
+                       min_points=int_arg('min_points'), max_points=int_arg('max_points'))
+    sample = int_arg('sample')
+    if sample is not None:
+        offset, page = 0, index.sample(ids, max(0, min(sample, MAX_QUESTION_PAGE_SIZE)))
+    else:
+        offset = max(0, int_arg('offset', 0))
+        limit = max(0, min(int_arg('limit', QUESTION_PAGE_SIZE), MAX_QUESTION_PAGE_SIZE))
+        page = ids[offset:offset + limit]
+    edited = getattr(bank, 'is_edited', None)
+    items = [{
+        'index': i,
+        'number': bank[i].question_number,
+        'question': bank[i].question,
+        'answer_count': bank[i].answer_count,
+        'total_points': sum(bank[i].points),
+        'edited': bool(edited and edited(i)),
+    } for i in page]
+    return jsonify({'total': len(ids), 'offset': offset, 'items': items, 'bank_version': bank.version,
+                    'loading': False})
+
+def upload_authorized():
+    header = request.headers.get('Authorization', '')
+    token = header[len('Bearer '):] if header.startswith('Bearer ') else ''
+    return hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+@app.route('/api/banks')
+def list_banks():
+    return jsonify({'banks': bank_store.list()})
+
+def publish_bank(bank_id, bank):
+    bank_store.publish(bank_id, version=bank.version, questions=len(bank.questions),
+                       skipped=len(bank.report.skipped), warnings=len(bank.report.warnings))
+
+def finish_deferred_upload(bank_id, filename, bank, error):
+    # Runs when an upload the request stopped waiting for has parsed.
+    if bank is not None and bank.questions:
+        publish_bank(bank_id, bank)
+        metrics.bank_uploads.inc('stored')
+        log_event('bank_uploaded', bank=bank_id, questions=len(bank.questions), duplicate=False)
+        return
+    logging.error(f"Dropping uploaded question bank {filename} ({bank_id}): "
+                  f"{error or 'no usable questions'}")
+    bank_store.remove(bank_id)
+    metrics.bank_uploads.inc('invalid')
+
+@app.route('/api/banks', methods=['POST'])
+def upload_bank():
+    """Upload a question bank (.xlsx, .csv or .json) as multipart field ``file``,
+    or as the raw request body with ``?filename=``. Needs ``Authorization: Bearer <FEUD_ADMIN_TOKEN>``.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': "Question bank uploads are disabled."}), 403
+    if not upload_authorized():
+        return jsonify({'error': "Invalid or missing token."}), 401
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, filename = upload.stream, upload.filename
+    else:
+        stream, filename = request.stream, request.args.get('filename')
+    try:
+        bank_id, path, is_new = bank_store.save(stream, filename)
+    except UploadTooLarge as e:
+        metrics.bank_uploads.inc('too_large')
+        return jsonify({'error': str(e)}), 413
+    except ValueError as e:
+        metrics.bank_uploads.inc('rejected')
+        return jsonify({'error': str(e)}), 400
+    try:
+        bank = load_question_bank(path)
+    except TimeoutError:
+        # Still parsing; the bank shows up in /api/banks once it has loaded, or is dropped if it fails.
+        if is_new or bank_store.is_loading(bank_id):
+            when_loaded(path, lambda bank, error: finish_deferred_upload(bank_id, filename, bank, error))
+        return jsonify({'id': bank_id, 'loading': True}), 202
+    except Exception as e:
+        if is_new:
+            bank_store.remove(bank_id)
+        metrics.bank_uploads.inc('invalid')
+        return jsonify({'error': f"Could not load {filename}: {e}"}), 400
+    if not bank.questions:
+        if is_new:
+            bank_store.remove(bank_id)
+        metrics.bank_uploads.inc('invalid')
+        return jsonify({'error': f"{filename} has no usable questions.", 'report': bank.report.to_dict()}), 400
+    # A re-upload of a bank whose first upload timed out publishes it too.
+    if is_new or bank_store.is_loading(bank_id):
+        publish_bank(bank_id, bank)
+    metrics.bank_uploads.inc('stored' if is_new else 'duplicate')
+    log_event('bank_uploaded', bank=bank_id, questions=len(bank.questions), duplicate=not is_new)
+    return jsonify(dict(bank_store.describe(bank_id) or {}, id=bank_id, duplicate=not is_new,
+                        report=bank.report.to_dict())), 201 if is_new else 200
+
+def action_key():
+    # Forms carry a key in a hidden field; API clients can send the header instead.
+    return request.headers.get('Idempotency-Key') or request.form.get('key') or None
+
+def finish_action(room, result):
+    for category, message in result.messages:
+        flash(message, category)
+    return redirect(url_for(result.next_page, room=room))
+
+def render_round_setup(room, state, error=None):
+    # The questions themselves are fetched page by page from /api/questions.
+    bank = state.latest_question_bank(block=False)
+    source = state.question_source or state.question_bank.path
+    banks = [{'id': game_actions.DEFAULT_BANK_ID, 'name': DEFAULT_QUESTIONS_FILE}] + bank_store.list()
+    return render_template('round_setup.html', error=error, question_count=len(bank),
+                           required=REQUIRED_QUESTION_COUNT, room=room, banks=banks,
+                           current_bank=bank_store.id_for(source) or game_actions.DEFAULT_BANK_ID,
+                           edited_count=len(bank.edits) + len(bank.added) if hasattr(bank, 'edits') else 0)
 
 @app.route('/round_setup', methods=['GET', 'POST'])
 def round_setup():
     room = request.args.get('room', 'default')
     state = get_game_state_for_room(room)
     if request.method == 'POST':
-        selected = request.form.getlist('questions')
-        team1 = request.form.get('team1')
-        team2 = request.form.get('team2')
-        if len(selected) != REQUIRED_QUESTION_COUNT:
-            error = f"Please select exactly {REQUIRED_QUESTION_COUNT} questions."
-            return render_template('round_setup.html', error=error, questions=state.all_questions, room=room)
-        if not team1 or not team2:
-            error = "Please provide both team names."
-            return render_template('round_setup.html', error=error, questions=state.all_questions, room=room)
-        state.set_round_questions_and_teams(selected, team1, team2)
-        flash("Round setup complete.", "success")
-        broadcast_state(room)
-        return redirect(url_for('moderator', room=room))
-    return render_template('round_setup.html', questions=state.all_questions, room=room)
+        result = perform_action(room, 'setup_round', {'questions': request.form.getlist('questions'),
+                                                      'team1': request.form.get('team1'),
+                                                      'team2': request.form.get('team2'),
+                                                      'bank_version': request.form.get('bank_version')},
+                                key=action_key())
+        if not result.ok:
+            return render_round_setup(room, state, result.error)
+        return finish_action(room, result)
+    return render_round_setup(room, state)
+
+@app.route('/round_setup/bank', methods=['POST'])
+def choose_question_bank():
+    room = request.args.get('room', 'default')
+    return finish_action(room, perform_action(room, 'choose_question_bank', {'bank': request.form.get('bank')},
+                                              key=action_key()))
+
+def parse_answer_lines(text):
+    # One "answer, points" per line; the points are the last comma-separated field.
+    answers = []
+    for line in (text or '').splitlines():
+        if line.strip():
+            answer, _, points = line.rpartition(',')
+            answers.append((answer, points.strip()))
+    return answers
+
+@app.route('/round_setup/question', methods=['POST'])
+def edit_question():
+    room = request.args.get('room', 'default')
+    # The form shows questions as Q1, Q2, ...; an empty number adds a question.
+    number = request.form.get('number', '').strip()
+    index = int(number) - 1 if number.isdigit() else (None if not number else -1)
+    result = perform_action(room, 'edit_question', {'index': index, 'question': request.form.get('question'),
+                                                    'answers': parse_answer_lines(request.form.get('answers'))},
+                            key=action_key())
+    if not result.ok:
+        return render_round_setup(room, get_game_state_for_room(room), result.error)
+    return finish_action(room, result)
 
 @app.route('/moderator/start', methods=['POST'])
 def start_next_question():
     room = request.args.get('room', 'default')
-    state = get_game_state_for_room(room)
-    if not state.start_next_question():
-        flash("No more questions available.", "info")
-    else:
-        flash("Next question started.", "success")
-    broadcast_state(room)
-    return redirect(url_for('moderator', room=room))
+    return finish_action(room, perform_action(room, 'start', {}, key=action_key()))
 
 @app.route('/moderator/show_question', methods=['POST'])
 def show_question():
     room = request.args.get('room', 'default')
-    state = get_game_state_for_room(room)
-    if state.current_question:
-        state.question_shown_to_contestants = True
-        flash("Question shown to contestants.", "success")
-    else:
-        flash("No current question.", "error")
-    broadcast_state(room)
-    return redirect(url_for('moderator', room=room))
+    return finish_action(room, perform_action(room, 'show_question', {}, key=action_key()))
 
 @app.route('/moderator/reveal/<int:index>', methods=['POST'])
 def reveal_answer(index):
     room = request.args.get('room', 'default')
-    state = get_game_state_for_room(room)
-    if not state.question_shown_to_contestants:
-        flash("You must show the question first.", "error")
-        broadcast_state(room)
-        return redirect(url_for('moderator', room=room))
-    if state.current_question is None or index < 0 or index >= len(state.current_question['answers']):
-        flash("Invalid answer index.", "error")
-        broadcast_state(room)
-        return redirect(url_for('moderator', room=room))
-    if not state.answers_revealed[index]:
-        state.reveal_answer_by_index(index)
-        if not state.faceoff_done:
-            state.faceoff_done = True
-            broadcast_state(room)
-            return redirect(url_for('faceoff', room=room))
-        if state.check_all_answers_revealed():
-            if state.current_control_team is not None:
-                pts = state.award_points(state.current_control_team)
-                flash(f"All answers revealed. {state.get_team_name(state.current_control_team)} awarded {pts} points.", "success")
-                state.current_control_team = 1 if state.current_control_team == 2 else 2
-    broadcast_state(room)
-    return redirect(url_for('moderator', room=room))
+    return finish_action(room, perform_action(room, 'reveal', {'index': index}, key=action_key()))
 
 @app.route('/moderator/strike', methods=['POST'])
 def strike():
     room = request.args.get('room', 'default')
-    state = get_game_state_for_room(room)
-    strikes = state.add_strike()
-    flash(f"Strike added. Total strikes: {strikes}", "info")
-    if strikes >= 3:
-        state.enable_steal_attempt()
-        flash("Three strikes reached! Steal attempt enabled.", "warning")
-    broadcast_state(room)
-    return redirect(url_for('moderator', room=room))
+    return finish_action(room, perform_action(room, 'strike', {}, key=action_key()))
 
 @app.route('/moderator/steal_success', methods=['POST'])
 def steal_success():
     room = request.args.get('room', 'default')
-    state = get_game_state_for_room(room)
-    if state.current_control_team is not None:
-        stealing_team = 1 if state.current_control_team == 2 else 2
-        pts = state.award_points(stealing_team)
-        flash(f"Steal successful. {state.get_team_name(stealing_team)} awarded {pts} points.", "success")
-        state.current_control_team = 1 if state.current_control_team == 2 else 2
-    state.is_steal_attempt = False
-    broadcast_state(room)
-    return redirect(url_for('moderator', room=room))
+    return finish_action(room, perform_action(room, 'steal_success', {}, key=action_key()))
 
 @app.route('/moderator/steal_failed', methods=['POST'])
 def steal_failed():
     room = request.args.get('room', 'default')
-    state = get_game_state_for_room(room)
-    if state.current_control_team is not None:
-        pts = state.award_points(state.current_control_team)
-        flash(f"Steal failed. {state.get_team_name(state.current_control_team)} awarded {pts} points.", "info")
-        state.current_control_team = 1 if state.current_control_team == 2 else 2
-    state.is_steal_attempt = False
-    broadcast_state(room)
-    return redirect(url_for('moderator', room=room))
+    return finish_action(room, perform_action(room, 'steal_failed', {}, key=action_key()))
+
+@app.route('/moderator/timer/start', methods=['POST'])
+def start_round_timer():
+    room = request.args.get('room', 'default')
+    return finish_action(room, perform_action(room, 'start_timer', {'kind': request.form.get('kind'),
+                                                                    'seconds': request.form.get('seconds')},
+                                              key=action_key()))
+
+@app.route('/moderator/timer/stop', methods=['POST'])
+def stop_round_timer():
+    room = request.args.get('room', 'default')
+    return finish_action(room, perform_action(room, 'stop_timer', {}, key=action_key()))
 
 @app.route('/moderator/update_scores', methods=['POST'])
 def update_scores():
     room = request.args.get('room', 'default')
-    state = get_game_state_for_room(room)
-    try:
-        t1 = int(request.form.get('team1_score', state.team1_score))
-        t2 = int(request.form.get('team2_score', state.team2_score))
-        state.set_scores(t1, t2)
-        flash("Scores updated.", "success")
-    except ValueError:
-        flash("Invalid score values.", "error")
-    broadcast_state(room)
-    return redirect(url_for('moderator', room=room))
+    return finish_action(room, perform_action(room, 'update_scores', request.form.to_dict(), key=action_key()))
 
 @app.route('/moderator/faceoff', methods=['GET', 'POST'])
 def faceoff():
     room = request.args.get('room', 'default')
     state = get_game_state_for_room(room)
     if request.method == 'POST':
-        winner = request.form.get('faceoff_winner')
-        playpass = request.form.get('playpass')
-        if not winner or not playpass:
-            error = "Select both a face-off winner and a play/pass decision."
-            broadcast_state(room)
-            return render_template('faceoff.html', error=error, team1=state.team1_name, team2=state.team2_name, room=room)
-        state.set_faceoff_winner(winner)
-        play = True if playpass == "play" else False
-        state.apply_play_pass(play)
-        flash(f"Face-off complete. {state.get_team_name(state.current_control_team)} will play.", "success")
-        broadcast_state(room)
-        return redirect(url_for('moderator', room=room))
+        result = perform_action(room, 'faceoff', {'faceoff_winner': request.form.get('faceoff_winner'),
+                                                  'playpass': request.form.get('playpass')},
+                                key=action_key())
+        if not result.ok:
+            return render_template('faceoff.html', error=result.error, team1=state.team1_name, team2=state.team2_name, room=room)
+        return finish_action(room, result)
     return render_template('faceoff.html', team1=state.team1_name, team2=state.team2_name, room=room)
 
+@app.route('/moderator/undo', methods=['POST'])
+def undo():
+    room = request.args.get('room', 'default')
+    return finish_action(room, perform_action(room, 'undo', {}, key=action_key()))
+
+@app.route('/moderator/redo', methods=['POST'])
+def redo():
+    room = request.args.get('room', 'default')
+    return finish_action(room, perform_action(room, 'redo', {}, key=action_key()))
+
+def start_worker_threads():
+    # Plain threads, the same under either server.
+    game_log.start()
+    start_question_bank_watcher(QUESTION_POLL_INTERVAL)
+    # Start parsing the default bank now rather than on the first room.
+    get_question_bank(DEFAULT_QUESTIONS_FILE, block=False)
+
+def start_background_work():
+    socketio.start_background_task(sweep_idle_rooms)
+    socketio.start_background_task(announce_question_banks_forever)
+    socketio.start_background_task(spectators.run)
+    socketio.start_background_task(timer_wheel.run, socketio.sleep)
+    start_worker_threads()
+
+# Only for the eventlet server (python app.py, gunicorn -k eventlet app:app). asgi_app
+# imports this module for its views and runs the same jobs on its own event loop.
+# Parse workers are spawned processes that re-import this module as __mp_main__
+# when it is run as a script; they must not start the server's background work.
+if __name__ != '__mp_main__' and 'asgi_app' not in sys.modules:
+    start_background_work()
+
 if __name__ == '__main__':
-    socketio.run(app, debug=False)
\ No newline at end of file
+    socketio.run(app, host=os.environ.get('FEUD_HOST', '127.0.0.1'), port=int(os.environ.get('FEUD_PORT', 5000)),
+                 debug=False)
\ No newline at end of file
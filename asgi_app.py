@@ -0,0 +1,230 @@
+"""Async server mode: python-socketio's AsyncServer under any ASGI server.
+
+    uvicorn asgi_app:application
+
+Sockets are handled by an asyncio AsyncServer, so one process can hold
+thousands of connections. Every moderator action is also a Socket.IO event
+(see app.ROOM_ACTIONS) whose acknowledgement carries the result and the
+new state version, so hosts don't need the POST/redirect/render round trip.
+The HTML pages and form fallbacks are still the Flask app, mounted through
+asgiref's WSGI adapter with a thread per request, and share the same rooms.
+Spectator SSE streams are served here on the event loop instead.
+
+Needs ``pip install asgiref uvicorn``.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+import socketio as sio_lib
+from socketio.asyncio_pubsub_manager import AsyncPubSubManager
+
+import app as flask_app
+import metrics
+import offload
+from metrics import log_event
+
+# Flask views run one request per thread (see _http_app), so a view waiting on a
+# parse (up to FEUD_PARSE_TIMEOUT) blocks only its own thread, not other requests or
+# the event loop. Spectator streams don't go through Flask here (see _spectate).
+offload.set_sleep(time.sleep)
+flask_app.room_commands.event_factory = threading.Event
+
+# Moderator actions run here, off the event loop: rooms proceed in parallel, and a
+# slow action (a round waiting on its question bank) no longer stalls every socket.
+COMMAND_WORKERS = int(os.environ.get('FEUD_COMMAND_WORKERS', 8))
+command_pool = ThreadPoolExecutor(max_workers=COMMAND_WORKERS, thread_name_prefix='room-command')
+# A clock running out is a room command too (a strike, a failed steal).
+flask_app.room_timers.spawn = command_pool.submit
+# At most this many Flask views run at once, each on its own thread. Room lookups for
+# sockets and streams (which may restore a room from its store) run on http_pool.
+HTTP_WORKERS = int(os.environ.get('FEUD_HTTP_WORKERS', 32))
+http_pool = ThreadPoolExecutor(max_workers=HTTP_WORKERS, thread_name_prefix='http')
+
+# With FEUD_REDIS_URL set, broadcasts fan out to the other workers like in app.py.
+sio = sio_lib.AsyncServer(
+    async_mode='asgi',
+    client_manager=sio_lib.AsyncRedisManager(flask_app.REDIS_URL) if flask_app.REDIS_URL else None,
+)
+loop = None
+
+
+async def _deliver(pkt, room=None, sid=None):
+    if sid is not None:
+        await sio._send_packet(sio.manager.eio_sid_from_sid(sid, '/'), pkt)
+        return
+    if isinstance(sio.manager, AsyncPubSubManager):
+        await sio.emit(pkt.data[0], pkt.data[1], to=room)
+        return
+    if '/' not in sio.manager.rooms:
+        return
+    for _, eio_sid in sio.manager.get_participants('/', room):
+        await sio._send_packet(eio_sid, pkt)
+
+
+def send_packet(pkt, room=None, sid=None):
+    # Called from socket handlers on the loop and from Flask views in worker threads.
+    coro = _deliver(pkt, room=room, sid=sid)
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        loop.create_task(coro)
+    else:
+        asyncio.run_coroutine_threadsafe(coro, loop)
+
+
+@sio.on('join')
+async def on_join(sid, data):
+    room = data.get('room', 'default')
+    spectator = bool(data.get('spectator'))
+    sio.enter_room(sid, flask_app.spectator_room(room) if spectator else room)
+    log_event("client_joined", room=room, spectator=spectator)
+    snap = await loop.run_in_executor(http_pool, flask_app.snapshot_for_client, room, spectator)
+    await _deliver(snap.packet, sid=sid)
+    timer_pkt = flask_app.room_timers.packet(room)
+    if timer_pkt is not None:
+        await _deliver(timer_pkt, sid=sid)
+
+
+@sio.on('resync')
+async def on_resync(sid, data):
+    snap = await loop.run_in_executor(http_pool, flask_app.snapshot_for_client, data.get('room', 'default'),
+                                      bool(data.get('spectator')))
+    await _deliver(snap.packet, sid=sid)
+
+
+def _run_action(room, name, data):
+    result = flask_app.perform_action(room, name, data, key=data.get('key'))
+    return result, flask_app.broadcast_state(room)
+
+
+def _register_action(name):
+    async def handler(sid, data):
+        data = data or {}
+        room = data.get('room', 'default')
+        t0 = time.perf_counter()
+        result, snap = await loop.run_in_executor(command_pool, _run_action, room, name, data)
+        metrics.socket_action_duration.observe(time.perf_counter() - t0, name)
+        metrics.socket_actions.inc(name, str(result.ok).lower())
+        # The return value is the Socket.IO acknowledgement.
+        return dict(result.to_dict(), version=snap.version)
+    sio.on(name, handler)
+
+
+for _name in flask_app.ROOM_ACTIONS:
+    _register_action(_name)
+
+# The sockets live here, not on the Flask-SocketIO server.
+flask_app.register_socket_gauges(sio.manager)
+
+
+async def _sweep_idle_rooms():
+    while True:
+        await asyncio.sleep(flask_app.ROOM_SWEEP_INTERVAL)
+        try:
+            flask_app.room_manager.sweep()
+        except Exception:
+            logging.exception("Room sweep failed")
+
+
+async def _announce_question_banks():
+    seen = {}
+    while True:
+        await asyncio.sleep(flask_app.BANK_ANNOUNCE_INTERVAL)
+        try:
+            flask_app.announce_question_banks(seen)
+        except Exception:
+            logging.exception("Announcing question banks failed")
+
+
+async def _flush_spectators():
+    while True:
+        await asyncio.sleep(flask_app.SPECTATOR_INTERVAL)
+        try:
+            flask_app.spectators.flush()
+        except Exception:
+            logging.exception("Spectator broadcast failed")
+
+
+async def _turn_timer_wheel():
+    wheel = flask_app.timer_wheel
+    while True:
+        await asyncio.sleep(wheel.tick)
+        try:
+            wheel.advance()
+        except Exception:
+            logging.exception("Timer wheel failed")
+
+
+async def _startup():
+    global loop
+    loop = asyncio.get_running_loop()
+    flask_app.set_packet_sender(send_packet)
+    loop.create_task(_sweep_idle_rooms())
+    loop.create_task(_announce_question_banks())
+    loop.create_task(_flush_spectators())
+    loop.create_task(_turn_timer_wheel())
+    flask_app.start_worker_threads()
+
+
+async def _spectate(scope, receive, send):
+    # /api/spectate on the event loop: an open stream costs no thread.
+    room = parse_qs(scope['query_string'].decode('latin-1')).get('room', ['default'])[0]
+    stream = await loop.run_in_executor(http_pool, flask_app.open_spectator_stream, room)
+    closed = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        closed.set()
+
+    watcher = loop.create_task(watch_disconnect())
+    interval = flask_app.spectators.interval
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream; charset=utf-8'),
+                                (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]})
+        idle = 0.0
+        while not closed.is_set():
+            if stream:
+                idle = 0.0
+                frames = []
+                while stream:
+                    frames.append(stream.popleft())
+                await send({'type': 'http.response.body', 'body': b''.join(frames), 'more_body': True})
+            elif idle >= flask_app.SSE_KEEPALIVE_INTERVAL:
+                idle = 0.0
+                await send({'type': 'http.response.body', 'body': b": keepalive\n\n", 'more_body': True})
+            await asyncio.sleep(interval)
+            idle += interval
+    finally:
+        watcher.cancel()
+        flask_app.spectators.close_stream(room, stream)
+
+
+def _http_app():
+    try:
+        from asgiref.sync import ThreadSensitiveContext
+        from asgiref.wsgi import WsgiToAsgi
+    except ImportError:
+        raise RuntimeError("asgi_app needs the 'asgiref' package (pip install asgiref)")
+    flask_http = WsgiToAsgi(flask_app.app)
+    views = asyncio.Semaphore(HTTP_WORKERS)
+
+    async def http_app(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == '/api/spectate':
+            await _spectate(scope, receive, send)
+            return
+        # Without a context of its own every request shares asgiref's single sync
+        # thread, where one slow view would hold up all the others.
+        async with views, ThreadSensitiveContext():
+            await flask_http(scope, receive, send)
+    return http_app
+
+
+application = sio_lib.ASGIApp(sio, other_asgi_app=_http_app(), on_startup=_startup)
@@ -0,0 +1,244 @@
+"""Static assets under content-hashed URLs.
+
+``url_for('static', filename='styles.css')`` becomes ``/static/styles.<hash>.css``.
+A request for the current hash may be cached for a year without revalidation,
+so the redirect back to the moderator page after every action no longer
+revalidates megabytes of audio. Plain and outdated names are still served,
+with ``no-cache``. Text assets are compressed once per version (gzip, plus
+brotli if the ``brotli`` package is installed); everything else goes through
+send_file, which answers byte-range requests so audio can seek and resume.
+
+Optional build step, run before deploying:
+
+    python assets.py build
+
+It writes compact versions of the WAV cues to static/build/: Opus via ffmpeg
+when it is on the PATH, otherwise mono, half-rate WAV using only the standard
+library. Pages list the built versions first and keep the original as a fallback.
+
+The page scripts are served as one bundle, ``feud.min.js``, concatenated and
+minified in memory from the readable sources listed in ``BUNDLES`` and rebuilt
+whenever one of them changes, so there is nothing to build for it.
+"""
+import os
+import re
+import sys
+import gzip
+import wave
+import shutil
+import hashlib
+import logging
+import mimetypes
+import threading
+import subprocess
+from array import array
+
+from flask import Response, abort, request, send_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt')
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+FINGERPRINT_RE = re.compile(r'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{10})(?P<ext>\.[^./]+)$')
+BUILD_DIR = 'build'
+# Built variants of an audio file, preferred in this order.
+AUDIO_VARIANTS = (('.ogg', 'audio/ogg; codecs=opus'), ('.wav', 'audio/wav'))
+# Virtual files made of several static sources, in load order.
+BUNDLES = {
+    'feud.min.js': ('feud_socket.js', 'state_sync.js', 'board_render.js'),
+}
+
+
+class Asset:
+    __slots__ = ('path', 'mtime', 'size', 'digest', 'data', 'encoded')
+
+    def __init__(self, path, mtime, size, digest, data=None):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+        # Body of a bundle, which has no file of its own
+        self.data = data
+        # encoding -> compressed body, filled on first request
+        self.encoded = {}
+
+
+def minify_js(source):
+    """Drop comment-only lines, blank lines and indentation.
+
+    Deliberately conservative: line breaks are kept, so automatic semicolon
+    insertion behaves exactly as in the source.
+    """
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+class AssetManifest:
+    """Content hashes of the files under ``root``, refreshed when a file changes."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.assets = {}
+        self.lock = threading.Lock()
+
+    def _path(self, name):
+        parts = name.replace('\\', '/').split('/')
+        # No hidden files (.DS_Store) and no way out of the static folder.
+        if any(not part or part.startswith('.') for part in parts):
+            return None
+        return os.path.join(self.root, *parts)
+
+    def _bundle(self, name):
+        paths = [os.path.join(self.root, part) for part in BUNDLES[name]]
+        try:
+            signature = tuple((st.st_mtime, st.st_size) for st in map(os.stat, paths))
+        except OSError:
+            return None
+        asset = self.assets.get(name)
+        if asset is not None and asset.mtime == signature:
+            return asset
+        sources = []
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                sources.append(minify_js(f.read()))
+        data = (';\n'.join(sources) + '\n').encode('utf-8')
+        asset = Asset(None, signature, len(data), hashlib.sha256(data).hexdigest()[:10], data)
+        with self.lock:
+            self.assets[name] = asset
+        return asset
+
+    def get(self, name):
+        if name in BUNDLES:
+            return self._bundle(name)
+        path = self._path(name)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        asset = self.assets.get(name)
+        if asset is not None and asset.mtime == st.st_mtime and asset.size == st.st_size:
+            return asset
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        asset = Asset(path, st.st_mtime, st.st_size, digest.hexdigest()[:10])
+        with self.lock:
+            self.assets[name] = asset
+        return asset
+
+    def url_name(self, name):
+        asset = self.get(name)
+        if asset is None:
+            return name
+        stem, ext = os.path.splitext(name)
+        return f"{stem}.{asset.digest}{ext}"
+
+    def audio_sources(self, name):
+        """(filename, type) of every version of an audio file, built ones first."""
+        stem = os.path.splitext(name)[0]
+        sources = []
+        for ext, mimetype in AUDIO_VARIANTS:
+            built = f"{BUILD_DIR}/{stem}{ext}"
+            if self.get(built) is not None:
+                sources.append((built, mimetype))
+        sources.append((name, mimetypes.guess_type(name)[0] or 'application/octet-stream'))
+        return sources
+
+    def _encoded(self, asset, encoding):
+        body = asset.encoded.get(encoding)
+        if body is None:
+            data = asset.data
+            if data is None:
+                with open(asset.path, 'rb') as f:
+                    data = f.read()
+            body = brotli.compress(data) if encoding == 'br' else gzip.compress(data, 9, mtime=0)
+            asset.encoded[encoding] = body
+        return body
+
+    def response(self, filename):
+        name, digest = filename, None
+        m = FINGERPRINT_RE.match(filename)
+        if m and self.get(m['stem'] + m['ext']) is not None:
+            name, digest = m['stem'] + m['ext'], m['digest']
+        asset = self.get(name)
+        if asset is None:
+            abort(404)
+        ext = os.path.splitext(name)[1].lower()
+        encoding = request.accept_encodings.best_match(ENCODINGS) if ext in COMPRESSIBLE else None
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if encoding:
+            response = Response(self._encoded(asset, encoding), mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            response.set_etag(f"{asset.digest}-{encoding}")
+            response.make_conditional(request)
+        elif asset.data is not None:
+            response = Response(asset.data, mimetype=mimetype)
+            response.set_etag(asset.digest)
+            response.make_conditional(request)
+        else:
+            response = send_file(asset.path, conditional=True, etag=asset.digest)
+        if ext in COMPRESSIBLE:
+            response.vary.add('Accept-Encoding')
+        # Only the current hash is immutable; anything else must be revalidated.
+        response.headers['Cache-Control'] = IMMUTABLE if digest == asset.digest else 'no-cache'
+        return response
+
+
+def compact_wav(src, dst):
+    """Write ``src`` as 16-bit mono WAV, halving sample rates above 24 kHz (about 4x smaller)."""
+    with wave.open(src, 'rb') as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        if width != 2:
+            raise ValueError(f"{src}: only 16-bit WAV is supported")
+        samples = array('h', w.readframes(w.getnframes()))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    if channels > 1:
+        samples = array('h', (sum(samples[i:i + channels]) // channels
+                              for i in range(0, len(samples) - channels + 1, channels)))
+    if rate > 24000:
+        # Averaging each pair is a crude low-pass filter, enough for short sound cues.
+        samples = array('h', ((samples[i] + samples[i + 1]) // 2 for i in range(0, len(samples) - 1, 2)))
+        rate //= 2
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    with wave.open(dst, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+
+
+def build(root):
+    out_dir = os.path.join(root, BUILD_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        logging.info("ffmpeg not found; writing compact WAV files instead of Opus")
+    for name in sorted(os.listdir(root)):
+        if not name.lower().endswith('.wav'):
+            continue
+        src = os.path.join(root, name)
+        stem = os.path.splitext(name)[0]
+        if ffmpeg:
+            dst = os.path.join(out_dir, f"{stem}.ogg")
+            subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-i', src, '-c:a', 'libopus', '-b:a', '64k', dst],
+                           check=True)
+        else:
+            dst = os.path.join(out_dir, f"{stem}.wav")
+            compact_wav(src, dst)
+        print(f"{name}: {os.path.getsize(src)} -> {os.path.getsize(dst)} bytes ({os.path.relpath(dst, root)})")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if sys.argv[1:2] != ['build']:
+        sys.exit("usage: python assets.py build [static_dir]")
+    build(sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+
+UPLOAD_FORMATS = ('.xlsx', '.csv', '.json')
+CHUNK_SIZE = 64 * 1024
+BANK_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class BankStore:
+    """Uploaded question banks, stored on disk under the sha256 of their content.
+
+    A bank is ``<sha256><ext>`` plus ``<sha256>.meta.json`` with its original
+    name and load summary. A new upload is marked ``loading`` until its parse
+    has succeeded (see ``publish``); until then it is neither listed nor
+    resolvable, so a room can't choose a file that may turn out unusable. Uploading the same file twice, or from several
+    rooms, lands on the same path, and the question cache is keyed by the
+    same hash, so each distinct bank is parsed once.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    def _meta_path(self, bank_id):
+        return os.path.join(self.directory, f"{bank_id}.meta.json")
+
+    def save(self, stream, filename):
+        """Copy ``stream`` to the store chunk by chunk, hashing as it goes.
+
+        Returns ``(bank_id, path, is_new)``. Raises ValueError for an unsupported
+        format and UploadTooLarge past ``max_bytes``; nothing is left behind then.
+        """
+        ext = os.path.splitext(filename or '')[1].lower()
+        if ext not in UPLOAD_FORMATS:
+            raise ValueError(f"Unsupported file type {ext or '(none)'}; use one of {', '.join(UPLOAD_FORMATS)}")
+        os.makedirs(self.directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLarge(f"File is larger than {self.max_bytes // (1024 * 1024)} MB")
+                    digest.update(chunk)
+                    f.write(chunk)
+            if size == 0:
+                raise ValueError("File is empty")
+            bank_id = digest.hexdigest()
+            path = os.path.join(self.directory, bank_id + ext)
+            with self.lock:
+                is_new = not os.path.exists(path)
+                if is_new:
+                    os.replace(tmp_path, path)
+                    self.write_meta(bank_id, {'name': os.path.basename(filename), 'format': ext[1:],
+                                              'size': size, 'uploaded': time.time(), 'loading': True})
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return bank_id, path, is_new
+
+    def _file_for(self, bank_id):
+        if not BANK_ID_RE.match(bank_id or ''):
+            return None
+        for ext in UPLOAD_FORMATS:
+            path = os.path.join(self.directory, bank_id + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def path_for(self, bank_id):
+        """The file of a bank that has loaded, or None."""
+        path = self._file_for(bank_id)
+        if path is None or (self.describe(bank_id) or {}).get('loading'):
+            return None
+        return path
+
+    def is_loading(self, bank_id):
+        return bool((self.describe(bank_id) or {}).get('loading'))
+
+    def id_for(self, path):
+        """The id of a stored bank's file, or None for files outside the store."""
+        if not path or os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.directory):
+            return None
+        bank_id = os.path.splitext(os.path.basename(path))[0]
+        return bank_id if BANK_ID_RE.match(bank_id) else None
+
+    def describe(self, bank_id):
+        try:
+            with open(self._meta_path(bank_id), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        meta['id'] = bank_id
+        return meta
+
+    def write_meta(self, bank_id, meta):
+        path = self._meta_path(bank_id)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({k: v for k, v in meta.items() if k != 'id'}, f)
+        os.replace(f"{path}.tmp", path)
+
+    def update_meta(self, bank_id, **fields):
+        with self.lock:
+            meta = self.describe(bank_id) or {}
+            meta.update(fields)
+            self.write_meta(bank_id, meta)
+
+    def publish(self, bank_id, **fields):
+        """Record a bank's load summary and list it."""
+        with self.lock:
+            meta = self.describe(bank_id) or {}
+            meta.update(fields)
+            meta.pop('loading', None)
+            self.write_meta(bank_id, meta)
+
+    def list(self):
+        banks = []
+        if not os.path.isdir(self.directory):
+            return banks
+        for name in os.listdir(self.directory):
+            if name.endswith('.meta.json'):
+                meta = self.describe(name[:-len('.meta.json')])
+                if meta is not None and self.path_for(meta['id']):
+                    banks.append(meta)
+        banks.sort(key=lambda m: m.get('uploaded', 0))
+        return banks
+
+    def remove(self, bank_id):
+        path = self._file_for(bank_id)
+        with self.lock:
+            for p in (path, self._meta_path(bank_id)):
+                try:
+                    if p:
+                        os.remove(p)
+                except FileNotFoundError:
+                    pass
+        logging.info(f"Removed question bank {bank_id}")
@@ -0,0 +1,209 @@
+"""Run full simulated games and measure moderator-action throughput and broadcast fan-out.
+
+    python benchmarks/bench_game.py [--rooms R] [--clients N] [--url http://host:port]
+
+Without --url everything runs in-process against the real app: each room gets
+N Flask-SocketIO test clients as contestant screens, and every moderator action
+goes through app.perform_action exactly as the socket events do: the room's
+command queue, the game log, and the broadcast. ``action_latency`` is the
+whole call and ``fanout_latency`` the broadcast inside it.
+With --url the same games are played against a running server over real
+websockets (needs ``pip install "python-socketio[client]"``), and fan-out
+latency is measured from sending the action to the last contestant receiving
+the resulting patch.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def summarize(samples):
+    """Latency percentiles in milliseconds."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 3)
+    return {
+        'count': len(ordered),
+        'p50_ms': pct(50),
+        'p90_ms': pct(90),
+        'p99_ms': pct(99),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+def game_script(question_count, answer_counts):
+    """The sequence of (action, params) a moderator goes through for one full game."""
+    steps = [('setup_round', {'questions': [str(i) for i in range(question_count)],
+                              'team1': 'Red', 'team2': 'Blue'})]
+    for q in range(question_count):
+        n = answer_counts[q]
+        steps += [('start', {}), ('show_question', {}), ('reveal', {'index': 0}),
+                  ('faceoff', {'faceoff_winner': '1' if q % 2 == 0 else '2', 'playpass': 'play'})]
+        if q % 2 == 0:
+            # Control team clears the board.
+            steps += [('reveal', {'index': i}) for i in range(1, n)]
+        else:
+            # Three strikes, then a steal.
+            steps += [('reveal', {'index': 1}), ('strike', {}), ('strike', {}), ('strike', {}),
+                      ('steal_success', {})]
+    steps.append(('start', {}))
+    return steps
+
+
+def run_in_process(n_rooms, n_clients):
+    import app
+    import game_actions
+    bank = app.get_question_bank(app.DEFAULT_QUESTIONS_FILE)
+    count = game_actions.REQUIRED_QUESTION_COUNT
+    script = game_script(count, [bank[i].answer_count for i in range(count)])
+
+    clients = []
+    for r in range(n_rooms):
+        for _ in range(n_clients):
+            client = app.socketio.test_client(app.app)
+            client.emit('join', {'room': f'bench-{r}'})
+            client.get_received()
+            clients.append(client)
+
+    action_latency, fanout_latency = [], []
+    broadcast_state = app.broadcast_state
+
+    def timed_broadcast(room):
+        t0 = time.perf_counter()
+        try:
+            return broadcast_state(room)
+        finally:
+            fanout_latency.append(time.perf_counter() - t0)
+
+    # perform_action broadcasts through the module global; time that part on its own.
+    app.broadcast_state = timed_broadcast
+    try:
+        started = time.perf_counter()
+        for action, params in script:
+            for r in range(n_rooms):
+                t0 = time.perf_counter()
+                app.perform_action(f'bench-{r}', action, params)
+                action_latency.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+    finally:
+        app.broadcast_state = broadcast_state
+
+    received = sum(len(c.get_received()) for c in clients)
+    for client in clients:
+        client.disconnect()
+    actions = len(script) * n_rooms
+    return {
+        'mode': 'in_process',
+        'rooms': n_rooms,
+        'clients_per_room': n_clients,
+        'actions': actions,
+        'actions_per_second': round(actions / elapsed, 1),
+        'messages_delivered': received,
+        'action_latency': summarize(action_latency),
+        'fanout_latency': summarize(fanout_latency),
+    }
+
+
+def run_over_network(url, n_rooms, n_clients):
+    import socketio
+    # Question layout is needed to script the game; fetch it from the server's own bank.
+    import app
+    import game_actions
+    bank = app.get_question_bank(app.DEFAULT_QUESTIONS_FILE)
+    count = game_actions.REQUIRED_QUESTION_COUNT
+    script = game_script(count, [bank[i].answer_count for i in range(count)])
+
+    lock = threading.Lock()
+    # room -> [version before the action, clients still waiting, start time]
+    pending = {}
+    last_version = {}
+    fanout_latency = []
+
+    def on_patch(room, msg):
+        with lock:
+            entry = pending.get(room)
+            if entry is None or msg['version'] <= entry[0]:
+                return
+            entry[1] -= 1
+            if entry[1] == 0:
+                fanout_latency.append(time.perf_counter() - entry[2])
+                del pending[room]
+
+    clients = []
+    for r in range(n_rooms):
+        room = f'bench-{r}'
+        for _ in range(n_clients):
+            client = socketio.Client()
+            client.on('state_patch', lambda msg, room=room: on_patch(room, msg))
+            # The room in the URL lets shard_router.py send the socket to the room's worker.
+            client.connect(f"{url}?room={room}", transports=['websocket'])
+            client.emit('join', {'room': room})
+            clients.append(client)
+    moderators = []
+    for r in range(n_rooms):
+        client = socketio.Client()
+        client.connect(f"{url}?room=bench-{r}", transports=['websocket'])
+        moderators.append(client)
+    time.sleep(0.5)
+
+    action_latency = []
+    started = time.perf_counter()
+    for action, params in script:
+        for r, moderator in enumerate(moderators):
+            room = f'bench-{r}'
+            t0 = time.perf_counter()
+            with lock:
+                pending[room] = [last_version.get(room, 0), n_clients, t0]
+            ack = moderator.call(action, dict(params, room=room), timeout=10)
+            action_latency.append(time.perf_counter() - t0)
+            last_version[room] = ack['version']
+    time.sleep(0.5)
+    elapsed = time.perf_counter() - started
+
+    for client in clients + moderators:
+        client.disconnect()
+    actions = len(script) * n_rooms
+    return {
+        'mode': 'network',
+        'url': url,
+        'rooms': n_rooms,
+        'clients_per_room': n_clients,
+        'actions': actions,
+        'actions_per_second': round(actions / elapsed, 1),
+        'action_latency': summarize(action_latency),
+        'fanout_latency': summarize(fanout_latency),
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument('--rooms', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=25, help="contestant screens per room")
+    parser.add_argument('--url', help="benchmark a running server instead of the in-process app")
+
+
+def run(args):
+    if args.url:
+        return run_over_network(args.url, args.rooms, args.clients)
+    return run_in_process(args.rooms, args.clients)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    print(json.dumps({'benchmark': 'game', **run(args)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
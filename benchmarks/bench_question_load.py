@@ -0,0 +1,89 @@
+"""Measure question bank load time against bank size.
+
+    python benchmarks/bench_question_load.py [--bank-sizes 1000,10000] [--repeat N]
+
+For each size a synthetic workbook in the EXCEL_REQUIRED_COLUMNS layout is
+written to a temporary directory. ``xlsx_parse_s`` is a cold parse of the
+workbook (what load_questions_from_excel does), ``cache_read_s`` is a load
+through the compiled cache (what the app does on every start after the first).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_synthetic_bank(path, n_questions):
+    import pandas as pd
+    from question_bank import MAX_ANSWERS, EXCEL_REQUIRED_COLUMNS
+    rows = []
+    for q in range(1, n_questions + 1):
+        row = [q, f"Name something people do on day {q}"]
+        n_answers = 4 + q % (MAX_ANSWERS - 3)
+        for a in range(1, MAX_ANSWERS + 1):
+            if a <= n_answers:
+                row += [f"Answer {a} to {q}", max(1, 50 - a * 5)]
+            else:
+                row += [None, None]
+        rows.append(row)
+    pd.DataFrame(rows, columns=EXCEL_REQUIRED_COLUMNS).to_excel(path, index=False)
+
+
+def best_of(repeat, fn):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def measure_bank(n_questions, repeat, workdir):
+    import question_bank
+    path = os.path.join(workdir, f"bank_{n_questions}.xlsx")
+    write_synthetic_bank(path, n_questions)
+    parse_s, (questions, report) = best_of(repeat, lambda: question_bank.load_questions_from_file(path))
+    question_bank.write_question_cache(path, question_bank.file_sha256(path), questions, report)
+    cache_s, _ = best_of(repeat, lambda: question_bank.load_questions(path))
+    return {
+        'questions': n_questions,
+        'loaded': len(questions),
+        'file_bytes': os.path.getsize(path),
+        'xlsx_parse_s': round(parse_s, 4),
+        'cache_read_s': round(cache_s, 4),
+        'parse_us_per_question': round(parse_s / n_questions * 1e6, 2),
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument('--bank-sizes', default='1000,10000',
+                        help="comma-separated question counts (default: 1000,10000)")
+    parser.add_argument('--repeat', type=int, default=3, help="best of N runs per measurement")
+
+
+def run(args):
+    sizes = [int(s) for s in args.bank_sizes.split(',') if s.strip()]
+    workdir = tempfile.mkdtemp(prefix='feud-bench-')
+    try:
+        return {'banks': [measure_bank(n, args.repeat, workdir) for n in sizes]}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    print(json.dumps({'benchmark': 'question_load', **run(args)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Measure the contestant board's update cost per frame.
+
+    python benchmarks/bench_render.py [--repeat N] [--node PATH]
+
+One full game is played through game_actions, recording the state payload a
+contestant screen receives after every action. ``render_frames.js`` replays
+those frames under Node through the incremental renderer and through the old
+innerHTML rebuild, reporting script time, DOM writes and created nodes per
+frame. Skipped when Node.js is not installed.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import logging
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_game import game_script
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'render_frames.js')
+
+
+def game_frames():
+    import app
+    import game_actions
+    from state_protocol import build_state_payload
+    bank = app.get_question_bank(app.DEFAULT_QUESTIONS_FILE)
+    count = game_actions.REQUIRED_QUESTION_COUNT
+    state = app.new_game_state()
+    frames = []
+    for action, params in game_script(count, [bank[i].answer_count for i in range(count)]):
+        game_actions.run_action(state, action, params)
+        frames.append(build_state_payload(state))
+    return frames
+
+
+def add_arguments(parser):
+    parser.add_argument('--repeat', type=int, default=2000, help="passes over the game's frames")
+    parser.add_argument('--node', default=shutil.which('node'), help="Node.js executable")
+
+
+def run(args):
+    if not args.node:
+        return {'skipped': 'node not found'}
+    payload = json.dumps({'frames': game_frames(), 'repeat': args.repeat})
+    out = subprocess.run([args.node, SCRIPT], input=payload, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    print(json.dumps({'benchmark': 'render', **run(args)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Measure memory held per live room.
+
+    python benchmarks/bench_room_memory.py [--rooms N]
+
+Rooms are created the way the app creates them, then given a round and a
+started question with a couple of answers revealed. The question bank is
+loaded before measuring, since it is shared by every room.
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure_rooms(n_rooms):
+    import app
+    bank_size = len(app.get_question_bank(app.DEFAULT_QUESTIONS_FILE))
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    rooms = []
+    for i in range(n_rooms):
+        state = app.new_game_state()
+        state.set_round_questions_and_teams([(i + k) % bank_size for k in range(4)], f"Team {i}a", f"Team {i}b")
+        state.start_next_question()
+        state.reveal_answer_by_index(0)
+        state.reveal_answer_by_index(1)
+        rooms.append(state)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return {
+        'rooms': n_rooms,
+        'bank_questions': bank_size,
+        'total_bytes': total,
+        'bytes_per_room': total / n_rooms,
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument('--rooms', type=int, default=1000)
+
+
+def run(args):
+    return measure_rooms(args.rooms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    print(json.dumps({'benchmark': 'room_memory', **run(args)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+// Replays contestant board updates through the page renderers in Node.
+// Reads {"frames": [...state payloads...], "repeat": N} on stdin and prints
+// JSON with the time and DOM work per frame for the incremental renderer
+// (static/board_render.js) and for the old innerHTML rebuild.
+//
+// The DOM is a small fake that counts writes and created nodes, so times
+// cover the script's own work; a browser's layout and paint come on top and
+// scale with the node counts reported here.
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+const counters = { writes: 0, created: 0 };
+
+class FakeElement {
+  constructor(tag, id) {
+    this.tagName = tag;
+    this.id = id || '';
+    this.children = [];
+    this.text = '';
+    this.className = '';
+    this.style = {};
+    counters.created++;
+    const el = this;
+    this.classList = {
+      add(c) { el.classList.toggle(c, true); },
+      remove(c) { el.classList.toggle(c, false); },
+      toggle(c, on) {
+        const classes = new Set(el.className.split(' ').filter(Boolean));
+        if (on === undefined ? !classes.has(c) : on) classes.add(c); else classes.delete(c);
+        el.className = [...classes].join(' ');
+        counters.writes++;
+      },
+    };
+  }
+  set textContent(value) {
+    this.children = [];
+    this.text = String(value);
+    counters.writes++;
+  }
+  get textContent() {
+    return this.text + this.children.map((c) => c.textContent).join('');
+  }
+  // Builds one element per tag, roughly what a browser's parser creates.
+  set innerHTML(html) {
+    this.children = [];
+    this.text = html.replace(/<[^>]*>/g, '');
+    const tags = html.match(/<[a-z][^>]*>/gi) || [];
+    tags.forEach((tag) => this.children.push(new FakeElement(tag.slice(1).split(/[\s>]/)[0])));
+    counters.writes++;
+  }
+  appendChild(child) {
+    this.children.push(child);
+    counters.writes++;
+    return child;
+  }
+  removeChild(child) {
+    this.children.splice(this.children.indexOf(child), 1);
+    counters.writes++;
+    return child;
+  }
+  querySelector(selector) {
+    const cls = selector.slice(1);
+    for (const child of this.children) {
+      if (child.className.split(' ').includes(cls)) return child;
+      const found = child.querySelector(selector);
+      if (found) return found;
+    }
+    return null;
+  }
+}
+
+function makeDocument() {
+  const byId = {};
+  const add = (tag, id) => (byId[id] = new FakeElement(tag, id));
+  ['question', 'strikes-display', 'giant-x', 'winnerText'].forEach((id) => add('h2', id));
+  add('ul', 'answers');
+  add('section', 'winner');
+  [1, 2].forEach((t) => {
+    const block = add('div', `T${t}Score`);
+    ['team-label', 'team-name', 'team-points'].forEach((cls) => {
+      const span = block.appendChild(new FakeElement('span'));
+      span.className = cls;
+    });
+  });
+  return {
+    getElementById: (id) => byId[id],
+    createElement: (tag) => new FakeElement(tag),
+  };
+}
+
+// The contestant page's renderer before the incremental one, with jQuery
+// calls replaced by the equivalent DOM property writes.
+function LegacyBoard(doc) {
+  const $ = (id) => doc.getElementById(id);
+  let lastStrikeCount = 0;
+  const plain = (name, score) => '<div>Team <span style="text-transform:uppercase; color:yellow;">' + name +
+    ':</span> <span class="button-55" style="font-size:150%; color:green; padding: 15px;">' + score + '</span></div>';
+  const underlined = (name, score) => '<div><span style="text-decoration: underline;text-decoration-thickness: 8px;' +
+    'text-shadow:2px 2px 10px;">Team </span> <span style="text-transform:uppercase; color:yellow;text-decoration: ' +
+    'underline;text-decoration-thickness: 8px;text-shadow:2px 2px 10px;">' + name + ':</span> <span class="button-55" ' +
+    'style="font-size:150%; color:green; padding: 15px;">' + score + '</span></div>';
+  this.render = function(data) {
+    if (data.question_shown && data.current_question) {
+      $('question').textContent = 'Question ' + data.current_question_index + ' of ' + data.total_questions + ': ' +
+        data.current_question.question;
+      let answersHtml = '';
+      data.current_question.answers.forEach((ans, index) => {
+        answersHtml += ans.revealed ? '<li>' + (index + 1) + '. ' + ans.text + ' (' + ans.points + ' pts)</li>'
+                                    : '<li>' + (index + 1) + '.</li>';
+      });
+      $('answers').innerHTML = answersHtml;
+    } else {
+      $('question').textContent = '';
+      $('answers').innerHTML = '';
+    }
+    const c = data.current_control_team;
+    $('T1Score').innerHTML = (c == 1 ? underlined : plain)(data.team1_name, data.team1_score);
+    $('T2Score').innerHTML = (c == 2 ? underlined : plain)(data.team2_name, data.team2_score);
+    $('strikes-display').textContent = 'Strikes: ' + 'X'.repeat(data.strikes);
+    if (data.strikes > lastStrikeCount) {
+      $('giant-x').textContent = 'X'.repeat(data.strikes);
+    }
+    lastStrikeCount = data.strikes;
+    if (data.winner) {
+      $('winnerText').textContent = 'Congratulations! ' + data.winner.name + ' wins with ' + data.winner.points +
+        ' points!';
+      $('winner').style.display = 'block';
+    } else {
+      $('winner').style.display = 'none';
+    }
+  };
+}
+
+function measure(makeBoard, frames, repeat) {
+  const board = makeBoard(makeDocument());
+  frames.forEach((f) => board.render(f));  // warm up
+  counters.writes = counters.created = 0;
+  const t0 = process.hrtime.bigint();
+  for (let r = 0; r < repeat; r++) {
+    frames.forEach((f) => board.render(f));
+  }
+  const elapsed = Number(process.hrtime.bigint() - t0) / 1e3;
+  const n = frames.length * repeat;
+  return {
+    us_per_frame: +(elapsed / n).toFixed(3),
+    dom_writes_per_frame: +(counters.writes / n).toFixed(2),
+    nodes_created_per_frame: +(counters.created / n).toFixed(2),
+  };
+}
+
+const input = JSON.parse(fs.readFileSync(0, 'utf8'));
+// Strike flashes schedule a timer to hide the giant X; nothing needs to run.
+globalThis.setTimeout = () => 0;
+globalThis.clearTimeout = () => {};
+vm.runInThisContext(fs.readFileSync(path.join(__dirname, '..', 'static', 'board_render.js'), 'utf8'));
+
+const incremental = measure((doc) => new FeudBoard(doc), input.frames, input.repeat);
+const legacy = measure((doc) => new LegacyBoard(doc), input.frames, input.repeat);
+process.stdout.write(JSON.stringify({
+  frames: input.frames.length,
+  repeat: input.repeat,
+  incremental,
+  legacy_innerhtml: legacy,
+  speedup: +(legacy.us_per_frame / incremental.us_per_frame).toFixed(2),
+}));
@@ -0,0 +1,132 @@
+"""Run the whole benchmark suite and write one JSON document.
+
+    python benchmarks/run_benchmarks.py [--quick] [--only game,room_memory]
+                                        [--output results.json] [--compare baseline.json]
+
+Each benchmark runs with its own defaults (or the small --quick sizes). The
+output records the git revision and Python version next to the results, so
+files from two checkouts can be compared with --compare, which prints the
+relative change of every numeric field.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import platform
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_game
+import bench_room_memory
+import bench_question_load
+import bench_render
+import bench_timers
+
+BENCHMARKS = {
+    'game': bench_game,
+    'room_memory': bench_room_memory,
+    'question_load': bench_question_load,
+    'render': bench_render,
+    'timers': bench_timers,
+}
+
+QUICK_ARGS = {
+    'game': ['--rooms', '5', '--clients', '5'],
+    'room_memory': ['--rooms', '200'],
+    'question_load': ['--bank-sizes', '100,1000', '--repeat', '1'],
+    'render': ['--repeat', '50'],
+    'timers': ['--rooms', '500', '--seconds', '30'],
+}
+
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def benchmark_args(name, argv):
+    parser = argparse.ArgumentParser(prog=name)
+    BENCHMARKS[name].add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def flatten(data, prefix=''):
+    """Numeric leaves of nested results as {'game.fanout_latency.p99_ms': value}."""
+    out = {}
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, list):
+        items = enumerate(data)
+    else:
+        if isinstance(data, (int, float)) and not isinstance(data, bool):
+            out[prefix] = data
+        return out
+    for key, value in items:
+        out.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    return out
+
+
+def compare(baseline, current):
+    old = flatten(baseline['results'])
+    new = flatten(current['results'])
+    print(f"Comparing {baseline['meta'].get('git_revision')} -> {current['meta'].get('git_revision')}")
+    for key in sorted(new):
+        if key not in old:
+            continue
+        before, after = old[key], new[key]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"  {key:<50} {before:>12g} {after:>12g} {change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help="small sizes, for a fast sanity run")
+    parser.add_argument('--only', help="comma-separated benchmark names (default: all)")
+    parser.add_argument('--output', help="write the JSON results here instead of stdout")
+    parser.add_argument('--compare', help="a previous results file to compare against")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    params, results = {}, {}
+    for name in names:
+        bench_args = benchmark_args(name, QUICK_ARGS[name] if args.quick else [])
+        params[name] = vars(bench_args)
+        t0 = time.perf_counter()
+        results[name] = BENCHMARKS[name].run(bench_args)
+        results[name]['wall_s'] = round(time.perf_counter() - t0, 3)
+
+    document = {
+        'meta': {
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'params': params,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+    else:
+        print(json.dumps(document, indent=2))
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), document)
+
+
+if __name__ == '__main__':
+    main()
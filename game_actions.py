@@ -0,0 +1,225 @@
+"""Moderator actions on a GameState, independent of how they arrive.
+
+The Flask form routes and the Socket.IO action events both go through these
+functions so the game rules live in one place. Each returns an ActionResult
+carrying the user-facing messages and the page the moderator should see next.
+"""
+
+from question_bank import MAX_ANSWERS, DEFAULT_QUESTIONS_FILE, Question
+
+REQUIRED_QUESTION_COUNT = 4
+DEFAULT_BANK_ID = 'default'
+
+# Maps an uploaded bank's id to its file; set by the app (see bank_store.BankStore.path_for).
+_bank_resolver = None
+
+
+def set_bank_resolver(resolver):
+    global _bank_resolver
+    _bank_resolver = resolver
+
+
+def resolve_bank(bank_id):
+    if not bank_id or bank_id == DEFAULT_BANK_ID:
+        return DEFAULT_QUESTIONS_FILE
+    return _bank_resolver(bank_id) if _bank_resolver else None
+
+
+class ActionResult:
+    def __init__(self, ok=True, next_page='moderator', error=None):
+        self.ok = ok
+        self.next_page = next_page
+        self.error = error
+        self.messages = []
+
+    def add(self, category, message):
+        self.messages.append((category, message))
+        return self
+
+    @classmethod
+    def failed(cls, error, next_page='moderator'):
+        result = cls(ok=False, next_page=next_page, error=error)
+        return result.add('error', error)
+
+    def to_dict(self):
+        return {
+            'ok': self.ok,
+            'next_page': self.next_page,
+            'error': self.error,
+            'messages': [{'category': c, 'message': m} for c, m in self.messages],
+        }
+
+
+def setup_round(state, selected, team1, team2, bank_version=None):
+    if len(selected) != REQUIRED_QUESTION_COUNT:
+        return ActionResult.failed(f"Please select exactly {REQUIRED_QUESTION_COUNT} questions.", 'round_setup')
+    if not team1 or not team2:
+        return ActionResult.failed("Please provide both team names.", 'round_setup')
+    # The indices refer to the bank version the host was choosing from.
+    bank = state.latest_question_bank(bank_version)
+    if bank is None:
+        return ActionResult.failed("The question bank was updated while you were choosing. Please choose again.",
+                                   'round_setup')
+    try:
+        if not all(0 <= int(i) < len(bank) for i in selected):
+            raise ValueError
+    except (TypeError, ValueError):
+        return ActionResult.failed("Invalid question selection.", 'round_setup')
+    state.set_round_questions_and_teams(selected, team1, team2, bank)
+    return ActionResult().add('success', "Round setup complete.")
+
+
+def choose_question_bank(state, bank_id):
+    path = resolve_bank(bank_id)
+    if path is None:
+        return ActionResult.failed("Unknown question bank.", 'round_setup')
+    state.choose_question_bank(path)
+    return ActionResult(next_page='round_setup').add('success', "Question bank selected for the next round.")
+
+
+def edit_question(state, index, text, answers):
+    """Replace question ``index`` for this room, or add a question if ``index`` is empty.
+
+    ``answers`` is a list of (text, points) pairs, most popular first.
+    """
+    text = (text or '').strip()
+    if not text:
+        return ActionResult.failed("Please enter the question.", 'round_setup')
+    try:
+        pairs = [(str(a).strip(), int(p)) for a, p in answers or ()]
+    except (TypeError, ValueError):
+        return ActionResult.failed("Every answer needs a whole number of points.", 'round_setup')
+    if not 1 <= len(pairs) <= MAX_ANSWERS or any(not a or p < 0 for a, p in pairs):
+        return ActionResult.failed(f"Enter between 1 and {MAX_ANSWERS} answers, each with its points.",
+                                   'round_setup')
+    bank = state.latest_question_bank(block=False)
+    if index in (None, ''):
+        index, number = None, None
+    else:
+        try:
+            index = int(index)
+            number = bank[index].question_number if 0 <= index < len(bank) else None
+        except (TypeError, ValueError):
+            index = -1
+        if not 0 <= index < len(bank):
+            return ActionResult.failed("Invalid question number.", 'round_setup')
+    try:
+        index = state.edit_question(index, Question.from_pairs(number, text, pairs))
+    except ValueError as e:
+        return ActionResult.failed(str(e), 'round_setup')
+    return ActionResult(next_page='round_setup').add('success', f"Q{index + 1} saved for this room.")
+
+
+def start_next_question(state):
+    if not state.start_next_question():
+        return ActionResult().add('info', "No more questions available.")
+    return ActionResult().add('success', "Next question started.")
+
+
+def show_question(state):
+    if not state.current_question:
+        return ActionResult.failed("No current question.")
+    state.question_shown_to_contestants = True
+    return ActionResult().add('success', "Question shown to contestants.")
+
+
+def reveal_answer(state, index):
+    if not state.question_shown_to_contestants:
+        return ActionResult.failed("You must show the question first.")
+    if state.current_question is None or index < 0 or index >= state.current_question.answer_count:
+        return ActionResult.failed("Invalid answer index.")
+    result = ActionResult()
+    if not state.is_revealed(index):
+        state.reveal_answer_by_index(index)
+        if not state.faceoff_done:
+            # The first answer revealed ends the face-off.
+            state.faceoff_done = True
+            result.next_page = 'faceoff'
+            return result
+        if state.check_all_answers_revealed():
+            if state.current_control_team is not None:
+                pts = state.award_points(state.current_control_team)
+                result.add('success', f"All answers revealed. {state.get_team_name(state.current_control_team)} awarded {pts} points.")
+                state.current_control_team = 1 if state.current_control_team == 2 else 2
+    return result
+
+
+def strike(state):
+    strikes = state.add_strike()
+    result = ActionResult().add('info', f"Strike added. Total strikes: {strikes}")
+    if strikes >= 3:
+        state.enable_steal_attempt()
+        result.add('warning', "Three strikes reached! Steal attempt enabled.")
+    return result
+
+
+def steal_success(state):
+    result = ActionResult()
+    if state.current_control_team is not None:
+        stealing_team = 1 if state.current_control_team == 2 else 2
+        pts = state.award_points(stealing_team)
+        result.add('success', f"Steal successful. {state.get_team_name(stealing_team)} awarded {pts} points.")
+        state.current_control_team = 1 if state.current_control_team == 2 else 2
+    state.is_steal_attempt = False
+    return result
+
+
+def steal_failed(state):
+    result = ActionResult()
+    if state.current_control_team is not None:
+        pts = state.award_points(state.current_control_team)
+        result.add('info', f"Steal failed. {state.get_team_name(state.current_control_team)} awarded {pts} points.")
+        state.current_control_team = 1 if state.current_control_team == 2 else 2
+    state.is_steal_attempt = False
+    return result
+
+
+def update_scores(state, team1_score, team2_score):
+    try:
+        t1 = int(team1_score)
+        t2 = int(team2_score)
+    except (TypeError, ValueError):
+        return ActionResult.failed("Invalid score values.")
+    state.set_scores(t1, t2)
+    return ActionResult().add('success', "Scores updated.")
+
+
+def faceoff(state, winner, playpass):
+    if not winner or not playpass or str(winner) not in ('1', '2'):
+        return ActionResult.failed("Select both a face-off winner and a play/pass decision.", 'faceoff')
+    state.set_faceoff_winner(winner)
+    state.apply_play_pass(playpass == "play")
+    return ActionResult().add('success', f"Face-off complete. {state.get_team_name(state.current_control_team)} will play.")
+
+
+def _reveal_params(state, params):
+    try:
+        index = int(params.get('index'))
+    except (TypeError, ValueError):
+        return ActionResult.failed("Invalid answer index.")
+    return reveal_answer(state, index)
+
+
+# Action name -> handler taking (state, params dict), for message-based callers.
+ACTIONS = {
+    'setup_round': lambda state, p: setup_round(state, p.get('questions') or [], p.get('team1'), p.get('team2'),
+                                                p.get('bank_version')),
+    'choose_question_bank': lambda state, p: choose_question_bank(state, p.get('bank')),
+    'edit_question': lambda state, p: edit_question(state, p.get('index'), p.get('question'), p.get('answers')),
+    'start': lambda state, p: start_next_question(state),
+    'show_question': lambda state, p: show_question(state),
+    'reveal': _reveal_params,
+    'strike': lambda state, p: strike(state),
+    'steal_success': lambda state, p: steal_success(state),
+    'steal_failed': lambda state, p: steal_failed(state),
+    'update_scores': lambda state, p: update_scores(state, p.get('team1_score', state.team1_score),
+                                                    p.get('team2_score', state.team2_score)),
+    'faceoff': lambda state, p: faceoff(state, p.get('faceoff_winner'), p.get('playpass')),
+}
+
+
+def run_action(state, name, params):
+    handler = ACTIONS.get(name)
+    if handler is None:
+        return ActionResult.failed(f"Unknown action: {name}")
+    return handler(state, params or {})
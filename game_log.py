@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+
+import metrics
+from game_actions import ActionResult, run_action
+from room_store import room_file_path
+
+
+class ReplayFailed(Exception):
+    """A logged action no longer applies, so the history can't rebuild the room."""
+
+    def __init__(self, name, error):
+        super().__init__(f"{name}: {error}")
+        self.name = name
+        self.error = error
+
+
+class RoomHistory:
+    """Undo/redo history of one room: a base state plus the actions applied since."""
+    __slots__ = ('state', 'base', 'done', 'undone', 'seq', 'since_snapshot')
+
+    def __init__(self, state, base, done=(), undone=(), seq=0):
+        # The live GameState this history describes; a different object means it was replaced.
+        self.state = state
+        self.base = base
+        self.done = [tuple(a) for a in done]
+        self.undone = [tuple(a) for a in undone]
+        self.seq = seq
+        self.since_snapshot = 0
+
+    def apply(self, record):
+        kind = record[1]
+        if kind == 'action':
+            self.done.append((record[2], record[3]))
+            self.undone.clear()
+        elif kind == 'undo':
+            self.undone.append(self.done.pop())
+        elif kind == 'redo':
+            self.done.append(self.undone.pop())
+        self.seq = record[0]
+
+
+class GameLog:
+    """Runs moderator actions through a per-room history with undo/redo.
+
+    Every action that changes a room is appended to its history; undo rebuilds
+    the state from the history's base by replaying all but the last action.
+    With ``log_dir`` set the history is also persisted as an append-only event
+    log per room (one JSON line per action, undo or redo) plus a snapshot every
+    ``snapshot_every`` events, so a crashed worker can restore a room by
+    replaying only the tail. Records are queued in memory and written in
+    batches by a background thread, never on the action/broadcast path.
+
+    Callers run one command per room at a time (see room_commands), so the
+    lock only guards the shared bookkeeping: actions themselves run outside
+    it, and a slow one (a round waiting for its question bank) never holds
+    up other rooms.
+    """
+
+    def __init__(self, state_factory, log_dir=None, snapshot_every=100, undo_depth=20, flush_interval=0.2):
+        self.state_factory = state_factory
+        self.log_dir = log_dir
+        self.snapshot_every = snapshot_every
+        self.undo_depth = undo_depth
+        self.flush_interval = flush_interval
+        self.histories = {}
+        self.lock = threading.Lock()
+        # (room_id, kind, record) waiting for the flusher, in order.
+        self.pending = []
+        self.write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+    def _paths(self, room_id):
+        return room_file_path(self.log_dir, room_id, '.log'), room_file_path(self.log_dir, room_id, '.snap.json')
+
+    def _replay(self, base, actions):
+        # Every action succeeded when it was logged; one that fails now (a round set up
+        # on a bank version that is no longer loaded) would put the rest on the wrong state.
+        state = self.state_factory(base)
+        for name, params in actions:
+            result = run_action(state, name, params)
+            if not result.ok:
+                raise ReplayFailed(name, result.error)
+        return state
+
+    def _history_for(self, room_id, state):
+        history = self.histories.get(room_id)
+        if history is None or history.state is not state:
+            # First action on this worker, or the state was reloaded from elsewhere:
+            # start over from what the room looks like now.
+            history = self.histories[room_id] = RoomHistory(state, state.to_dict())
+            self._queue_snapshot(room_id, history)
+        return history
+
+    def _record(self, room_id, history, *record):
+        # Called with the lock held. Returns whether the history is due for a rebase.
+        history.seq += 1
+        if self.log_dir:
+            self.pending.append((room_id, 'event', [history.seq, *record]))
+        history.since_snapshot += 1
+        return history.since_snapshot >= self.snapshot_every
+
+    def _rebase(self, room_id, history):
+        # Fold all but the last undo_depth actions into the base state. The replay
+        # runs outside the lock, since it may wait for a question bank; the room's
+        # commands run one at a time, so its history doesn't change meanwhile.
+        with self.lock:
+            cut = len(history.done) - self.undo_depth
+            base, folded = history.base, history.done[:max(cut, 0)]
+        new_base = None
+        if folded:
+            try:
+                new_base = self._replay(base, folded).to_dict()
+            except ReplayFailed as e:
+                # Keep the longer history; the next rebase tries again.
+                logging.error(f"Could not rebase game log for room {room_id}: {e}")
+        with self.lock:
+            if new_base is not None and history.done[:cut] == folded:
+                history.base = new_base
+                del history.done[:cut]
+            history.since_snapshot = 0
+            self._queue_snapshot(room_id, history)
+
+    def _queue_snapshot(self, room_id, history):
+        if self.log_dir:
+            self.pending.append((room_id, 'snapshot', {
+                'seq': history.seq,
+                'base': history.base,
+                'done': list(history.done),
+                'undone': list(history.undone),
+            }))
+
+    def perform(self, room_id, state, name, params):
+        # The room and idempotency key say how the action arrived, not what it does.
+        params = {k: v for k, v in (params or {}).items() if k not in ('room', 'key')}
+        with self.lock:
+            history = self._history_for(room_id, state)
+        revision = state.revision
+        result = run_action(state, name, params)
+        if state.revision != revision:
+            with self.lock:
+                history.done.append((name, params))
+                history.undone.clear()
+                rebase = self._record(room_id, history, 'action', name, params)
+            if rebase:
+                self._rebase(room_id, history)
+        return result
+
+    def undo(self, room_id, state):
+        with self.lock:
+            history = self.histories.get(room_id)
+            if history is None or history.state is not state or not history.done:
+                return ActionResult.failed("Nothing to undo.")
+            name, _ = history.done[-1]
+            base, done = history.base, history.done[:-1]
+        try:
+            replayed = self._replay(base, done)
+        except ReplayFailed as e:
+            logging.error(f"Could not undo in room {room_id}: {e}")
+            return ActionResult.failed(f"Cannot undo: the earlier {e.name.replace('_', ' ')} no longer applies.")
+        state.copy_from(replayed)
+        with self.lock:
+            history.undone.append(history.done.pop())
+            rebase = self._record(room_id, history, 'undo')
+        if rebase:
+            self._rebase(room_id, history)
+        return ActionResult().add('info', f"Undid {name.replace('_', ' ')}.")
+
+    def redo(self, room_id, state):
+        with self.lock:
+            history = self.histories.get(room_id)
+            if history is None or history.state is not state or not history.undone:
+                return ActionResult.failed("Nothing to redo.")
+            name, params = history.undone[-1]
+        # On a copy, so a redo that no longer applies leaves the room as it is.
+        redone = self.state_factory(state.to_dict())
+        result = run_action(redone, name, params)
+        if not result.ok:
+            logging.error(f"Could not redo {name} in room {room_id}: {result.error}")
+            return ActionResult.failed(f"Cannot redo {name.replace('_', ' ')}: {result.error}")
+        state.copy_from(redone)
+        with self.lock:
+            history.done.append(history.undone.pop())
+            rebase = self._record(room_id, history, 'redo')
+        if rebase:
+            self._rebase(room_id, history)
+        return ActionResult().add('info', f"Redid {name.replace('_', ' ')}.")
+
+    def recover(self, room_id):
+        """Rebuild a room from its snapshot and log tail, or return None if there is none."""
+        if not self.log_dir:
+            return None
+        self.flush()
+        log_path, snap_path = self._paths(room_id)
+        try:
+            with open(snap_path, 'r', encoding='utf-8') as f:
+                snap = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not read game log snapshot for room {room_id}: {e}")
+            return None
+        history = RoomHistory(None, snap['base'], snap['done'], snap['undone'], snap['seq'])
+        replayed = 0
+        try:
+            with open(log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn final write
+                    if record[0] > history.seq:
+                        history.apply(record)
+                        replayed += 1
+        except FileNotFoundError:
+            pass
+        try:
+            state = self._replay(history.base, history.done)
+        except ReplayFailed as e:
+            logging.error(f"Could not recover room {room_id} from game log: {e}")
+            return None
+        history.state = state
+        with self.lock:
+            self.histories[room_id] = history
+        logging.info(f"Recovered room {room_id} from game log ({replayed} events replayed)")
+        return state
+
+    def forget(self, room_id):
+        # The files stay behind so the room can still be recovered later.
+        with self.lock:
+            self.histories.pop(room_id, None)
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+        t0 = time.perf_counter()
+        with self.write_lock:
+            files = {}
+            try:
+                for room_id, kind, record in pending:
+                    log_path, snap_path = self._paths(room_id)
+                    if kind == 'snapshot':
+                        if room_id in files:
+                            files.pop(room_id).close()
+                        self._write_snapshot(snap_path, record)
+                        # Everything in the log is now covered by the snapshot.
+                        files[room_id] = open(log_path, 'w', encoding='utf-8')
+                        continue
+                    f = files.get(room_id)
+                    if f is None:
+                        f = files[room_id] = open(log_path, 'a', encoding='utf-8')
+                    f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            except OSError as e:
+                logging.error(f"Could not write game log: {e}")
+            finally:
+                for f in files.values():
+                    f.close()
+        metrics.game_log_flush.observe(time.perf_counter() - t0)
+        metrics.game_log_records.inc(amount=len(pending))
+
+    def _write_snapshot(self, path, record):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logging.exception("Game log flush failed")
+
+    def start(self):
+        if not self.log_dir or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='game-log-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
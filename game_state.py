@@ -0,0 +1,269 @@
+import logging
+from question_bank import DEFAULT_QUESTIONS_FILE, EMPTY_BANK, OverlayBank, get_question_bank, find_question_bank
+from metrics import log_event
+
+
+def _restore_bank(path, version):
+    bank = find_question_bank(path, version) if version else None
+    if bank is None:
+        bank = get_question_bank(path)
+        if version and bank.version != version:
+            logging.warning(f"Question bank version {version} is no longer loaded; using {bank.version}")
+    return bank
+
+
+class GameState:
+    # Hundreds of rooms may be live at once, so keep instances compact.
+    __slots__ = (
+        'revision', 'question_bank', 'chosen_indices', 'current_question_index',
+        'team1_name', 'team2_name', 'team1_score', 'team2_score', 'faceoff_winner',
+        'current_control_team', 'is_steal_attempt', 'revealed_mask', 'revealed_points',
+        'team_in_play_strikes', 'current_question', 'question_shown_to_contestants',
+        'faceoff_done', 'question_source', 'question_overlay',
+    )
+
+    def __init__(self):
+        # Bumped on every attribute assignment so cached snapshots know when to rebuild.
+        self.revision = 0
+        self.question_bank = EMPTY_BANK
+        self.chosen_indices = []
+        self.current_question_index = -1
+        self.team1_name = ""
+        self.team2_name = ""
+        self.team1_score = 0
+        self.team2_score = 0
+        self.faceoff_winner = None
+        self.current_control_team = None
+        self.is_steal_attempt = False
+        # Bit i set = answer i of the current question is revealed.
+        self.revealed_mask = 0
+        # Running total of revealed points, so awarding is O(1).
+        self.revealed_points = 0
+        self.team_in_play_strikes = 0
+        self.current_question = None
+        self.question_shown_to_contestants = False
+        self.faceoff_done = False
+        # File of the bank chosen for the next rounds (None: the current bank's file),
+        # and this room's own edits on top of it, if any.
+        self.question_source = None
+        self.question_overlay = None
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name != 'revision':
+            object.__setattr__(self, 'revision', self.revision + 1)
+
+    def touch(self):
+        # For in-place changes that bypass __setattr__.
+        object.__setattr__(self, 'revision', self.revision + 1)
+
+    def copy_from(self, other):
+        # Take over another state's contents in place, e.g. to roll back to a rebuilt state.
+        for name in self.__slots__:
+            if name != 'revision':
+                setattr(self, name, getattr(other, name))
+
+    @property
+    def answers_revealed(self):
+        count = self.current_question.answer_count if self.current_question else 0
+        return [bool(self.revealed_mask >> i & 1) for i in range(count)]
+
+    def is_revealed(self, index):
+        return bool(self.revealed_mask >> index & 1)
+
+    @property
+    def all_questions(self):
+        return self.question_bank.questions
+
+    @property
+    def chosen_questions(self):
+        return [self.question_bank[i] for i in self.chosen_indices]
+
+    def load_questions_from_excel(self, file_path: str, block=True) -> int:
+        # The bank is shared process-wide; this only re-points the room at it.
+        self.question_bank = get_question_bank(file_path, block=block)
+        return len(self.question_bank)
+
+    def latest_question_bank(self, version=None, block=True):
+        """The newest bank from this room's question source, or ``version`` of it if still loaded.
+
+        The room itself keeps the bank it has until the next round is set up.
+        A room with its own edits stays on the base version they were made against.
+        """
+        if self.question_overlay is not None:
+            if version and version != self.question_overlay.version:
+                return None
+            return self.question_overlay
+        path = self.question_source or self.question_bank.path or DEFAULT_QUESTIONS_FILE
+        if version:
+            return find_question_bank(path, version)
+        return get_question_bank(path, block=block)
+
+    def choose_question_bank(self, file_path):
+        # Used from the next round on; the room's edits belonged to the old bank.
+        self.question_source = file_path
+        self.question_overlay = None
+
+    def edit_question(self, index, question):
+        """Replace question ``index`` (or add one, if None) for this room only. Returns the question's index."""
+        bank = self.latest_question_bank(block=False)
+        if bank.loading:
+            raise ValueError("The question bank is still loading.")
+        if not isinstance(bank, OverlayBank):
+            bank = OverlayBank(bank)
+        self.question_overlay = bank.with_question(index, question)
+        log_event("question_edited", index=index)
+        return len(self.question_overlay) - 1 if index is None else index
+
+    def refresh_loading_bank(self):
+        # Rooms created while the bank was still loading pick it up once it is ready.
+        if self.question_bank.loading:
+            bank = get_question_bank(self.question_bank.path, block=False)
+            if not bank.loading:
+                self.question_bank = bank
+
+    # Fields that fully describe a room; questions themselves stay in the shared bank.
+    PERSISTED_FIELDS = (
+        'chosen_indices', 'current_question_index', 'team1_name', 'team2_name',
+        'team1_score', 'team2_score', 'faceoff_winner', 'current_control_team',
+        'is_steal_attempt', 'revealed_mask', 'team_in_play_strikes',
+        'question_shown_to_contestants', 'faceoff_done',
+    )
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.PERSISTED_FIELDS}
+        bank = self.question_bank
+        data['question_file'] = bank.path
+        if isinstance(bank, OverlayBank):
+            data['question_version'] = bank.base.version
+            data['question_edits'] = bank.to_dict()
+        else:
+            data['question_version'] = bank.version
+        data['question_source'] = self.question_source
+        if self.question_overlay is bank:
+            data['next_question_edits'] = 'current'
+        elif self.question_overlay is not None:
+            data['next_question_edits'] = self.question_overlay.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        path = data.get('question_file') or DEFAULT_QUESTIONS_FILE
+        bank = _restore_bank(path, data.get('question_version'))
+        if data.get('question_edits'):
+            bank = OverlayBank.from_dict(bank, data['question_edits'])
+        state.question_bank = bank
+        state.question_source = data.get('question_source')
+        next_edits = data.get('next_question_edits')
+        if next_edits == 'current':
+            state.question_overlay = bank
+        elif next_edits:
+            base = _restore_bank(state.question_source or path, next_edits.get('base'))
+            state.question_overlay = OverlayBank.from_dict(base, next_edits)
+        for name in cls.PERSISTED_FIELDS:
+            if name in data:
+                setattr(state, name, data[name])
+        state.chosen_indices = list(state.chosen_indices)
+        if 'answers_revealed' in data:
+            # Older snapshots stored a list of booleans.
+            state.revealed_mask = sum(1 << i for i, rev in enumerate(data['answers_revealed']) if rev)
+        if (0 <= state.current_question_index < len(state.chosen_indices)
+                and state.chosen_indices[state.current_question_index] < len(state.question_bank)):
+            state.current_question = state.question_bank[state.chosen_indices[state.current_question_index]]
+            state.revealed_points = sum(pts for i, pts in enumerate(state.current_question.points)
+                                        if state.revealed_mask >> i & 1)
+        return state
+
+    def set_round_questions_and_teams(self, chosen_indices, team1_name, team2_name, bank=None):
+        log_event("round_set", questions=list(chosen_indices))
+        if bank is not None and bank is not self.question_bank:
+            # A new round is where a room moves on to the latest question bank.
+            self.question_bank = bank
+        self.chosen_indices = [int(i) for i in chosen_indices]
+        self.team1_name = team1_name.strip()
+        self.team2_name = team2_name.strip()
+        self.team1_score = 0
+        self.team2_score = 0
+        self.current_question_index = -1
+        self.current_question = None
+        self.faceoff_done = False
+
+    def start_next_question(self):
+        self.current_question_index += 1
+        if self.current_question_index >= len(self.chosen_indices):
+            log_event("questions_exhausted")
+            self.current_question = None
+            return False
+        self.current_question = self.question_bank[self.chosen_indices[self.current_question_index]]
+        self.revealed_mask = 0
+        self.revealed_points = 0
+        self.faceoff_winner = None
+        self.current_control_team = None
+        self.is_steal_attempt = False
+        self.team_in_play_strikes = 0
+        self.question_shown_to_contestants = False
+        self.faceoff_done = False
+        log_event("question_started", number=self.current_question.question_number)
+        return True
+
+    def get_current_question_text(self):
+        return self.current_question.question if self.current_question else ""
+
+    def get_team_name(self, team_num):
+        return self.team1_name if team_num == 1 else self.team2_name
+
+    def set_faceoff_winner(self, winner_team):
+        self.faceoff_winner = int(winner_team)
+        log_event("faceoff_winner", team=self.faceoff_winner)
+
+    def apply_play_pass(self, play):
+        if self.faceoff_winner is None:
+            raise RuntimeError("Face-off winner not set")
+        self.current_control_team = self.faceoff_winner if play else (2 if self.faceoff_winner == 1 else 1)
+        log_event("play_pass", control_team=self.current_control_team)
+
+    def reveal_answer_by_index(self, index):
+        if self.current_question is None or index < 0 or index >= self.current_question.answer_count:
+            logging.error("Invalid index in reveal_answer_by_index")
+            return
+        bit = 1 << index
+        if not self.revealed_mask & bit:
+            self.revealed_mask |= bit
+            self.revealed_points += self.current_question.points[index]
+            log_event("answer_revealed", index=index)
+
+    def add_strike(self):
+        self.team_in_play_strikes += 1
+        log_event("strike", strikes=self.team_in_play_strikes)
+        return self.team_in_play_strikes
+
+    def enable_steal_attempt(self):
+        self.is_steal_attempt = True
+        log_event("steal_enabled")
+
+    def check_all_answers_revealed(self):
+        count = self.current_question.answer_count if self.current_question else 0
+        return self.revealed_mask == (1 << count) - 1
+
+    def award_points(self, team_num):
+        total = self.revealed_points
+        if team_num == 1:
+            self.team1_score += total
+        else:
+            self.team2_score += total
+        log_event("points_awarded", team=team_num, points=total)
+        return total
+
+    def steal_successful(self):
+        stealing_team = 1 if self.current_control_team == 2 else 2
+        log_event("steal_successful", team=stealing_team)
+        return stealing_team
+
+    def scores(self):
+        return self.team1_score, self.team2_score
+
+    def set_scores(self, t1, t2):
+        self.team1_score = t1
+        self.team2_score = t2
+        log_event("scores_set", team1=t1, team2=t2)
@@ -0,0 +1,204 @@
+"""In-process metrics in the Prometheus text exposition format, and sampled event logging.
+
+Hot paths record into module-level Counter/Histogram objects, which only
+take a lock and add a number. Values that are cheap to read at scrape time
+(live rooms, connected sockets) are registered as gauge callbacks instead of
+being tracked on every change. ``REGISTRY.render()`` produces the /metrics body.
+
+``log_event`` replaces per-action INFO logging: events are written as one JSON
+object per line at DEBUG level on the ``feud.events`` logger, only a
+``FEUD_LOG_SAMPLE`` fraction of them, and nothing is formatted unless the
+logger is enabled.
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; covers in-process actions (tens of microseconds) up to slow Excel parses.
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        for label_values, value in items:
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(label_values)
+            if entry is None:
+                entry = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *label_values)
+
+    def samples(self):
+        with self.lock:
+            items = [(k, (list(v[0]), v[1])) for k, v in self.values.items()]
+        for label_values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield (f'{self.name}_bucket',
+                       _format_labels(self.labels, label_values, ('le', _format_value(float(bound)))),
+                       cumulative)
+            yield f'{self.name}_sum', _format_labels(self.labels, label_values), total
+            yield f'{self.name}_count', _format_labels(self.labels, label_values), cumulative
+
+
+class GaugeCallback:
+    """A gauge read at scrape time. ``fn`` returns a number, or a dict of label value tuple -> number."""
+    kind = 'gauge'
+
+    def __init__(self, name, help, fn, labels=()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labels = tuple(labels)
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            logging.exception(f"Gauge {self.name} failed")
+            return
+        if not isinstance(value, dict):
+            value = {(): value}
+        for label_values, v in value.items():
+            yield self.name, _format_labels(self.labels, label_values), v
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        # Re-registering a name replaces it (asgi_app swaps in its own socket gauges).
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, fn, labels=()):
+        return self.register(GaugeCallback(name, help, fn, labels))
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+http_requests = REGISTRY.counter(
+    'feud_http_requests_total', "HTTP requests by endpoint, method and status.", ('endpoint', 'method', 'status'))
+http_duration = REGISTRY.histogram(
+    'feud_http_request_duration_seconds', "HTTP request latency by endpoint.", ('endpoint',))
+socket_actions = REGISTRY.counter(
+    'feud_socket_actions_total', "Moderator actions received over Socket.IO.", ('action', 'ok'))
+socket_action_duration = REGISTRY.histogram(
+    'feud_socket_action_duration_seconds', "Socket.IO moderator action latency, including the broadcast.",
+    ('action',))
+broadcast_build = REGISTRY.histogram(
+    'feud_broadcast_build_seconds', "Time to commit a room and build its payload and diff.")
+broadcast_emit = REGISTRY.histogram(
+    'feud_broadcast_emit_seconds', "Time to hand a state message to every socket in the room.", ('kind',))
+broadcast_bytes = REGISTRY.histogram(
+    'feud_broadcast_payload_bytes', "Encoded size of broadcast state messages.", ('kind',), SIZE_BUCKETS)
+question_load = REGISTRY.histogram(
+    'feud_question_load_seconds', "Question bank load time by source.", ('source',))
+game_log_flush = REGISTRY.histogram(
+    'feud_game_log_flush_seconds', "Time to write one batch of game log records.")
+game_log_records = REGISTRY.counter(
+    'feud_game_log_records_total', "Game log events and snapshots written.")
+bank_uploads = REGISTRY.counter(
+    'feud_question_bank_uploads_total', "Question bank uploads by result.", ('result',))
+room_command_wait = REGISTRY.histogram(
+    'feud_room_command_wait_seconds', "Time a room command waited for the room's earlier commands.")
+room_command_replays = REGISTRY.counter(
+    'feud_room_command_replays_total', "Commands answered with the result of an earlier one with the same key.")
+timer_expiries = REGISTRY.counter(
+    'feud_timer_expiries_total', "Round clocks that ran out, by clock.", ('kind',))
+room_store_flush = REGISTRY.histogram(
+    'feud_room_store_flush_seconds', "Time to write one batch of rooms to SQLite.")
+
+LOG_SAMPLE_RATE = float(os.environ.get('FEUD_LOG_SAMPLE', 1.0))
+event_logger = logging.getLogger('feud.events')
+
+
+def log_event(event, **fields):
+    if not event_logger.isEnabledFor(logging.DEBUG):
+        return
+    if LOG_SAMPLE_RATE < 1.0 and random.random() >= LOG_SAMPLE_RATE:
+        return
+    event_logger.debug(json.dumps(dict(fields, event=event), default=str))
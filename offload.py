@@ -0,0 +1,84 @@
+"""Bounded worker pool for CPU-heavy jobs such as parsing question workbooks.
+
+Jobs run in a process pool of ``FEUD_PARSE_WORKERS`` processes (0 uses one
+background thread instead), so pandas never holds the server's event loop.
+``wait`` polls the job with the server's own sleep function (eventlet.sleep
+under eventlet, see ``set_sleep``), letting every other socket keep being
+served while a request waits for its result.
+
+Workers are spawned, so like any multiprocessing code the script that starts
+the server must keep its startup under ``if __name__ == '__main__':`` (app.py
+guards its own background work the same way).
+"""
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, BrokenExecutor
+
+POOL_SIZE = int(os.environ.get('FEUD_PARSE_WORKERS', 2))
+# Longest a request waits for a job before giving up on it (the job itself keeps running).
+DEFAULT_TIMEOUT = float(os.environ.get('FEUD_PARSE_TIMEOUT', 60))
+POLL_INTERVAL = 0.02
+
+_pool = None
+_pool_lock = threading.Lock()
+_sleep = time.sleep
+
+
+def set_sleep(sleep):
+    global _sleep
+    _sleep = sleep
+
+
+def pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if POOL_SIZE > 0:
+                    # spawn: the server has threads (and maybe eventlet) that must not be forked.
+                    _pool = ProcessPoolExecutor(max_workers=POOL_SIZE,
+                                                mp_context=multiprocessing.get_context('spawn'))
+                else:
+                    _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='offload')
+    return _pool
+
+
+def submit(fn, *args):
+    global _pool
+    try:
+        return pool().submit(fn, *args)
+    except BrokenExecutor:
+        # A worker died (killed, out of memory); start a fresh pool rather than failing forever.
+        logging.error("Background job pool is broken; starting a new one")
+        with _pool_lock:
+            _pool = None
+        return pool().submit(fn, *args)
+
+
+def wait(future, timeout=None):
+    """Return the job's result, yielding to other greenlets/threads while it runs.
+
+    Raises TimeoutError after ``timeout`` seconds (default ``DEFAULT_TIMEOUT``).
+    """
+    deadline = time.monotonic() + (DEFAULT_TIMEOUT if timeout is None else timeout)
+    while not future.done():
+        if time.monotonic() >= deadline:
+            raise TimeoutError("Background job did not finish in time")
+        _sleep(POLL_INTERVAL)
+    return future.result()
+
+
+def run(fn, *args, timeout=None):
+    return wait(submit(fn, *args), timeout)
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+            logging.info("Background job pool shut down")
@@ -0,0 +1,746 @@
+import gc
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+import weakref
+from array import array
+from collections import namedtuple
+from contextlib import contextmanager
+
+import metrics
+import offload
+
+MAX_ANSWERS = 10
+EXCEL_REQUIRED_COLUMNS = [
+    'Question Number', 'Survey Question',
+    'Answer 1', 'Answer 1 points',
+    'Answer 2', 'Answer 2 points',
+    'Answer 3', 'Answer 3 points',
+    'Answer 4', 'Answer 4 points',
+    'Answer 5', 'Answer 5 points',
+    'Answer 6', 'Answer 6 points',
+    'Answer 7', 'Answer 7 points',
+    'Answer 8', 'Answer 8 points',
+    'Answer 9', 'Answer 9 points',
+    'Answer 10', 'Answer 10 points'
+]
+DEFAULT_QUESTIONS_FILE = "ff_questions.xlsx"
+# Bump when the layout of the compiled cache changes.
+CACHE_FORMAT_VERSION = 4
+CACHE_SUFFIX = ".cache.json"
+
+
+class Question(namedtuple('Question', 'question_number question texts points')):
+    """Immutable survey question: answer texts as a tuple, their points packed in an ``array('i')``."""
+    __slots__ = ()
+
+    @classmethod
+    def from_pairs(cls, question_number, question, answers):
+        texts = tuple(text for text, _ in answers)
+        return cls(question_number, question, texts, array('i', (pts for _, pts in answers)))
+
+    @property
+    def answers(self):
+        return tuple(zip(self.texts, self.points))
+
+    @property
+    def answer_count(self):
+        return len(self.texts)
+
+    def to_list(self):
+        return [self.question_number, self.question, list(self.texts), self.points.tolist()]
+
+    @classmethod
+    def from_list(cls, data):
+        number, text, texts, points = data
+        return cls(number, text, tuple(texts), array('i', points))
+
+
+class QuestionBank:
+    """Read-only set of questions shared by every room in the process.
+
+    Rooms keep indices into ``questions`` rather than their own copies.
+    """
+
+    def __init__(self, questions, path=None, mtime=None, report=None, version=None, loading=False):
+        self.questions = tuple(questions)
+        self.path = path
+        self.mtime = mtime
+        self.report = report
+        # Short content hash of the source, the same in every worker.
+        self.version = version
+        # True for the empty stand-in handed out while the real bank is parsed in the background.
+        self.loading = loading
+        self._index = None
+        self._index_lock = threading.Lock()
+
+    @property
+    def index(self):
+        """Search index over the bank, built on first use."""
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    from question_index import QuestionIndex
+                    self._index = QuestionIndex(self.questions)
+        return self._index
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __getitem__(self, index):
+        return self.questions[index]
+
+    def __iter__(self):
+        return iter(self.questions)
+
+
+EMPTY_BANK = QuestionBank([])
+
+
+class OverlayBank:
+    """A room's own edits on top of a shared bank, copy-on-write.
+
+    Only replaced and added questions are stored here; every other index
+    reads through to ``base``. Added questions get the indices after the
+    base's. Editing returns a new OverlayBank, so a round that has pinned
+    this one is not affected.
+    """
+
+    def __init__(self, base, edits=None, added=()):
+        self.base = base
+        self.edits = dict(edits or {})
+        self.added = tuple(added)
+        self.path = base.path
+        self.mtime = base.mtime
+        self.report = base.report
+        self.loading = False
+        digest = hashlib.sha256(json.dumps(self.to_dict()['edits'], sort_keys=True).encode('utf-8'))
+        digest.update(json.dumps([q.to_list() for q in self.added]).encode('utf-8'))
+        # Changes with every edit, so a choice made against an older overlay is detected.
+        self.version = f"{base.version}+{digest.hexdigest()[:8]}"
+        self._index = None
+        self._index_lock = threading.Lock()
+
+    @property
+    def questions(self):
+        return self
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    from question_index import OverlayIndex
+                    self._index = OverlayIndex(self)
+        return self._index
+
+    def is_edited(self, index):
+        return index in self.edits or index >= len(self.base)
+
+    def with_question(self, index, question):
+        """A copy with ``question`` at ``index`` (an existing question), or added at the end if ``index`` is None."""
+        n = len(self.base)
+        if index is None:
+            return OverlayBank(self.base, self.edits, self.added + (question,))
+        if 0 <= index < n:
+            edits = dict(self.edits)
+            edits[index] = question
+            return OverlayBank(self.base, edits, self.added)
+        if n <= index < len(self):
+            added = list(self.added)
+            added[index - n] = question
+            return OverlayBank(self.base, self.edits, added)
+        raise IndexError(index)
+
+    def __len__(self):
+        return len(self.base) + len(self.added)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        question = self.edits.get(index)
+        if question is not None:
+            return question
+        n = len(self.base)
+        if index >= n:
+            return self.added[index - n]
+        return self.base[index]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_dict(self):
+        return {
+            'base': self.base.version,
+            'edits': {str(i): q.to_list() for i, q in sorted(self.edits.items())},
+            'added': [q.to_list() for q in self.added],
+        }
+
+    @classmethod
+    def from_dict(cls, base, data):
+        edits = {int(i): Question.from_list(q) for i, q in data.get('edits', {}).items()}
+        if base.version != data.get('base'):
+            dropped = [i for i in edits if i >= len(base)]
+            if dropped:
+                logging.warning(f"Dropping edits to questions {dropped}, which are not in bank {base.version}")
+            edits = {i: q for i, q in edits.items() if i < len(base)}
+        return cls(base, edits, [Question.from_list(q) for q in data.get('added', [])])
+
+
+class LoadReport:
+    """Summary of a question-bank load: how many rows were kept and why others were not.
+
+    ``row`` values are 1-based data rows (the header is not counted).
+    """
+
+    def __init__(self, source=None, total_rows=0):
+        self.source = source
+        self.total_rows = total_rows
+        self.loaded = 0
+        self.skipped = []
+        self.warnings = []
+
+    def skip(self, row, reason):
+        self.skipped.append({'row': row, 'reason': reason})
+
+    def warn(self, row, column, reason):
+        self.warnings.append({'row': row, 'column': column, 'reason': reason})
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'total_rows': self.total_rows,
+            'loaded': self.loaded,
+            'skipped': self.skipped,
+            'warnings': self.warnings,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        report = cls(data.get('source'), data.get('total_rows', 0))
+        report.loaded = data.get('loaded', 0)
+        report.skipped = list(data.get('skipped', []))
+        report.warnings = list(data.get('warnings', []))
+        return report
+
+
+def _records_to_columns(records):
+    # Accept the native {"question", "answers": [[text, points], ...]} shape for JSON banks.
+    rows = []
+    for n, rec in enumerate(records, start=1):
+        row = {
+            'Question Number': rec.get('question_number', n),
+            'Survey Question': rec.get('question'),
+        }
+        for i, answer in enumerate(rec.get('answers') or [], start=1):
+            if i > MAX_ANSWERS:
+                break
+            if isinstance(answer, dict):
+                text, points = answer.get('text'), answer.get('points')
+            else:
+                text, points = answer
+            row[f'Answer {i}'] = text
+            row[f'Answer {i} points'] = points
+        rows.append(row)
+    return rows
+
+
+def read_xlsx_columns(file_path):
+    """Stream an .xlsx sheet row by row (openpyxl read-only mode) into a DataFrame of just the required columns.
+
+    The header is checked before any data row is read, and the rest of the
+    sheet is never materialized as a whole.
+    """
+    import pandas as pd
+    from openpyxl import load_workbook
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = wb.worksheets[0]
+        # Saved dimensions can be stale or huge; without them rows are not padded out to them.
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else None for h in next(rows, ())]
+        missing = [col for col in EXCEL_REQUIRED_COLUMNS if col not in header]
+        if missing:
+            raise ValueError(f"Missing required column: {missing[0]}")
+        positions = [header.index(col) for col in EXCEL_REQUIRED_COLUMNS]
+        columns = [[] for _ in positions]
+        width = max(positions) + 1
+        for row in rows:
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            if all(row[p] is None for p in positions):
+                continue  # formatting-only rows at the end of a sheet
+            for values, p in zip(columns, positions):
+                values.append(row[p])
+    finally:
+        wb.close()
+    # object columns keep each cell as openpyxl returned it, like pd.read_excel does for mixed columns
+    return pd.DataFrame(dict(zip(EXCEL_REQUIRED_COLUMNS, columns)), columns=EXCEL_REQUIRED_COLUMNS, dtype=object)
+
+
+def read_question_table(file_path):
+    """Read a question bank file into a DataFrame in the ``EXCEL_REQUIRED_COLUMNS`` layout."""
+    import pandas as pd
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        return read_xlsx_columns(file_path)
+    if ext == '.xls':
+        return pd.read_excel(file_path)
+    if ext == '.csv':
+        return pd.read_csv(file_path)
+    if ext == '.parquet':
+        try:
+            return pd.read_parquet(file_path)
+        except ImportError as e:
+            raise ValueError(f"Parquet support needs pyarrow or fastparquet: {e}")
+    if ext == '.json':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('questions', [])
+        if data and isinstance(data[0], dict) and 'Survey Question' not in data[0]:
+            data = _records_to_columns(data)
+        return pd.DataFrame(data, columns=EXCEL_REQUIRED_COLUMNS)
+    raise ValueError(f"Unsupported question bank format: {ext or file_path}")
+
+
+@contextmanager
+def _gc_paused():
+    # Building ~1M small tuples otherwise triggers repeated full collections.
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def questions_from_dataframe(df, source=None):
+    """Build question dicts from a DataFrame, working on whole answer/points columns at once.
+
+    Each question keeps its leading run of complete answer/points pairs. Rows
+    without question text or without any valid answer are skipped; invalid or
+    incomplete cells and answers dropped after a gap are reported as warnings.
+    Returns ``(questions, report)``.
+    """
+    import numpy as np
+    import pandas as pd
+    for col in EXCEL_REQUIRED_COLUMNS:
+        if col not in df.columns:
+            error_msg = f"Missing required column: {col}"
+            logging.error(error_msg)
+            raise ValueError(error_msg)
+    n = len(df)
+    report = LoadReport(source, n)
+    if n == 0:
+        return [], report
+
+    texts = df['Survey Question']
+    text_ok = texts.notna().to_numpy() & (texts.astype(str).str.strip() != '').to_numpy()
+
+    ans_cols = [df[f'Answer {i}'] for i in range(1, MAX_ANSWERS + 1)]
+    raw_pts = [df[f'Answer {i} points'] for i in range(1, MAX_ANSWERS + 1)]
+    num_pts = [pd.to_numeric(col, errors='coerce') for col in raw_pts]
+
+    ans_present = np.column_stack([c.notna().to_numpy() for c in ans_cols])
+    pts_present = np.column_stack([c.notna().to_numpy() for c in raw_pts])
+    pts_valid = np.column_stack([c.notna().to_numpy() for c in num_pts])
+    pair_ok = ans_present & pts_valid
+    # Length of the leading run of complete pairs in each row.
+    counts = np.cumprod(pair_ok, axis=1).sum(axis=1)
+    keep = text_ok & (counts > 0)
+
+    bad_pts = pts_present & ~pts_valid
+    half_pair = ans_present ^ pts_present
+    after_gap = pair_ok & (np.arange(MAX_ANSWERS) >= counts[:, None])
+    for reason, mask in (("invalid points value", bad_pts),
+                         ("answer and points must both be set", half_pair & ~bad_pts),
+                         ("answer ignored after an earlier gap", after_gap)):
+        for r, c in zip(*np.nonzero(mask)):
+            report.warn(int(r) + 1, f'Answer {c + 1}', reason)
+    for r in np.nonzero(~text_ok)[0]:
+        report.skip(int(r) + 1, "missing question text")
+    for r in np.nonzero(text_ok & (counts == 0))[0]:
+        report.skip(int(r) + 1, "no valid answers")
+    report.skipped.sort(key=lambda item: item['row'])
+
+    with _gc_paused():
+        questions = _build_questions(df, texts, ans_cols, num_pts, counts, np.nonzero(keep)[0].tolist())
+    report.loaded = len(questions)
+    if report.skipped or report.warnings:
+        logging.warning(f"{source or 'question bank'}: skipped {len(report.skipped)} rows, "
+                        f"{len(report.warnings)} cell warnings")
+    return questions, report
+
+
+def _build_questions(df, texts, ans_cols, num_pts, counts, rows):
+    # Only the kept rows, and only as many columns as the longest of them
+    # uses, are pulled out of the frame, as one 2-D array each for answers
+    # and points. Answer columns that hold nothing but strings are used as
+    # they are rather than converted cell by cell.
+    import numpy as np
+    if not rows:
+        return []
+    rows = np.asarray(rows, dtype=np.intp)
+    counts = counts[rows]
+    width = int(counts.max())
+    answers = np.column_stack([_str_cells(c, rows) for c in ans_cols[:width]]).tolist()
+    points = np.column_stack([p.to_numpy(dtype='float64', na_value=0)[rows]
+                              for p in num_pts[:width]]).astype('int64').tolist()
+    numbers = df['Question Number'].to_numpy()[rows]
+    if numbers.dtype.kind in 'iu':
+        numbers = numbers.tolist()
+    else:
+        numbers = [_plain_number(n) for n in numbers.tolist()]
+    return [
+        Question(number, text, tuple(row[:k]), array('i', pts[:k]))
+        for number, text, row, pts, k in zip(numbers, _str_cells(texts, rows).tolist(), answers, points,
+                                             counts.tolist())
+    ]
+
+
+def _str_cells(col, rows):
+    from pandas.api.types import infer_dtype
+    values = col.to_numpy()[rows]
+    # Cells past a row's answer count may be NaN; they are sliced off later.
+    if values.dtype == object and infer_dtype(values, skipna=True) == 'string':
+        return values
+    return col.iloc[rows].astype(str).to_numpy(dtype=object)
+
+
+def load_questions_from_file(file_path):
+    """Parse an xlsx/CSV/Parquet/JSON question bank. Returns ``(questions, report)``."""
+    logging.info(f"Loading questions from {file_path}")
+    questions, report = questions_from_dataframe(read_question_table(file_path), source=file_path)
+    logging.info(f"Loaded {len(questions)} questions.")
+    return questions, report
+
+
+def load_questions_from_excel(file_path: str) -> list:
+    return load_questions_from_file(file_path)[0]
+
+
+def _plain_number(value):
+    # numpy scalars are not JSON serialisable; NaN becomes None.
+    if value is None or value != value:
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path_for(file_path):
+    return file_path + CACHE_SUFFIX
+
+
+def read_question_cache(file_path, source_hash):
+    """Return ``(questions, report)`` from the compiled cache, or None if it is missing or stale."""
+    try:
+        with open(cache_path_for(file_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != CACHE_FORMAT_VERSION or data.get('source_sha256') != source_hash:
+        return None
+    questions = [Question.from_list(q) for q in data['questions']]
+    return questions, LoadReport.from_dict(data.get('report', {}))
+
+
+def write_question_cache(file_path, source_hash, questions, report):
+    data = {
+        'version': CACHE_FORMAT_VERSION,
+        'source_sha256': source_hash,
+        'report': report.to_dict(),
+        'questions': [q.to_list() for q in questions],
+    }
+    cache_path = cache_path_for(file_path)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logging.warning(f"Could not write question cache {cache_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _load_questions_timed(file_path, source_hash):
+    t0 = time.perf_counter()
+    cached = read_question_cache(file_path, source_hash)
+    if cached is not None:
+        logging.info(f"Loaded {len(cached[0])} questions from cache for {file_path}")
+        return cached[0], cached[1], 'cache', time.perf_counter() - t0
+    questions, report = load_questions_from_file(file_path)
+    write_question_cache(file_path, source_hash, questions, report)
+    return questions, report, 'parse', time.perf_counter() - t0
+
+
+def load_questions(file_path, source_hash=None):
+    """Load ``(questions, report)`` from the compiled cache, rebuilding it from the source when stale."""
+    if source_hash is None:
+        source_hash = file_sha256(file_path)
+    questions, report, source, seconds = _load_questions_timed(file_path, source_hash)
+    metrics.question_load.observe(seconds, source)
+    return questions, report
+
+
+def compile_question_cache(file_path=DEFAULT_QUESTIONS_FILE):
+    """Build step: parse the question source and (re)write its compiled cache."""
+    questions, report = load_questions_from_file(file_path)
+    write_question_cache(file_path, file_sha256(file_path), questions, report)
+    return report
+
+
+# Process-wide cache of loaded banks: the latest per absolute path, plus every
+# version some room still holds on to (rooms mid-round stay on their version).
+_banks = {}
+_bank_versions = weakref.WeakValueDictionary()
+# Content hash -> a loaded bank with that content, so identical files share one set of questions.
+_bank_contents = weakref.WeakValueDictionary()
+_banks_lock = threading.RLock()
+# Set while a QuestionBankWatcher is running; it then owns reloading.
+_watcher = None
+# path -> Future of a load running in the offload pool
+_loading = {}
+# path -> mtime of a version that failed to load, so it is not parsed again on every call
+_failed_loads = {}
+
+
+def _read_bank(path):
+    """Runs in a pool worker: everything needed to build the QuestionBank, in picklable form."""
+    mtime = os.stat(path).st_mtime
+    source_hash = file_sha256(path)
+    questions, report, source, seconds = _load_questions_timed(path, source_hash)
+    return questions, report, mtime, source_hash[:12], source, seconds
+
+
+def _start_load(path, mtime=None):
+    with _banks_lock:
+        future = _loading.get(path)
+        if future is None:
+            future = _loading[path] = offload.submit(_read_bank, path)
+            future.mtime = mtime
+            future.add_done_callback(lambda f: _finish_load(path, f))
+        return future
+
+
+def _finish_load(path, future):
+    """Install a finished load's bank, once, whether the pool callback or a waiter gets here first."""
+    with _banks_lock:
+        if _loading.get(path) is future:
+            del _loading[path]
+        if hasattr(future, 'bank'):
+            return future.bank
+        future.bank = None
+        try:
+            questions, report, mtime, version, source, seconds = future.result()
+        except Exception as e:
+            logging.error(f"Error loading questions from {path}: {e}")
+            if getattr(future, 'mtime', None) is not None:
+                _failed_loads[path] = future.mtime
+            return None
+        _failed_loads.pop(path, None)
+        metrics.question_load.observe(seconds, source)
+        same = _bank_contents.get(version)
+        if same is not None:
+            questions = same.questions
+        bank = future.bank = QuestionBank(questions, path=path, mtime=mtime, report=report, version=version)
+        if same is not None:
+            bank._index = same._index
+        _bank_contents.setdefault(version, bank)
+        _banks[path] = bank
+        _bank_versions[(path, bank.version)] = bank
+        return bank
+
+
+def loading_bank(path):
+    return QuestionBank([], path=path, loading=True)
+
+
+def get_question_bank(file_path=DEFAULT_QUESTIONS_FILE, block=True):
+    """Return the latest shared bank for ``file_path``.
+
+    Loads run in the offload pool. With ``block`` the caller waits for a load
+    (cooperatively, up to the pool timeout); without it, the previous version
+    is returned while a newer one loads, or a ``loading`` stand-in if there is
+    none yet. Without a running watcher the file's mtime is checked on every
+    call; with one, only the first load happens here. A file that fails to
+    load is logged and not tried again until its mtime changes; the previous
+    version (or ``EMPTY_BANK``) is returned meanwhile.
+    """
+    path = os.path.abspath(file_path)
+    bank = _banks.get(path)
+    if bank is not None and _watcher is not None and _watcher.is_alive():
+        return bank
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        logging.error(f"{file_path} not found.")
+        return bank if bank is not None else EMPTY_BANK
+    if bank is not None and bank.mtime == mtime:
+        return bank
+    if _failed_loads.get(path) == mtime:
+        return bank if bank is not None else EMPTY_BANK
+    future = _start_load(path, mtime)
+    if block:
+        try:
+            offload.wait(future)
+        except TimeoutError:
+            logging.error(f"Timed out waiting for {path} to load")
+        except Exception:
+            pass  # logged and remembered by _finish_load below
+        if future.done():
+            try:
+                loaded = _finish_load(path, future)
+            except Exception:
+                logging.exception(f"Could not install question bank {path}")
+                loaded = None
+            if loaded is not None:
+                return loaded
+    if bank is not None:
+        return bank
+    return loading_bank(path) if not future.done() else EMPTY_BANK
+
+
+def load_question_bank(file_path, timeout=None):
+    """Load ``file_path`` in the pool and return its bank, raising the load error instead of logging it.
+
+    For uploads, where the caller has to tell the user what is wrong with the file.
+    A file that is already loaded is not parsed again.
+    """
+    path = os.path.abspath(file_path)
+    bank = _banks.get(path)
+    if bank is not None and bank.mtime == os.stat(path).st_mtime:
+        return bank
+    future = _start_load(path)
+    offload.wait(future, timeout)
+    future.result()
+    return _finish_load(path, future)
+
+
+def when_loaded(file_path, callback):
+    """Call ``callback(bank, error)`` once ``file_path`` has loaded, sharing a load already running.
+
+    For uploads the caller stopped waiting on. ``bank`` is None when the load
+    failed; the callback may run on a pool thread, or right away.
+    """
+    path = os.path.abspath(file_path)
+    bank = _banks.get(path)
+    if bank is not None and bank.mtime == os.stat(path).st_mtime:
+        callback(bank, None)
+        return
+
+    def done(future):
+        error = future.exception()
+        callback(_finish_load(path, future) if error is None else None, error)
+
+    _start_load(path).add_done_callback(done)
+
+
+def installed_banks():
+    """(path, version) of the latest bank for every loaded file."""
+    return [(path, bank.version) for path, bank in list(_banks.items())]
+
+
+def find_question_bank(file_path, version):
+    """Return a specific loaded version of a bank, or None if no room holds it any more."""
+    path = os.path.abspath(file_path)
+    bank = _bank_versions.get((path, version))
+    if bank is None:
+        latest = get_question_bank(path)
+        if latest.version == version:
+            return latest
+    return bank
+
+
+def clear_question_banks():
+    with _banks_lock:
+        _banks.clear()
+        _bank_versions.clear()
+        _bank_contents.clear()
+        _failed_loads.clear()
+
+
+class QuestionBankWatcher(threading.Thread):
+    """Polls every loaded bank's source file and reloads it through the offload pool when it changes.
+
+    The new version replaces the latest bank in one assignment; rooms that
+    still point at the old version keep using it until their next round.
+    """
+
+    def __init__(self, interval=2.0):
+        super().__init__(name='question-bank-watcher', daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        # path -> (mtime, size) at the previous poll, and of the last file that failed to load
+        self.last_seen = {}
+        self.failed = {}
+
+    def check(self):
+        for path, bank in list(_banks.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # keep serving the last good version
+            signature = (st.st_mtime, st.st_size)
+            previous = self.last_seen.get(path)
+            self.last_seen[path] = signature
+            if st.st_mtime == bank.mtime or self.failed.get(path) == signature:
+                continue
+            if previous != signature or st.st_size == 0:
+                continue  # still being written; wait until it holds still for one poll
+            future = _start_load(path)
+            try:
+                future.result()
+            except Exception as e:
+                logging.warning(f"Could not reload {path}, keeping version {bank.version}: {e}")
+                self.failed[path] = signature
+                continue
+            new_bank = _finish_load(path, future)
+            logging.info(f"Question bank {path} updated: version {bank.version} -> {new_bank.version} "
+                         f"({len(new_bank)} questions)")
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logging.exception("Question bank watcher failed")
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start_question_bank_watcher(interval=2.0):
+    global _watcher
+    if _watcher is None or not _watcher.is_alive():
+        _watcher = QuestionBankWatcher(interval)
+        _watcher.start()
+    return _watcher
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for path in sys.argv[1:] or [DEFAULT_QUESTIONS_FILE]:
+        report = compile_question_cache(path)
+        print(f"Compiled {report.loaded} of {report.total_rows} rows from {path} to {cache_path_for(path)}")
+        for item in report.skipped:
+            print(f"  skipped row {item['row']}: {item['reason']}")
+        for item in report.warnings:
+            print(f"  row {item['row']} {item['column']}: {item['reason']}")
@@ -0,0 +1,102 @@
+import re
+import random
+from array import array
+from bisect import bisect_left
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+class QuestionIndex:
+    """Inverted index over a question bank's question and answer text.
+
+    ``postings`` maps each word to the sorted indices of the questions that
+    contain it. The sorted vocabulary makes prefix lookups a bisect. Answer
+    counts and point totals are kept in parallel arrays for filtering.
+    """
+
+    def __init__(self, questions):
+        postings = {}
+        self.answer_counts = array('i')
+        self.total_points = array('i')
+        for i, q in enumerate(questions):
+            words = set(tokenize(q.question))
+            for text in q.texts:
+                words.update(tokenize(text))
+            for word in words:
+                postings.setdefault(word, []).append(i)
+            self.answer_counts.append(q.answer_count)
+            self.total_points.append(sum(q.points))
+        self.size = len(self.answer_counts)
+        self.postings = {word: array('i', ids) for word, ids in postings.items()}
+        self.vocabulary = sorted(self.postings)
+
+    def _prefix_matches(self, prefix):
+        ids = set()
+        start = bisect_left(self.vocabulary, prefix)
+        for word in self.vocabulary[start:]:
+            if not word.startswith(prefix):
+                break
+            ids.update(self.postings[word])
+        return ids
+
+    def match(self, query):
+        """Indices of questions containing every word of ``query``; the last word may be a prefix."""
+        words = tokenize(query)
+        if not words:
+            return None  # no text filter
+        *keywords, last = words
+        sets = [set(self.postings.get(word, ())) for word in keywords]
+        sets.append(self._prefix_matches(last))
+        sets.sort(key=len)
+        result = sets[0]
+        for other in sets[1:]:
+            result &= other
+        return sorted(result)
+
+    def search(self, query='', min_answers=None, max_answers=None, min_points=None, max_points=None):
+        """Indices matching the text query and filters, in bank order."""
+        candidates = self.match(query)
+        if candidates is None:
+            candidates = range(self.size)
+        if min_answers is None and max_answers is None and min_points is None and max_points is None:
+            return candidates
+        counts, points = self.answer_counts, self.total_points
+        return [i for i in candidates
+                if (min_answers is None or counts[i] >= min_answers)
+                and (max_answers is None or counts[i] <= max_answers)
+                and (min_points is None or points[i] >= min_points)
+                and (max_points is None or points[i] <= max_points)]
+
+    def sample(self, ids, k):
+        return sorted(random.sample(list(ids), min(k, len(ids))))
+
+
+class OverlayIndex:
+    """Search over an OverlayBank without copying the base index.
+
+    The shared base index is searched as usual, replaced questions are
+    dropped from its results, and the overlay's own few questions are
+    searched through a small index of their own.
+    """
+
+    def __init__(self, bank):
+        self.base = bank.base.index
+        self.hidden = set(bank.edits)
+        # Local position in ``own`` -> index in the overlay bank.
+        self.ids = sorted(bank.edits) + list(range(len(bank.base), len(bank)))
+        self.own = QuestionIndex([bank[i] for i in self.ids])
+        self.size = len(bank)
+
+    def search(self, query='', **filters):
+        base_ids = self.base.search(query, **filters)
+        own_ids = [self.ids[j] for j in self.own.search(query, **filters)]
+        if not self.hidden and not own_ids:
+            return base_ids
+        return sorted([i for i in base_ids if i not in self.hidden] + own_ids)
+
+    def sample(self, ids, k):
+        return self.base.sample(ids, k)
@@ -0,0 +1,96 @@
+"""Per-room serialized command execution.
+
+Everything that mutates a room goes through ``RoomCommands.run``. Commands
+for one room run one at a time, in the order they arrived; commands for
+different rooms never wait for each other, so rooms proceed in parallel on
+whatever the server runs requests on (greenlets under eventlet, the worker
+thread pool under asgi_app.py).
+
+A command may carry an idempotency key, chosen by the client for one
+attempt of one action. A second command with the same key in the same room
+(a double click, or an HTTP retry after a lost Socket.IO acknowledgement)
+does not run again; it gets the first one's result. Keys are remembered for
+``key_ttl`` seconds.
+"""
+import time
+import threading
+from collections import deque, OrderedDict
+
+import metrics
+
+
+class RoomCommands:
+
+    def __init__(self, event_factory=threading.Event, key_ttl=600, max_keys=10000):
+        # Makes the objects waiting commands block on: a green Event under
+        # eventlet, so waiting never blocks the whole hub.
+        self.event_factory = event_factory
+        self.key_ttl = key_ttl
+        self.max_keys = max_keys
+        # room -> deque of waiting turns; the head is the running command.
+        self.queues = {}
+        # (room, key) -> (expires, result), oldest first
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _remembered(self, room, key):
+        if key is None:
+            return None
+        entry = self.results.get((room, key))
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry
+
+    def _remember(self, room, key, result):
+        now = time.monotonic()
+        self.results[(room, key)] = (now + self.key_ttl, result)
+        self.results.move_to_end((room, key))
+        while self.results:
+            oldest_key, (expires, _) = next(iter(self.results.items()))
+            if expires >= now and len(self.results) <= self.max_keys:
+                break
+            del self.results[oldest_key]
+
+    def run(self, room, fn, key=None):
+        """Run ``fn()`` as the room's next command and return its result."""
+        t0 = time.perf_counter()
+        with self.lock:
+            entry = self._remembered(room, key)
+            if entry is not None:
+                metrics.room_command_replays.inc()
+                return entry[1]
+            queue = self.queues.get(room)
+            turn = None
+            if queue is None:
+                queue = self.queues[room] = deque([None])
+            else:
+                turn = self.event_factory()
+                queue.append(turn)
+        try:
+            if turn is not None:
+                turn.wait()  # set by the command ahead of this one
+            metrics.room_command_wait.observe(time.perf_counter() - t0)
+            if key is not None:
+                # The first attempt with this key may have been running while this one waited.
+                with self.lock:
+                    entry = self._remembered(room, key)
+                if entry is not None:
+                    metrics.room_command_replays.inc()
+                    return entry[1]
+            result = fn()
+            if key is not None:
+                with self.lock:
+                    self._remember(room, key, result)
+            return result
+        finally:
+            with self.lock:
+                queue.popleft()
+                if queue:
+                    queue[0].set()
+                else:
+                    del self.queues[room]
+
+    def forget(self, room):
+        with self.lock:
+            for room_key in [k for k in self.results if k[0] == room]:
+                del self.results[room_key]
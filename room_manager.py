@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from room_store import room_file_path
+
+
+class RoomMoved(Exception):
+    """The room was released to another worker, and this one must not recreate it."""
+
+    def __init__(self, room_id):
+        super().__init__(f"Room {room_id} has moved to another worker")
+        self.room_id = room_id
+
+
+class RoomManager:
+    """Tracks room activity on top of a RoomStore and evicts rooms nobody uses.
+
+    Rooms idle for longer than ``idle_ttl`` seconds are evicted by ``sweep``,
+    and creating a room beyond ``max_rooms`` evicts the least recently used
+    one. With ``snapshot_dir`` set, evicted rooms are written to disk and
+    restored transparently the next time they are accessed.
+    """
+
+    def __init__(self, store, state_factory, loader, idle_ttl=6 * 3600, max_rooms=1000,
+                 snapshot_dir=None, on_evict=None, recover=None):
+        self.store = store
+        self.state_factory = state_factory
+        self.loader = loader
+        self.idle_ttl = idle_ttl
+        self.max_rooms = max_rooms
+        self.snapshot_dir = snapshot_dir
+        self.on_evict = on_evict
+        # Optional fallback for rooms with no eviction snapshot, e.g. the game log.
+        self.recover = recover
+        # room_id -> last access (monotonic), least recently used first
+        self.last_active = OrderedDict()
+        # Rooms released to another worker whose old connections may still reach this one
+        self.moved = set()
+        self.lock = threading.RLock()
+        self.counters = {
+            'created': 0,
+            'restored': 0,
+            'evicted_idle': 0,
+            'evicted_lru': 0,
+            'snapshots_written': 0,
+            'migrated_in': 0,
+            'migrated_out': 0,
+            'expired_stored': 0,
+        }
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+
+    def get(self, room_id):
+        """Return the room's GameState, restoring or creating it as needed.
+
+        Raises RoomMoved for a room released by ``release(room_id, moving=True)``.
+        """
+        state = self.store.get(room_id)
+        with self.lock:
+            if room_id in self.moved:
+                raise RoomMoved(room_id)
+            self.last_active[room_id] = time.monotonic()
+            self.last_active.move_to_end(room_id)
+            if state is not None:
+                return state
+            state, version = self._restore(room_id)
+            if state is None and self.recover is not None:
+                state = self.recover(room_id)
+                if state is not None:
+                    self.counters['restored'] += 1
+            if state is None:
+                state = self.loader()
+                self.counters['created'] += 1
+            state = self.store.create(room_id, state, version)
+            self._enforce_cap()
+            return state
+
+    def _snapshot_path(self, room_id):
+        return room_file_path(self.snapshot_dir, room_id, '.json')
+
+    def _restore(self, room_id):
+        """Returns (state, version) from the room's eviction snapshot, or (None, 0)."""
+        if not self.snapshot_dir:
+            return None, 0
+        path = self._snapshot_path(room_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None, 0
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not read snapshot for room {room_id}: {e}")
+            return None, 0
+        os.remove(path)
+        self.counters['restored'] += 1
+        logging.info(f"Restored room {room_id} from snapshot")
+        # Clients still connected to the room are at this version; starting over
+        # at 0 would make them drop every later patch as stale.
+        return self.state_factory(data['state']), data.get('version', 0)
+
+    def _write_snapshot(self, room_id, state):
+        path = self._snapshot_path(room_id)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'room': room_id, 'version': self.store.version(room_id), 'state': state.to_dict()}, f)
+            os.replace(tmp_path, path)
+            self.counters['snapshots_written'] += 1
+        except OSError as e:
+            logging.error(f"Could not write snapshot for room {room_id}: {e}")
+
+    def evict(self, room_id, reason='idle'):
+        with self.lock:
+            self.last_active.pop(room_id, None)
+            state = self.store.get(room_id)
+            if state is not None and self.snapshot_dir:
+                self._write_snapshot(room_id, state)
+            self.store.evict(room_id)
+            self.counters[f'evicted_{reason}'] += 1
+        if self.on_evict is not None:
+            self.on_evict(room_id)
+        logging.info(f"Evicted room {room_id} ({reason})")
+
+    def release(self, room_id, moving=False):
+        """Remove a room without writing a snapshot and return (state, version), or None if it is not here.
+
+        For moving the room to another worker, which then owns it. With
+        ``moving`` the room is not recreated here (``get`` raises RoomMoved)
+        until ``clear_moved`` or ``adopt``.
+        """
+        with self.lock:
+            self.last_active.pop(room_id, None)
+            state = self.store.get(room_id)
+            if state is None:
+                return None
+            version = self.store.version(room_id)
+            self.store.evict(room_id)
+            if moving:
+                self.moved.add(room_id)
+            self.counters['migrated_out'] += 1
+        if self.on_evict is not None:
+            self.on_evict(room_id)
+        logging.info(f"Released room {room_id} to another worker")
+        return state, version
+
+    def adopt(self, room_id, state, version=0):
+        """Take over a room released by another worker, replacing anything kept here for it."""
+        if self.on_evict is not None:
+            self.on_evict(room_id)
+        with self.lock:
+            if self.store.get(room_id) is not None:
+                self.store.evict(room_id)
+            if self.snapshot_dir:
+                # An older eviction snapshot must not shadow the room after it moves away again.
+                try:
+                    os.remove(self._snapshot_path(room_id))
+                except FileNotFoundError:
+                    pass
+            self.moved.discard(room_id)
+            self.last_active[room_id] = time.monotonic()
+            self.last_active.move_to_end(room_id)
+            state = self.store.create(room_id, state, version)
+            self.counters['migrated_in'] += 1
+            self._enforce_cap()
+        logging.info(f"Adopted room {room_id} from another worker")
+        return state
+
+    def clear_moved(self, room_id):
+        with self.lock:
+            self.moved.discard(room_id)
+
+    def _enforce_cap(self):
+        while self.max_rooms and len(self.last_active) > self.max_rooms:
+            oldest = next(iter(self.last_active))
+            self.evict(oldest, 'lru')
+
+    def sweep(self):
+        """Evict every room idle for longer than ``idle_ttl``. Returns how many were evicted."""
+        if not self.idle_ttl:
+            return 0
+        cutoff = time.monotonic() - self.idle_ttl
+        with self.lock:
+            idle = []
+            for room_id, last in self.last_active.items():
+                if last >= cutoff:
+                    break
+                idle.append(room_id)
+            for room_id in idle:
+                self.evict(room_id, 'idle')
+        try:
+            self.counters['expired_stored'] += self.store.expire(self.idle_ttl)
+        except Exception:
+            logging.exception("Expiring stored rooms failed")
+        return len(idle)
+
+    def stats(self):
+        with self.lock:
+            data = dict(self.counters)
+            data['live'] = len(self.last_active)
+        return data
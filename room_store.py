@@ -0,0 +1,375 @@
+import os
+import json
+import time
+import atexit
+import hashlib
+import sqlite3
+import logging
+import threading
+
+import metrics
+
+
+def room_file_path(directory, room_id, suffix):
+    """Path of a per-room file under ``directory``, named after the sha256 of the room id."""
+    # Room ids come straight from the URL, so never use them as file names.
+    digest = hashlib.sha256(room_id.encode('utf-8')).hexdigest()
+    return os.path.join(directory, digest + suffix)
+
+
+class RoomStore:
+    """Where rooms' GameStates live.
+
+    ``commit`` is called after every batch of mutations (from broadcast_state)
+    and returns ``(version, changed)``: the room's store-wide version number and
+    whether this call recorded a local change. The version doubles as the
+    state-protocol version sent to clients, so it must agree across workers.
+    """
+
+    def get(self, room_id):
+        raise NotImplementedError
+
+    def create(self, room_id, state, version=0):
+        # ``version`` carries a room's protocol version over when it is restored or moved.
+        raise NotImplementedError
+
+    def version(self, room_id):
+        raise NotImplementedError
+
+    def commit(self, room_id, state):
+        raise NotImplementedError
+
+    def delete(self, room_id):
+        raise NotImplementedError
+
+    def evict(self, room_id):
+        # Drop the room from this worker; for shared stores the data itself may survive.
+        self.delete(room_id)
+
+    def room_ids(self):
+        raise NotImplementedError
+
+    def expire(self, max_idle):
+        # Drop stored rooms nobody has written for max_idle seconds; called by RoomManager.sweep.
+        return 0
+
+    def __contains__(self, room_id):
+        return self.get(room_id) is not None
+
+
+class MemoryRoomStore(RoomStore):
+    """Process-local rooms; only correct with a single worker."""
+
+    def __init__(self):
+        self.states = {}
+        self.versions = {}
+        self.committed_revisions = {}
+        self.lock = threading.Lock()
+
+    def get(self, room_id):
+        return self.states.get(room_id)
+
+    def create(self, room_id, state, version=0):
+        with self.lock:
+            existing = self.states.get(room_id)
+            if existing is not None:
+                return existing
+            self.states[room_id] = state
+            self.versions[room_id] = version
+            self.committed_revisions[room_id] = state.revision
+            return state
+
+    def version(self, room_id):
+        return self.versions.get(room_id, 0)
+
+    def commit(self, room_id, state):
+        with self.lock:
+            version = self.versions.get(room_id, 0)
+            if self.committed_revisions.get(room_id) == state.revision:
+                return version, False
+            version += 1
+            self.versions[room_id] = version
+            self.committed_revisions[room_id] = state.revision
+            return version, True
+
+    def delete(self, room_id):
+        with self.lock:
+            self.states.pop(room_id, None)
+            self.versions.pop(room_id, None)
+            self.committed_revisions.pop(room_id, None)
+
+    def room_ids(self):
+        return list(self.states)
+
+
+class RedisRoomStore(RoomStore):
+    """Rooms shared between workers through any Redis-protocol server.
+
+    Each room is a hash ``<prefix><room_id>`` with ``version`` and ``state``
+    (GameState.to_dict as JSON). Workers keep a local copy and only re-read
+    ``state`` when the stored version moved on. With ``room_ttl`` set, Redis
+    expires rooms that have not been written for that many seconds.
+    """
+
+    def __init__(self, url=None, state_factory=None, client=None, prefix='feud:room:', room_ttl=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("RedisRoomStore needs the 'redis' package (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.state_factory = state_factory
+        self.prefix = prefix
+        self.room_ttl = room_ttl
+        # room_id -> (state, version, revision at load/commit)
+        self.local = {}
+        self.lock = threading.Lock()
+
+    def _key(self, room_id):
+        return f"{self.prefix}{room_id}"
+
+    def get(self, room_id):
+        key = self._key(room_id)
+        raw_version = self.client.hget(key, 'version')
+        if raw_version is None:
+            self.local.pop(room_id, None)
+            return None
+        version = int(raw_version)
+        cached = self.local.get(room_id)
+        if cached is not None and cached[1] == version:
+            return cached[0]
+        with self.lock:
+            raw_version, raw_state = self.client.hmget(key, 'version', 'state')
+            if raw_state is None:
+                return None
+            state = self.state_factory(json.loads(raw_state))
+            self.local[room_id] = (state, int(raw_version), state.revision)
+            return state
+
+    def create(self, room_id, state, version=0):
+        from redis import WatchError
+        key = self._key(room_id)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.exists(key):
+                    pipe.unwatch()
+                    return self.get(room_id)
+                pipe.multi()
+                pipe.hset(key, mapping={'version': version, 'state': json.dumps(state.to_dict())})
+                if self.room_ttl:
+                    pipe.expire(key, self.room_ttl)
+                pipe.execute()
+            except WatchError:
+                # Another worker created it first; use theirs.
+                return self.get(room_id)
+        with self.lock:
+            self.local[room_id] = (state, version, state.revision)
+        return state
+
+    def version(self, room_id):
+        cached = self.local.get(room_id)
+        return cached[1] if cached is not None else 0
+
+    def commit(self, room_id, state):
+        key = self._key(room_id)
+        with self.lock:
+            cached = self.local.get(room_id)
+            if cached is not None and cached[0] is state and cached[2] == state.revision:
+                return cached[1], False
+            pipe = self.client.pipeline(transaction=True)
+            pipe.hincrby(key, 'version', 1)
+            pipe.hset(key, 'state', json.dumps(state.to_dict()))
+            if self.room_ttl:
+                pipe.expire(key, self.room_ttl)
+            version = int(pipe.execute()[0])
+            if cached is not None and version != cached[1] + 1:
+                logging.warning(f"Room {room_id} was changed concurrently by another worker; last write wins.")
+            self.local[room_id] = (state, version, state.revision)
+            return version, True
+
+    def delete(self, room_id):
+        self.client.delete(self._key(room_id))
+        with self.lock:
+            self.local.pop(room_id, None)
+
+    def evict(self, room_id):
+        # Other workers may still be using the room; let Redis expire it instead.
+        with self.lock:
+            self.local.pop(room_id, None)
+
+    def room_ids(self):
+        n = len(self.prefix)
+        return [k.decode()[n:] if isinstance(k, bytes) else k[n:]
+                for k in self.client.scan_iter(match=f"{self.prefix}*")]
+
+
+class SqliteRoomStore(MemoryRoomStore):
+    """Process-local rooms that survive a restart, persisted to a SQLite file.
+
+    Rooms live in memory as with MemoryRoomStore. ``commit`` only records the
+    room's latest state in a pending map, so several changes within one
+    ``flush_interval`` cost a single write, and a background thread writes the
+    pending rooms in one transaction. The database runs in WAL mode. Nothing
+    is loaded at startup: ``get`` rehydrates a room from the database the first
+    time it is asked for, and ``evict`` only drops the in-memory copy.
+
+    A room gets a row with its first committed change, so rooms that are only
+    looked at (a mistyped ``?room=``, a scanner) never reach the file. Rows
+    not written for the idle TTL are deleted by ``expire``.
+    """
+
+    def __init__(self, path, state_factory=None, flush_interval=0.5):
+        super().__init__()
+        self.path = path
+        self.state_factory = state_factory
+        self.flush_interval = flush_interval
+        # room_id -> (version, state dict), or None for a pending delete
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS rooms ("
+                        "room_id TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+                        "state TEXT NOT NULL, updated REAL NOT NULL)")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='room-store-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _load(self, room_id):
+        with self.pending_lock:
+            if room_id in self.pending:
+                # Not written yet; the pending copy is the latest.
+                entry = self.pending[room_id]
+                return None if entry is None else (entry[0], entry[1])
+        with self.db_lock:
+            row = self.db.execute("SELECT version, state FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def get(self, room_id):
+        state = self.states.get(room_id)
+        if state is not None:
+            return state
+        loaded = self._load(room_id)
+        if loaded is None:
+            return None
+        version, data = loaded
+        state = self.state_factory(data)
+        with self.lock:
+            existing = self.states.get(room_id)
+            if existing is not None:
+                return existing
+            self.states[room_id] = state
+            self.versions[room_id] = version
+            self.committed_revisions[room_id] = state.revision
+        logging.info(f"Rehydrated room {room_id} from {self.path}")
+        return state
+
+    def create(self, room_id, state, version=0):
+        state = super().create(room_id, state, version)
+        if version:
+            # Restored or moved here with changes already made; keep them.
+            with self.pending_lock:
+                self.pending[room_id] = (version, state.to_dict())
+        return state
+
+    def commit(self, room_id, state):
+        version, changed = super().commit(room_id, state)
+        if changed:
+            with self.pending_lock:
+                self.pending[room_id] = (version, state.to_dict())
+        return version, changed
+
+    def delete(self, room_id):
+        super().delete(room_id)
+        with self.pending_lock:
+            self.pending[room_id] = None
+
+    def evict(self, room_id):
+        # The room stays in the database and is rehydrated on its next access.
+        MemoryRoomStore.delete(self, room_id)
+
+    def room_ids(self):
+        with self.db_lock:
+            stored = [row[0] for row in self.db.execute("SELECT room_id FROM rooms")]
+        return list(set(stored) | set(self.states))
+
+    def expire(self, max_idle):
+        cutoff = time.time() - max_idle
+        with self.db_lock:
+            stale = [row[0] for row in self.db.execute("SELECT room_id FROM rooms WHERE updated < ?", (cutoff,))]
+        with self.pending_lock:
+            # Rooms still in memory or waiting to be written are not idle.
+            stale = [(room_id,) for room_id in stale if room_id not in self.states and room_id not in self.pending]
+        if not stale:
+            return 0
+        with self.db_lock:
+            try:
+                self.db.execute("BEGIN")
+                self.db.executemany("DELETE FROM rooms WHERE room_id = ? AND updated < ?",
+                                    [(room_id, cutoff) for (room_id,) in stale])
+                self.db.execute("COMMIT")
+            except sqlite3.Error as e:
+                logging.error(f"Could not expire rooms in {self.path}: {e}")
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+                return 0
+        logging.info(f"Expired {len(stale)} idle rooms from {self.path}")
+        return len(stale)
+
+    def flush(self):
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        t0 = time.perf_counter()
+        now = time.time()
+        upserts = [(room_id, entry[0], json.dumps(entry[1], separators=(',', ':')), now)
+                   for room_id, entry in pending.items() if entry is not None]
+        deletes = [(room_id,) for room_id, entry in pending.items() if entry is None]
+        try:
+            with self.db_lock:
+                self.db.execute("BEGIN")
+                self.db.executemany("INSERT INTO rooms (room_id, version, state, updated) VALUES (?, ?, ?, ?) "
+                                    "ON CONFLICT(room_id) DO UPDATE SET version = excluded.version, "
+                                    "state = excluded.state, updated = excluded.updated", upserts)
+                self.db.executemany("DELETE FROM rooms WHERE room_id = ?", deletes)
+                self.db.execute("COMMIT")
+        except sqlite3.Error as e:
+            logging.error(f"Could not write rooms to {self.path}: {e}")
+            with self.db_lock:
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+            with self.pending_lock:
+                # Retry on the next flush, unless a newer change has been queued since.
+                for room_id, entry in pending.items():
+                    self.pending.setdefault(room_id, entry)
+            return
+        metrics.room_store_flush.observe(time.perf_counter() - t0)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logging.exception("Room store flush failed")
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+
+def create_room_store(redis_url=None, state_factory=None, room_ttl=None, sqlite_path=None):
+    if redis_url:
+        logging.info(f"Using Redis room store at {redis_url}")
+        return RedisRoomStore(redis_url, state_factory=state_factory, room_ttl=room_ttl)
+    if sqlite_path:
+        logging.info(f"Using SQLite room store at {sqlite_path}")
+        return SqliteRoomStore(sqlite_path, state_factory=state_factory)
+    return MemoryRoomStore()
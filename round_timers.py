@@ -0,0 +1,132 @@
+"""Server-side round clocks: the answer, steal and Fast Money countdowns.
+
+Each room has at most one clock. A running clock is one entry on the shared
+``TimingWheel``. It fires when the displayed time (whole ``tick_interval``
+steps) next changes, or at its deadline, whichever comes first. So a room
+sends at most one ``timer`` message per step, however many clocks are
+running. At the deadline the clock stays in the room marked expired, and
+``expire(room, clock)`` is started with ``spawn`` so the wheel never waits on
+a room. It is up to the caller to check that the clock is still the room's
+(see ``is_current``) before acting on it.
+
+Clocks are process-local: they live on the worker that started them and are
+not part of the saved game state.
+"""
+import math
+import threading
+
+from state_protocol import make_packet
+
+TIMER_KINDS = ('answer', 'steal', 'fast_money')
+
+
+class RoomClock:
+    __slots__ = ('kind', 'duration', 'deadline', 'entry', 'expired')
+
+    def __init__(self, kind, duration, deadline):
+        self.kind = kind
+        self.duration = duration
+        self.deadline = deadline
+        # The clock's pending wheel timer
+        self.entry = None
+        self.expired = False
+
+
+class RoomTimers:
+
+    def __init__(self, wheel, send, expire, durations, tick_interval=1.0, spawn=None):
+        self.wheel = wheel
+        # send(room, pkt) delivers a timer message to the room's displays.
+        self.send = send
+        self.expire = expire
+        # kind -> default duration in seconds
+        self.durations = durations
+        self.tick_interval = tick_interval
+        self.spawn = spawn or (lambda fn, *args: fn(*args))
+        # room -> RoomClock
+        self.clocks = {}
+        self.lock = threading.Lock()
+
+    def _shown(self, remaining):
+        # Displayed time: the remaining time rounded up to a whole step. The
+        # small allowance keeps a wake-up a hair early from showing the step twice.
+        steps = max(0, math.ceil(remaining / self.tick_interval - 1e-3))
+        return round(steps * self.tick_interval, 3)
+
+    def _message(self, clock, now):
+        remaining = 0 if clock.expired else self._shown(clock.deadline - now)
+        return {'kind': clock.kind, 'remaining': remaining, 'duration': clock.duration,
+                'running': not clock.expired, 'expired': clock.expired}
+
+    def _schedule(self, room, clock, now):
+        remaining = clock.deadline - now
+        next_step = self._shown(remaining) - self.tick_interval
+        clock.entry = self.wheel.schedule(remaining - max(next_step, 0), self._tick, room, clock)
+
+    def start(self, room, kind, duration=None):
+        """(Re)start the room's clock. Returns the message sent to its displays."""
+        if kind not in TIMER_KINDS:
+            raise ValueError(f"Unknown timer: {kind}")
+        duration = float(duration or self.durations[kind])
+        if not math.isfinite(duration) or duration <= 0:
+            raise ValueError("Timer duration must be a positive number of seconds")
+        now = self.wheel.clock()
+        clock = RoomClock(kind, duration, now + duration)
+        with self.lock:
+            self._schedule(room, clock, now)
+            old = self.clocks.get(room)
+            if old is not None and old.entry is not None:
+                old.entry.cancel()
+            self.clocks[room] = clock
+            msg = self._message(clock, now)
+        self.send(room, make_packet('timer', msg))
+        return msg
+
+    def stop(self, room, notify=True):
+        """Remove the room's clock. Returns whether there was one."""
+        with self.lock:
+            clock = self.clocks.pop(room, None)
+            if clock is None:
+                return False
+            if clock.entry is not None:
+                clock.entry.cancel()
+        if notify:
+            self.send(room, make_packet('timer', {'kind': clock.kind, 'remaining': 0, 'duration': clock.duration,
+                                                  'running': False, 'expired': False}))
+        return True
+
+    def current(self, room):
+        with self.lock:
+            return self.clocks.get(room)
+
+    def is_current(self, room, clock):
+        with self.lock:
+            return self.clocks.get(room) is clock
+
+    def packet(self, room):
+        """The room's current timer message, for a joining display, or None."""
+        with self.lock:
+            clock = self.clocks.get(room)
+            if clock is None:
+                return None
+            msg = self._message(clock, self.wheel.clock())
+        return make_packet('timer', msg)
+
+    def running_count(self):
+        with self.lock:
+            return sum(1 for clock in self.clocks.values() if not clock.expired)
+
+    def _tick(self, room, clock):
+        now = self.wheel.clock()
+        with self.lock:
+            if self.clocks.get(room) is not clock:
+                return  # stopped or restarted since this was scheduled
+            if clock.deadline - now <= 1e-3:
+                clock.expired = True
+                clock.entry = None
+            else:
+                self._schedule(room, clock, now)
+            msg = self._message(clock, now)
+        self.send(room, make_packet('timer', msg))
+        if clock.expired:
+            self.spawn(self.expire, room, clock)
@@ -0,0 +1,415 @@
+"""Sharded mode: a front router and one app.py worker process per core.
+
+    python shard_router.py [--workers N] [--host 127.0.0.1] [--port 5000] [--worker-port 5001]
+
+Each room lives in exactly one worker, chosen by consistent hashing of its
+id (the ``room`` query parameter that pages, API calls, SSE streams and the
+page scripts' socket URLs all carry; requests without one act on the
+``default`` room, as in app.py). The router forwards every HTTP request and
+WebSocket byte for byte to the room's worker, so a room's moderator,
+contestants and spectators share a process and no shared store is needed.
+Requests that belong to no room (the start page, static files, bank uploads,
+metrics) go to the workers in turn, or to ``?worker=N``. Plain HTTP requests
+are forwarded with ``Connection: close``, so each is routed on its own.
+
+Draining a worker (FEUD_ADMIN_TOKEN must be set):
+
+    curl -X POST -H "Authorization: Bearer $FEUD_ADMIN_TOKEN" "localhost:5000/_shards/drain?worker=2"
+
+takes it off the hash ring and moves its rooms, one at a time, to their new
+owners through the workers' /_shard endpoints. Requests for a room wait while
+it moves, and sockets of moved rooms are closed so clients reconnect to the
+new owner and receive a fresh snapshot. ``/_shards/restore?worker=2`` puts
+the worker back (its rooms move back the same way) and ``GET /_shards`` lists
+workers and their rooms. A crashed worker is restarted; with
+FEUD_EVENT_LOG_DIR set its rooms are recovered from the game log.
+"""
+import os
+import sys
+import json
+import hmac
+import time
+import signal
+import asyncio
+import hashlib
+import logging
+import secrets
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+from bisect import bisect_right
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+# Paths that belong to no room; anything else without ?room= is the 'default' room.
+ROOMLESS_PREFIXES = ('/static/', '/api/banks', '/metrics')
+ROOMLESS_PATHS = ('/',)
+HOP_BY_HOP = ('connection', 'keep-alive', 'proxy-connection')
+MAX_HEAD_BYTES = 64 * 1024
+SUPERVISE_INTERVAL = 1.0
+STARTUP_TIMEOUT = 60
+
+
+def ring_hash(key):
+    return int.from_bytes(hashlib.sha256(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hashing: every node owns the arcs ending at its ``replicas`` points.
+
+    Taking a node off the ring only moves the keys it owned.
+    """
+
+    def __init__(self, nodes, replicas=64):
+        points = sorted((ring_hash(f"{node}:{i}"), node) for node in nodes for i in range(replicas))
+        self.points = [p for p, _ in points]
+        self.owners = [node for _, node in points]
+        self.nodes = sorted(set(nodes))
+
+    def node_for(self, key):
+        if not self.points:
+            return None
+        return self.owners[bisect_right(self.points, ring_hash(key)) % len(self.points)]
+
+
+class Worker:
+    def __init__(self, index, port):
+        self.index = index
+        self.port = port
+        self.process = None
+        self.drained = False
+
+
+class ShardRouter:
+
+    def __init__(self, workers, host, port, worker_port, admin_token=None):
+        self.host = host
+        self.port = port
+        self.admin_token = admin_token
+        self.shard_token = secrets.token_hex(16)
+        self.workers = [Worker(i, worker_port + i) for i in range(workers)]
+        self.ring = HashRing([w.index for w in self.workers])
+        # room -> worker it still lives on while a rebalance moves rooms around
+        self.placement = {}
+        # room -> Event set once the room has moved; its requests wait meanwhile
+        self.moving = {}
+        # Closed while a rebalance takes stock of where rooms are.
+        self.routing_open = asyncio.Event()
+        self.routing_open.set()
+        self.rebalance_lock = asyncio.Lock()
+        # (worker index, room) -> open client writers, to cut sockets of moved rooms
+        self.connections = {}
+        self.next_worker = 0
+        self.stopping = False
+
+    # Workers
+
+    def start_worker(self, worker):
+        env = dict(os.environ, FEUD_HOST='127.0.0.1', FEUD_PORT=str(worker.port), FEUD_SHARD_TOKEN=self.shard_token)
+        worker.process = subprocess.Popen([sys.executable, APP_SCRIPT], env=env)
+        logging.info(f"Started worker {worker.index} on port {worker.port} (pid {worker.process.pid})")
+
+    def call_worker(self, worker, method, path, body=None, timeout=10):
+        """Blocking request to a worker's internal API; returns (status, parsed JSON)."""
+        req = urllib.request.Request(f"http://127.0.0.1:{worker.port}{path}", method=method,
+                                     data=None if body is None else json.dumps(body).encode('utf-8'),
+                                     headers={'X-Feud-Shard-Token': self.shard_token,
+                                              'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                return resp.status, json.loads(resp.read() or b'null')
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+    async def worker_api(self, worker, method, path, body=None):
+        return await asyncio.get_running_loop().run_in_executor(None, self.call_worker, worker, method, path, body)
+
+    async def wait_ready(self, worker):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if worker.process.poll() is not None:
+                raise RuntimeError(f"Worker {worker.index} exited with code {worker.process.returncode}")
+            try:
+                await self.worker_api(worker, 'GET', '/_shard/rooms')
+                return
+            except OSError:
+                await asyncio.sleep(0.2)
+        raise RuntimeError(f"Worker {worker.index} did not start within {STARTUP_TIMEOUT} s")
+
+    async def supervise(self):
+        while not self.stopping:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for worker in self.workers:
+                if worker.process.poll() is not None and not self.stopping:
+                    logging.error(f"Worker {worker.index} exited with code {worker.process.returncode}; restarting")
+                    self.start_worker(worker)
+                    try:
+                        await self.wait_ready(worker)
+                    except RuntimeError as e:
+                        logging.error(str(e))
+
+    def stop_workers(self):
+        self.stopping = True
+        for worker in self.workers:
+            if worker.process and worker.process.poll() is None:
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process:
+                try:
+                    worker.process.wait(10)
+                except subprocess.TimeoutExpired:
+                    worker.process.kill()
+
+    # Routing
+
+    async def worker_for(self, room, query):
+        if room is None:
+            # No room: spread over the workers on the ring, unless one was asked for.
+            requested = query.get('worker', [None])[0]
+            if requested is not None and requested.isdigit() and int(requested) < len(self.workers):
+                return self.workers[int(requested)]
+            active = self.ring.nodes
+            self.next_worker = (self.next_worker + 1) % len(active)
+            return self.workers[active[self.next_worker]]
+        while True:
+            await self.routing_open.wait()
+            moved = self.moving.get(room)
+            if moved is None:
+                break
+            await moved.wait()
+        index = self.placement.get(room)
+        return self.workers[self.ring.node_for(room) if index is None else index]
+
+    def cut_connections(self, index, room):
+        for writer in self.connections.pop((index, room), ()):
+            writer.close()
+
+    def cut_misrouted(self):
+        # Sockets whose room is now served elsewhere reconnect and get routed again.
+        for index, room in list(self.connections):
+            if self.placement.get(room, self.ring.node_for(room)) != index:
+                self.cut_connections(index, room)
+
+    async def move_room(self, room, source, target):
+        done = self.moving[room] = asyncio.Event()
+        try:
+            status, data = await self.worker_api(source, 'POST', f"/_shard/export?{room_query(room)}")
+            if status == 404:
+                return  # evicted meanwhile
+            if status != 200:
+                raise RuntimeError(f"export returned {status}")
+            status, _ = await self.worker_api(target, 'POST', f"/_shard/import?{room_query(room)}", data)
+            if status != 200:
+                # Keep the room where it was rather than lose it.
+                await self.worker_api(source, 'POST', f"/_shard/import?{room_query(room)}", data)
+                raise RuntimeError(f"import returned {status}")
+            self.placement.pop(room, None)
+            self.cut_connections(source.index, room)
+            # The source refused the room since the export; now nothing can reach it there.
+            try:
+                await self.worker_api(source, 'POST', f"/_shard/moved?{room_query(room)}")
+            except OSError as e:
+                logging.warning(f"Could not tell worker {source.index} that room {room} moved: {e}")
+            logging.info(f"Moved room {room} from worker {source.index} to worker {target.index}")
+        except (OSError, RuntimeError) as e:
+            logging.error(f"Could not move room {room} from worker {source.index}: {e}")
+        finally:
+            del self.moving[room]
+            done.set()
+
+    async def rebalance(self):
+        """Point the ring at the non-drained workers and move every room that now belongs elsewhere."""
+        async with self.rebalance_lock:
+            self.routing_open.clear()
+            try:
+                live = {}
+                for worker in self.workers:
+                    try:
+                        status, data = await self.worker_api(worker, 'GET', '/_shard/rooms')
+                    except OSError:
+                        status, data = None, None  # down: its rooms are gone with it
+                    live[worker.index] = data['rooms'] if status == 200 else []
+                self.ring = HashRing([w.index for w in self.workers if not w.drained])
+                for index, rooms in live.items():
+                    for room in rooms:
+                        if self.ring.node_for(room) != index:
+                            self.placement[room] = index
+            finally:
+                self.routing_open.set()
+            self.cut_misrouted()
+            moved = 0
+            for room, index in list(self.placement.items()):
+                await self.move_room(room, self.workers[index], self.workers[self.ring.node_for(room)])
+                moved += 1
+            return moved
+
+    # Admin API
+
+    def admin_authorized(self, headers):
+        if not self.admin_token:
+            return False
+        auth = headers.get('authorization', '')
+        return auth.startswith('Bearer ') and hmac.compare_digest(auth[len('Bearer '):], self.admin_token)
+
+    async def admin(self, method, path, query, headers):
+        if not self.admin_token:
+            return 403, {'error': "Set FEUD_ADMIN_TOKEN to manage shards"}
+        if not self.admin_authorized(headers):
+            return 401, {'error': "Invalid admin token"}
+        if method == 'GET' and path == '/_shards':
+            workers = []
+            for worker in self.workers:
+                try:
+                    status, data = await self.worker_api(worker, 'GET', '/_shard/rooms')
+                except OSError:
+                    status, data = None, None
+                workers.append({'worker': worker.index, 'port': worker.port, 'pid': worker.process.pid,
+                                'drained': worker.drained, 'up': status == 200,
+                                'rooms': len(data['rooms']) if status == 200 else None})
+            return 200, {'workers': workers, 'moving': len(self.moving)}
+        if method == 'POST' and path in ('/_shards/drain', '/_shards/restore'):
+            index = query.get('worker', [''])[0]
+            if not index.isdigit() or int(index) >= len(self.workers):
+                return 400, {'error': "Unknown worker"}
+            worker = self.workers[int(index)]
+            drain = path == '/_shards/drain'
+            if drain and all(w.drained or w is worker for w in self.workers):
+                return 409, {'error': "Cannot drain the last worker"}
+            worker.drained = drain
+            moved = await self.rebalance()
+            return 200, {'worker': worker.index, 'drained': worker.drained, 'rooms_moved': moved}
+        return 404, {'error': "Not found"}
+
+    # Proxy
+
+    async def handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        lines = head.decode('latin-1').split('\r\n')[:-2]
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            writer.close()
+            return
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+
+        if url.path == '/_shards' or url.path.startswith('/_shards/'):
+            status, body = await self.admin(method, url.path, query, headers)
+            await respond(writer, status, body)
+            return
+        if url.path.startswith('/_shard/'):
+            await respond(writer, 404, {'error': "Not found"})  # workers' internal API
+            return
+
+        room = query.get('room', [None])[0]
+        if room is None and not (url.path in ROOMLESS_PATHS or url.path.startswith(ROOMLESS_PREFIXES)):
+            room = 'default'
+        worker = await self.worker_for(room, query)
+        upgrade = 'upgrade' in headers.get('connection', '').lower()
+        out = [lines[0]] + [line for line in lines[1:]
+                            if upgrade or line.partition(':')[0].strip().lower() not in HOP_BY_HOP]
+        if not upgrade:
+            out.append('Connection: close')
+        peer = writer.get_extra_info('peername')
+        if peer:
+            out.append(f"X-Forwarded-For: {peer[0]}")
+        try:
+            up_reader, up_writer = await asyncio.open_connection('127.0.0.1', worker.port)
+        except OSError:
+            await respond(writer, 502, {'error': "Worker unavailable"})
+            return
+        up_writer.write(('\r\n'.join(out) + '\r\n\r\n').encode('latin-1'))
+        key = (worker.index, room)
+        if room is not None:
+            self.connections.setdefault(key, set()).add(writer)
+        try:
+            tasks = [asyncio.ensure_future(pipe(reader, up_writer)), asyncio.ensure_future(pipe(up_reader, writer))]
+            _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+        finally:
+            writers = self.connections.get(key)
+            if writers is not None:
+                writers.discard(writer)
+                if not writers:
+                    del self.connections[key]
+            up_writer.close()
+            writer.close()
+
+    async def serve(self):
+        for worker in self.workers:
+            self.start_worker(worker)
+        await asyncio.gather(*(self.wait_ready(w) for w in self.workers))
+        server = await asyncio.start_server(self.handle, self.host, self.port, limit=MAX_HEAD_BYTES)
+        logging.info(f"Routing http://{self.host}:{self.port} to {len(self.workers)} workers")
+        loop = asyncio.get_running_loop()
+        stopped = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stopped.set)
+        supervisor = asyncio.ensure_future(self.supervise())
+        async with server:
+            await stopped.wait()
+        supervisor.cancel()
+
+
+def room_query(room):
+    return urlencode({'room': room})
+
+
+async def pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+
+
+async def respond(writer, status, body):
+    data = json.dumps(body).encode('utf-8')
+    reason = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden', 404: 'Not Found',
+              409: 'Conflict', 502: 'Bad Gateway'}.get(status, '')
+    writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode('latin-1') + data)
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--worker-port', type=int, default=5001, help="first worker's port; the rest follow it")
+    args = parser.parse_args()
+    logging.basicConfig(level=os.environ.get('FEUD_LOG_LEVEL', 'INFO'),
+                        format='%(asctime)s - %(levelname)s - router - %(message)s')
+    if os.environ.get('FEUD_REDIS_URL'):
+        logging.warning("FEUD_REDIS_URL is set: workers share rooms through Redis, so sharding is not needed")
+    if os.environ.get('FEUD_SQLITE_PATH'):
+        # Every worker would open the same file and list all of its rooms as its own.
+        parser.error("FEUD_SQLITE_PATH holds one worker's rooms and cannot be shared by shards; unset it")
+    router = ShardRouter(args.workers, args.host, args.port, args.worker_port, os.environ.get('FEUD_ADMIN_TOKEN'))
+    try:
+        asyncio.run(router.serve())
+    finally:
+        router.stop_workers()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Read-only spectator channel for large audiences.
+
+Players and the moderator get every change as soon as it is committed.
+Spectators sit in a separate Socket.IO room (``<room>:spectators``) or on a
+Server-Sent Events stream instead, and ``SpectatorBroadcaster`` sends them at
+most one message per room every ``interval`` seconds: a patch from what they
+last got to the newest snapshot, however many changes happened in between.
+A joining spectator is sent that last-broadcast snapshot, to itself only, so
+it is always the base of the next patch.
+"""
+import time
+import logging
+import threading
+from collections import deque
+
+import metrics
+from state_protocol import diff_state, make_packet
+
+SPECTATOR_SUFFIX = ':spectators'
+
+
+class SpectatorStream(deque):
+    """Encoded SSE frames waiting for one stream's client."""
+    # Compared by identity, so open streams can be kept in a set.
+    __hash__ = object.__hash__
+    __eq__ = object.__eq__
+
+
+def spectator_room(room):
+    return f"{room}{SPECTATOR_SUFFIX}"
+
+
+class SpectatorBroadcaster:
+
+    def __init__(self, send, interval=0.05, sleep=time.sleep):
+        # send(pkt, room) delivers a packet to a Socket.IO room.
+        self.send = send
+        self.interval = interval
+        self.sleep = sleep
+        # room -> snapshot spectators have (the base of the next patch)
+        self.sent = {}
+        # room -> newest snapshot, waiting for the next flush
+        self.pending = {}
+        # room -> open SSE streams
+        self.streams = {}
+        self.lock = threading.Lock()
+
+    def publish(self, room, snap):
+        # Called on every committed change; only the newest snapshot is kept.
+        with self.lock:
+            self.pending[room] = snap
+
+    def push(self, room, pkt):
+        # Messages outside the state protocol (round clocks) go out as they come.
+        self.send(pkt, spectator_room(room))
+        with self.lock:
+            streams = list(self.streams.get(room, ()))
+        if streams:
+            frame = pkt.sse()
+            for stream in streams:
+                stream.append(frame)
+
+    def snapshot_for(self, room, current):
+        """The snapshot to send a joining (or resyncing) spectator."""
+        with self.lock:
+            sent = self.sent.get(room)
+            if sent is None or (room not in self.pending and sent.version < current.version):
+                # Nothing waiting here: the change came from another worker, or nothing was sent yet.
+                sent = self.sent[room] = current
+            return sent
+
+    def open_stream(self, room, current):
+        stream = SpectatorStream([self.snapshot_for(room, current).packet.sse()])
+        with self.lock:
+            self.streams.setdefault(room, set()).add(stream)
+        return stream
+
+    def close_stream(self, room, stream):
+        with self.lock:
+            streams = self.streams.get(room)
+            if streams is not None:
+                streams.discard(stream)
+                if not streams:
+                    del self.streams[room]
+
+    def stream_count(self):
+        with self.lock:
+            return sum(len(s) for s in self.streams.values())
+
+    def forget(self, room):
+        with self.lock:
+            self.sent.pop(room, None)
+            self.pending.pop(room, None)
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for room, snap in pending.items():
+            with self.lock:
+                base = self.sent.get(room)
+                if base is not None and base.version >= snap.version:
+                    continue
+                self.sent[room] = snap
+                streams = list(self.streams.get(room, ()))
+            t0 = time.perf_counter()
+            if base is None:
+                pkt, kind = snap.packet, 'spectator_full'
+            else:
+                changes = diff_state(base.payload, snap.payload)
+                pkt = make_packet('state_patch', {"version": snap.version, "base": base.version, "changes": changes})
+                kind = 'spectator_patch'
+            self.send(pkt, spectator_room(room))
+            if streams:
+                frame = pkt.sse()
+                for stream in streams:
+                    stream.append(frame)
+            metrics.broadcast_emit.observe(time.perf_counter() - t0, kind)
+
+    def run(self):
+        while True:
+            self.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logging.exception("Spectator broadcast failed")
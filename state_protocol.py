@@ -0,0 +1,112 @@
+import json
+import hashlib
+from socketio import packet as sio_packet
+
+
+def build_state_payload(state):
+    data = {
+        "question_shown": state.question_shown_to_contestants,
+        "current_question": {
+            "question": state.current_question.question if state.question_shown_to_contestants else "",
+            "answers": [
+                {"text": text, "points": pts, "revealed": bool(state.revealed_mask >> i & 1)}
+                for i, (text, pts) in enumerate(zip(state.current_question.texts, state.current_question.points))
+            ]
+        } if state.current_question else None,
+        "team1_score": state.team1_score,
+        "team2_score": state.team2_score,
+        "team1_name": state.team1_name,
+        "team2_name": state.team2_name,
+        "current_control_team": state.current_control_team,
+        "strikes": state.team_in_play_strikes,
+        "is_steal_attempt": state.is_steal_attempt,
+        "current_question_index": state.current_question_index + 1,
+        "total_questions": len(state.chosen_indices)
+    }
+    if state.current_question is None and state.current_question_index >= len(state.chosen_indices):
+        t1, t2 = state.scores()
+        if t1 > t2:
+            winner = {"name": state.team1_name, "points": t1}
+        elif t2 > t1:
+            winner = {"name": state.team2_name, "points": t2}
+        else:
+            winner = {"name": "Tie", "points": t1}
+        data["winner"] = winner
+    return data
+
+
+def diff_state(old, new, prefix="", changes=None):
+    """Flatten the differences between two state payloads into {"a.b.3.c": value}.
+
+    Dicts are compared key by key (a removed key is sent as None) and lists of
+    the same length member by member; anything else that differs is replaced
+    wholesale.
+    """
+    if changes is None:
+        changes = {}
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in new:
+            if key in old:
+                diff_state(old[key], new[key], f"{prefix}{key}.", changes)
+            else:
+                changes[f"{prefix}{key}"] = new[key]
+        for key in old:
+            if key not in new:
+                changes[f"{prefix}{key}"] = None
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for i, (o, n) in enumerate(zip(old, new)):
+            diff_state(o, n, f"{prefix}{i}.", changes)
+    elif old != new or type(old) is not type(new):
+        changes[prefix[:-1]] = new
+    return changes
+
+
+class RoomSnapshot:
+    """Immutable view of a room's state at one version, serialized at most once."""
+    __slots__ = ('version', 'payload', '_body', '_etag', '_packet')
+
+    def __init__(self, version, payload):
+        self.version = version
+        self.payload = payload
+        self._body = None
+        self._etag = None
+        self._packet = None
+
+    @property
+    def body(self):
+        if self._body is None:
+            self._body = json.dumps(self.payload, separators=(',', ':')).encode('utf-8')
+        return self._body
+
+    @property
+    def etag(self):
+        if self._etag is None:
+            self._etag = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+        return self._etag
+
+    @property
+    def packet(self):
+        # Full 'state_update' message, encoded once and reused for every join/resync.
+        if self._packet is None:
+            self._packet = make_packet('state_update', {"version": self.version, "state": self.payload})
+        return self._packet
+
+
+class EncodeOncePacket(sio_packet.Packet):
+    # python-socketio encodes a packet per recipient; cache the encoding so a
+    # room-wide emit serializes the payload once.
+    def encode(self):
+        if not hasattr(self, '_encoded'):
+            self._encoded = super().encode()
+        return self._encoded
+
+    def sse(self):
+        # The same message as a Server-Sent Events frame, also encoded once.
+        if not hasattr(self, '_sse'):
+            event, data = self.data
+            self._sse = f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode('utf-8')
+        return self._sse
+
+
+def make_packet(event, data):
+    return EncodeOncePacket(sio_packet.EVENT, namespace='/', data=[event, data])
@@ -0,0 +1,107 @@
+// Renders the contestant board by patching it in place. The last value
+// written to every node is remembered, so an update only touches the answer
+// rows, score cells, strike marks and texts that actually changed; a reveal
+// is one text write instead of rebuilding the answer list and both scores.
+function FeudBoard(doc) {
+  doc = doc || document;
+  var self = this;
+  var written = {};
+  var rows = [];
+  var lastStrikes = 0;
+  var xTimer = null;
+  var el = {
+    question: doc.getElementById("question"),
+    answers: doc.getElementById("answers"),
+    strikes: doc.getElementById("strikes-display"),
+    giantX: doc.getElementById("giant-x"),
+    winner: doc.getElementById("winner"),
+    winnerText: doc.getElementById("winnerText"),
+    timer: doc.getElementById("timer")
+  };
+  [1, 2].forEach(function(t) {
+    var block = doc.getElementById("T" + t + "Score");
+    el["team" + t] = block;
+    el["name" + t] = block.querySelector(".team-name");
+    el["score" + t] = block.querySelector(".team-points");
+  });
+  // DOM writes made so far, for the benchmark.
+  self.writes = 0;
+
+  function text(key, node, value) {
+    if (written[key] !== value) {
+      written[key] = value;
+      node.textContent = value;
+      self.writes++;
+    }
+  }
+
+  function toggle(key, node, className, on) {
+    if (written[key] !== on) {
+      written[key] = on;
+      node.classList.toggle(className, on);
+      self.writes++;
+    }
+  }
+
+  function answerText(index, ans) {
+    return ans.revealed ? (index + 1) + ". " + ans.text + " (" + ans.points + " pts)" : (index + 1) + ".";
+  }
+
+  function renderAnswers(answers) {
+    while (rows.length < answers.length) {
+      var li = doc.createElement("li");
+      el.answers.appendChild(li);
+      rows.push(li);
+      self.writes++;
+    }
+    while (rows.length > answers.length) {
+      el.answers.removeChild(rows.pop());
+      delete written["answer" + rows.length];
+      self.writes++;
+    }
+    answers.forEach(function(ans, i) {
+      text("answer" + i, rows[i], answerText(i, ans));
+    });
+  }
+
+  function flashStrikes(count) {
+    el.giantX.textContent = "X".repeat(count);
+    el.giantX.classList.add("show");
+    clearTimeout(xTimer);
+    xTimer = setTimeout(function() { el.giantX.classList.remove("show"); }, 2200);
+  }
+
+  self.render = function(data) {
+    var q = data.question_shown ? data.current_question : null;
+    text("question", el.question, q ?
+         "Question " + data.current_question_index + " of " + data.total_questions + ": " + q.question : "");
+    renderAnswers(q ? q.answers : []);
+
+    [1, 2].forEach(function(t) {
+      text("name" + t, el["name" + t], data["team" + t + "_name"] + ":");
+      text("score" + t, el["score" + t], String(data["team" + t + "_score"]));
+      toggle("control" + t, el["team" + t], "in-control", data.current_control_team == t);
+    });
+
+    text("strikes", el.strikes, "Strikes: " + "X".repeat(data.strikes));
+    if (data.strikes > lastStrikes) {
+      flashStrikes(data.strikes);
+    }
+    lastStrikes = data.strikes;
+
+    text("winnerText", el.winnerText, data.winner ?
+         "Congratulations! " + data.winner.name + " wins with " + data.winner.points + " points!" : "");
+    toggle("winner", el.winner, "shown", !!data.winner);
+  };
+
+  var TIMER_LABELS = { answer: "Answer", steal: "Steal", fast_money: "Fast Money" };
+
+  // The server's 'timer' messages: a round clock started, ticked, ran out or stopped.
+  self.renderTimer = function(msg) {
+    var label = TIMER_LABELS[msg.kind] || msg.kind;
+    text("timer", el.timer, msg.running ? label + ": " + Math.ceil(msg.remaining) :
+                            msg.expired ? label + ": Time!" : "");
+    toggle("timerShown", el.timer, "shown", msg.running || msg.expired);
+    toggle("timerExpired", el.timer, "expired", msg.expired);
+  };
+}
@@ -0,0 +1,241 @@
+// Small Socket.IO client for the app's own server: Engine.IO v4, default
+// namespace only. It covers what the pages use (on, emit, acknowledgements
+// with timeout(), connected, reconnecting with backoff) without loading the
+// full client library from a CDN. The room goes into the URL too, so a
+// sharded deployment can route the socket to the room's worker.
+//
+// It connects over a WebSocket, or over HTTP long-polling where a proxy or
+// network does not let WebSockets through. Until one of the two has completed
+// a handshake, each attempt tries the other; after that it keeps to the one
+// that worked.
+function FeudSocket(room, path) {
+  var self = this;
+  var url = (path || "/socket.io/") + "?EIO=4&room=" + encodeURIComponent(room);
+  var handlers = {};
+  var acks = {};
+  var nextAck = 0;
+  var queue = [];
+  var transport = null;
+  var usePolling = false;
+  var settled = false;
+  var watchdog = null;
+  var pingDeadline = 45000;
+  var retryDelay = 500;
+  self.connected = false;
+
+  function fire(event, args) {
+    (handlers[event] || []).forEach(function(fn) {
+      fn.apply(self, args || []);
+    });
+  }
+
+  function send(packet) {
+    if (self.connected) {
+      transport.send("4" + packet);
+    } else {
+      queue.push(packet);  // sent once the namespace is connected
+    }
+  }
+
+  // The server pings every pingInterval; if nothing arrives for longer than
+  // that plus pingTimeout the connection is dead even if it looks open.
+  function expectPing() {
+    clearTimeout(watchdog);
+    var current = transport;
+    watchdog = setTimeout(function() { current.close(); }, pingDeadline);
+  }
+
+  function onSocketPacket(packet) {
+    var type = packet.charAt(0);
+    if (type === "0") {
+      self.connected = true;
+      retryDelay = 500;
+      var pending = queue;
+      queue = [];
+      pending.forEach(function(p) { transport.send("4" + p); });
+      fire("connect");
+    } else if (type === "2" || type === "3") {
+      var i = 1;
+      while (packet.charAt(i) >= "0" && packet.charAt(i) <= "9") {
+        i++;
+      }
+      var id = packet.slice(1, i);
+      var args = JSON.parse(packet.slice(i));
+      if (type === "2") {
+        fire(args[0], args.slice(1));
+      } else if (acks[id]) {
+        var ack = acks[id];
+        delete acks[id];
+        ack.apply(self, args);
+      }
+    } else if (type === "1" || type === "4") {
+      transport.close();  // disconnected or refused by the server: start over
+    }
+  }
+
+  // One Engine.IO packet, from either transport.
+  function onPacket(t, data) {
+    if (t !== transport) {
+      return;  // a late response for a connection already given up
+    }
+    var type = data.charAt(0);
+    if (type === "0") {
+      var handshake = JSON.parse(data.slice(1));
+      pingDeadline = handshake.pingInterval + handshake.pingTimeout;
+      settled = true;
+      expectPing();
+      t.send("40");
+    } else if (type === "2") {
+      expectPing();
+      t.send("3");
+    } else if (type === "4") {
+      onSocketPacket(data.slice(1));
+    } else if (type === "1") {
+      t.close();
+    }
+  }
+
+  function onClose(t, handshaken) {
+    if (t !== transport) {
+      return;
+    }
+    clearTimeout(watchdog);
+    var wasConnected = self.connected;
+    self.connected = false;
+    if (wasConnected) {
+      fire("disconnect");
+    }
+    if (!handshaken && !settled) {
+      usePolling = !usePolling;
+    }
+    setTimeout(open, retryDelay);
+    retryDelay = Math.min(retryDelay * 2, 10000);
+  }
+
+  function openWebSocket() {
+    var t = {};
+    var handshaken = false;
+    var ws = new WebSocket((location.protocol === "https:" ? "wss://" : "ws://") + location.host +
+                           url + "&transport=websocket");
+    t.send = function(data) { ws.send(data); };
+    t.close = function() { ws.close(); };
+    ws.onmessage = function(e) {
+      handshaken = handshaken || e.data.charAt(0) === "0";
+      onPacket(t, e.data);
+    };
+    ws.onclose = function() { onClose(t, handshaken); };
+    return t;
+  }
+
+  // Engine.IO over HTTP: a GET held open until the server has packets, and a
+  // POST for each batch sent. Packets in one body are separated by \x1e.
+  function openPolling() {
+    var t = {};
+    var sid = null;
+    var closed = false;
+    var outbox = [];
+    var posting = false;
+
+    function request(method, body) {
+      var target = url + "&transport=polling&t=" + Date.now().toString(36) +
+                   (sid ? "&sid=" + encodeURIComponent(sid) : "");
+      return fetch(target, {
+        method: method, body: body, cache: "no-store",
+        headers: body ? { "Content-Type": "text/plain;charset=UTF-8" } : {}
+      }).then(function(r) {
+        if (!r.ok) {
+          throw new Error("polling request failed: " + r.status);
+        }
+        return r.text();
+      });
+    }
+
+    function poll() {
+      request("GET").then(function(text) {
+        if (closed) {
+          return;
+        }
+        text.split("\x1e").forEach(function(data) {
+          if (!closed && data) {
+            if (data.charAt(0) === "0") {
+              sid = JSON.parse(data.slice(1)).sid;
+            }
+            onPacket(t, data);
+          }
+        });
+        if (!closed) {
+          poll();
+        }
+      }, t.close);
+    }
+
+    function flush() {
+      if (posting || closed || !sid || !outbox.length) {
+        return;
+      }
+      var body = outbox.join("\x1e");
+      outbox = [];
+      posting = true;
+      // The server takes one POST per session at a time.
+      request("POST", body).then(function() {
+        posting = false;
+        flush();
+      }, t.close);
+    }
+
+    t.send = function(data) {
+      outbox.push(data);
+      flush();
+    };
+    t.close = function() {
+      if (!closed) {
+        closed = true;
+        onClose(t, sid !== null);
+      }
+    };
+    poll();
+    return t;
+  }
+
+  function open() {
+    transport = usePolling ? openPolling() : openWebSocket();
+  }
+
+  self.on = function(event, fn) {
+    (handlers[event] = handlers[event] || []).push(fn);
+    return self;
+  };
+
+  self.emit = function(event, data, ack) {
+    var packet = "2";
+    if (ack) {
+      var id = nextAck++;
+      acks[id] = ack;
+      packet += id;
+    }
+    send(packet + JSON.stringify([event, data]));
+    return self;
+  };
+
+  // socket.timeout(ms).emit(event, data, function(err, result) {...}):
+  // err is set if no acknowledgement arrives in time.
+  self.timeout = function(ms) {
+    return {
+      emit: function(event, data, callback) {
+        var done = false;
+        var timer = setTimeout(function() {
+          done = true;
+          callback(new Error("operation has timed out"));
+        }, ms);
+        self.emit(event, data, function(result) {
+          if (!done) {
+            clearTimeout(timer);
+            callback(null, result);
+          }
+        });
+      }
+    };
+  };
+
+  open();
+}
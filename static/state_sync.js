@@ -0,0 +1,93 @@
+// Keeps a local copy of the room state in sync with the server's versioned
+// protocol: a full 'state_update' snapshot on join/resync, then 'state_patch'
+// messages carrying only the changed fields as dotted paths ("strikes",
+// "current_question.answers.3.revealed"). With options.spectator the client
+// joins the room's read-only spectator channel, which sends batched patches.
+function FeudStateSync(socket, room, onState, options) {
+  var self = this;
+  var spectator = !!(options && options.spectator);
+  self.version = -1;
+  self.state = null;
+
+  function applyChange(target, path, value) {
+    var keys = path.split(".");
+    for (var i = 0; i < keys.length - 1; i++) {
+      target = target[keys[i]];
+      if (target === null || typeof target !== "object") {
+        return false;
+      }
+    }
+    target[keys[keys.length - 1]] = value;
+    return true;
+  }
+
+  function resync() {
+    self.version = -1;
+    socket.emit('resync', { room: room, spectator: spectator });
+  }
+
+  socket.on('state_update', function(msg) {
+    self.version = msg.version;
+    self.state = msg.state;
+    onState(self.state, null);
+  });
+
+  socket.on('state_patch', function(msg) {
+    if (self.state === null || msg.version <= self.version) {
+      return;  // waiting for a snapshot, or a stale duplicate
+    }
+    if (msg.base !== self.version) {
+      resync();
+      return;
+    }
+    for (var path in msg.changes) {
+      if (!applyChange(self.state, path, msg.changes[path])) {
+        resync();
+        return;
+      }
+    }
+    self.version = msg.version;
+    onState(self.state, msg.changes);
+  });
+
+  socket.on('connect', function() {
+    // (Re)joining always yields a fresh snapshot, covering reconnects.
+    socket.emit('join', { room: room, spectator: spectator });
+  });
+}
+
+// Stands in for a Socket.IO socket on top of the /api/spectate Server-Sent
+// Events stream, for spectators that don't need a Socket.IO session. Each
+// (re)connect starts with a snapshot, so a resync simply reconnects.
+function FeudEventSource(url) {
+  var self = this;
+  var handlers = {};
+  var source = null;
+
+  function listen(event) {
+    source.addEventListener(event, function(e) {
+      var fn = handlers[event];
+      if (fn) {
+        fn(event === 'open' ? undefined : JSON.parse(e.data));
+      }
+    });
+  }
+
+  function open() {
+    if (source) {
+      source.close();
+    }
+    source = new EventSource(url);
+    ['open', 'state_update', 'state_patch', 'timer'].forEach(listen);
+  }
+
+  self.on = function(event, fn) {
+    handlers[event === 'connect' ? 'open' : event] = fn;
+  };
+  self.emit = function(event) {
+    if (event === 'resync') {
+      open();
+    }
+  };
+  open();
+}
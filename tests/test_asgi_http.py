@@ -0,0 +1,88 @@
+"""asgi_app under uvicorn: HTTP requests keep being served while spectator streams are open."""
+import os
+import sys
+import time
+import socket
+import subprocess
+import http.client
+
+import pytest
+
+pytest.importorskip('uvicorn')
+pytest.importorskip('asgiref')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def server():
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'asgi_app:application', '--port', str(port),
+                             '--log-level', 'warning'], cwd=ROOT, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                get(port, '/api/rooms/stats')
+                break
+            except OSError:
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise RuntimeError("uvicorn did not start")
+                time.sleep(0.2)
+        yield port
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def get(port, path, timeout=5):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def open_stream(port, room):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    conn.request('GET', f'/api/spectate?room={room}')
+    response = conn.getresponse()
+    assert response.status == 200
+    assert response.readline() == b'event: state_update\n'
+    return conn
+
+
+def test_state_answers_while_stream_open(server):
+    streams = [open_stream(server, 'sse') for _ in range(3)]
+    try:
+        t0 = time.monotonic()
+        status, body = get(server, '/api/state?room=sse')
+        assert status == 200
+        assert b'"strikes"' in body
+        assert time.monotonic() - t0 < 2
+    finally:
+        for conn in streams:
+            conn.close()
+
+
+def test_streams_are_not_limited_by_http_workers(server):
+    # More streams than FEUD_HTTP_WORKERS threads; none of them holds a thread.
+    streams = [open_stream(server, f'many{i}') for i in range(40)]
+    try:
+        status, _ = get(server, '/api/state?room=many0')
+        assert status == 200
+    finally:
+        for conn in streams:
+            conn.close()
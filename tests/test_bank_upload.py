@@ -0,0 +1,80 @@
+"""POST /api/banks when the parse outlasts the request: the bank is hidden until it has loaded."""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import offload
+import game_actions
+import question_bank
+from bank_store import BankStore
+from question_bank import EXCEL_REQUIRED_COLUMNS
+
+GOOD_CSV = ",".join(EXCEL_REQUIRED_COLUMNS) + "\n1,Name a fruit,Apple,40" + "," * 18 + "\n"
+BAD_CSV = "not,a,question,bank\n1,2,3,4\n"
+TOKEN = 'secret'
+
+
+@pytest.fixture
+def upload(tmp_path, monkeypatch):
+    """Posts a file whose parse waits for ``release``; the request gives up on it at once."""
+    import app
+    offload.shutdown()
+    monkeypatch.setattr(offload, 'POOL_SIZE', 0)
+    monkeypatch.setattr(offload, 'DEFAULT_TIMEOUT', 0.05)
+    question_bank.clear_question_banks()
+    store = BankStore(str(tmp_path), app.MAX_UPLOAD_BYTES)
+    monkeypatch.setattr(app, 'bank_store', store)
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', TOKEN)
+    monkeypatch.setattr(game_actions, '_bank_resolver', store.path_for)
+    release = threading.Event()
+    loaded = threading.Event()
+    read_bank = question_bank._read_bank
+
+    def slow_read_bank(path):
+        release.wait(5)
+        return read_bank(path)
+    monkeypatch.setattr(question_bank, '_read_bank', slow_read_bank)
+    finish = app.finish_deferred_upload
+
+    def finished(*args):
+        finish(*args)
+        loaded.set()
+    monkeypatch.setattr(app, 'finish_deferred_upload', finished)
+    client = app.app.test_client()
+
+    def post(body):
+        return client.post('/api/banks?filename=bank.csv', data=body.encode('utf-8'),
+                           headers={'Authorization': f'Bearer {TOKEN}'})
+    post.store, post.release, post.loaded = store, release, loaded
+    yield post
+    release.set()
+    offload.shutdown()
+    question_bank.clear_question_banks()
+
+
+def test_bank_is_listed_only_once_it_has_loaded(upload):
+    response = upload(GOOD_CSV)
+    assert response.status_code == 202
+    bank_id = response.get_json()['id']
+    assert upload.store.list() == []
+    assert game_actions.resolve_bank(bank_id) is None
+    upload.release.set()
+    assert upload.loaded.wait(5)
+    [meta] = upload.store.list()
+    assert meta['id'] == bank_id and meta['questions'] == 1 and 'loading' not in meta
+    assert game_actions.resolve_bank(bank_id) == upload.store.path_for(bank_id)
+
+
+def test_bank_that_fails_to_load_later_is_removed(upload):
+    response = upload(BAD_CSV)
+    assert response.status_code == 202
+    bank_id = response.get_json()['id']
+    upload.release.set()
+    assert upload.loaded.wait(5)
+    assert upload.store.list() == []
+    assert upload.store.describe(bank_id) is None
+    assert os.listdir(upload.store.directory) == []
@@ -0,0 +1,121 @@
+"""GameLog: undo/redo, rebasing, recovery from disk and histories that no longer replay."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_log import GameLog
+from game_state import GameState
+
+
+def scores(t1, t2=0):
+    return {'team1_score': t1, 'team2_score': t2}
+
+
+def play(log, state, *points, room='r'):
+    for t1 in points:
+        assert log.perform(room, state, 'update_scores', scores(t1)).ok
+
+
+@pytest.fixture
+def log():
+    return GameLog(GameState.from_dict)
+
+
+def test_undo_and_redo_walk_the_history(log):
+    state = GameState()
+    play(log, state, 1, 2, 3)
+    assert log.undo('r', state).ok and state.team1_score == 2
+    assert log.undo('r', state).ok and state.team1_score == 1
+    assert log.redo('r', state).ok and state.team1_score == 2
+    # A new action drops whatever was left to redo.
+    play(log, state, 7)
+    assert not log.redo('r', state).ok
+    assert log.undo('r', state).ok and state.team1_score == 2
+
+
+def test_nothing_to_undo_or_redo(log):
+    state = GameState()
+    assert not log.undo('r', state).ok
+    play(log, state, 1)
+    assert not log.redo('r', state).ok
+    # A replaced state has no history of its own yet.
+    assert not log.undo('r', GameState()).ok
+
+
+def test_actions_that_change_nothing_are_not_recorded(log):
+    state = GameState()
+    play(log, state, 1)
+    assert not log.perform('r', state, 'update_scores', scores('x')).ok
+    assert log.histories['r'].done == [('update_scores', scores(1))]
+
+
+def test_rebase_keeps_only_undo_depth_actions():
+    log = GameLog(GameState.from_dict, snapshot_every=4, undo_depth=2)
+    state = GameState()
+    play(log, state, 1, 2, 3, 4)
+    history = log.histories['r']
+    assert [p['team1_score'] for _, p in history.done] == [3, 4]
+    assert history.base['team1_score'] == 2
+    assert log.undo('r', state).ok and state.team1_score == 3
+    assert log.undo('r', state).ok and state.team1_score == 2
+    assert not log.undo('r', state).ok
+
+
+def test_recover_rebuilds_the_room_from_snapshot_and_log(tmp_path):
+    log = GameLog(GameState.from_dict, log_dir=str(tmp_path), snapshot_every=3)
+    state = GameState()
+    play(log, state, 1, 2, 3, 4, 5)
+    assert log.undo('r', state).ok
+    log.flush()
+
+    restarted = GameLog(GameState.from_dict, log_dir=str(tmp_path), snapshot_every=3)
+    recovered = restarted.recover('r')
+    assert recovered.team1_score == 4
+    assert restarted.redo('r', recovered).ok and recovered.team1_score == 5
+    assert restarted.recover('never-played') is None
+
+
+def test_recover_ignores_a_torn_final_line(tmp_path):
+    log = GameLog(GameState.from_dict, log_dir=str(tmp_path))
+    state = GameState()
+    play(log, state, 1, 2)
+    log.flush()
+    log_path, _ = log._paths('r')
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write('[3,"act')
+    assert GameLog(GameState.from_dict, log_dir=str(tmp_path)).recover('r').team1_score == 2
+
+
+def test_undo_that_no_longer_replays_leaves_the_room_alone(log):
+    state = GameState()
+    play(log, state, 1, 2)
+    history = log.histories['r']
+    history.done.insert(0, ('reveal', {'index': 99}))
+    revision = state.revision
+    result = log.undo('r', state)
+    assert not result.ok and 'reveal' in result.error
+    assert state.team1_score == 2 and state.revision == revision
+    assert len(history.done) == 3 and history.undone == []
+
+
+def test_redo_that_no_longer_applies_leaves_the_room_alone(log):
+    state = GameState()
+    play(log, state, 1, 2)
+    assert log.undo('r', state).ok
+    log.histories['r'].undone[-1] = ('reveal', {'index': 99})
+    assert not log.redo('r', state).ok
+    assert state.team1_score == 1
+
+
+def test_recover_returns_none_when_the_history_no_longer_replays(tmp_path):
+    log = GameLog(GameState.from_dict, log_dir=str(tmp_path))
+    state = GameState()
+    play(log, state, 1)
+    history = log.histories['r']
+    history.done.insert(0, ('reveal', {'index': 99}))
+    log._queue_snapshot('r', history)
+    log.flush()
+    assert GameLog(GameState.from_dict, log_dir=str(tmp_path)).recover('r') is None
@@ -0,0 +1,70 @@
+"""question_bank.get_question_bank with a source file that does not parse."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import offload
+import question_bank
+from question_bank import EMPTY_BANK, EXCEL_REQUIRED_COLUMNS, get_question_bank
+
+GOOD_CSV = ",".join(EXCEL_REQUIRED_COLUMNS) + "\n1,Name a fruit,Apple,40" + "," * 18 + "\n"
+
+
+@pytest.fixture(autouse=True)
+def thread_pool(monkeypatch):
+    # One background thread instead of spawned processes, so submissions can be counted.
+    offload.shutdown()
+    monkeypatch.setattr(offload, 'POOL_SIZE', 0)
+    # Importing app (other tests do) starts the watcher, which stops these calls checking mtimes.
+    monkeypatch.setattr(question_bank, '_watcher', None)
+    question_bank.clear_question_banks()
+    yield
+    offload.shutdown()
+    question_bank.clear_question_banks()
+
+
+def count_loads(monkeypatch):
+    calls = []
+    submit = offload.submit
+
+    def counting_submit(fn, *args):
+        calls.append(args)
+        return submit(fn, *args)
+    monkeypatch.setattr(offload, 'submit', counting_submit)
+    return calls
+
+
+def test_bad_file_returns_empty_bank_and_is_not_parsed_again(tmp_path, monkeypatch):
+    path = tmp_path / 'bad.csv'
+    path.write_text("not,a,question,bank\n1,2,3,4\n")
+    calls = count_loads(monkeypatch)
+    assert get_question_bank(str(path)) is EMPTY_BANK
+    assert get_question_bank(str(path)) is EMPTY_BANK
+    assert len(calls) == 1
+
+
+def test_bad_version_keeps_previous_bank(tmp_path, monkeypatch):
+    path = tmp_path / 'bank.csv'
+    path.write_text(GOOD_CSV)
+    good = get_question_bank(str(path))
+    assert len(good) == 1
+    path.write_text("broken\n")
+    os.utime(path, (good.mtime + 5, good.mtime + 5))
+    assert get_question_bank(str(path)) is good
+    # Fixing the file loads it again.
+    path.write_text(GOOD_CSV.replace('Apple', 'Pear'))
+    os.utime(path, (good.mtime + 10, good.mtime + 10))
+    assert get_question_bank(str(path))[0].texts == ('Pear',)
+
+
+def test_restoring_a_room_with_a_bad_bank(tmp_path):
+    from game_state import GameState
+    path = tmp_path / 'bad.csv'
+    path.write_text("broken\n")
+    state = GameState.from_dict({'question_file': str(path), 'chosen_indices': [0],
+                                 'current_question_index': 0})
+    assert len(state.question_bank) == 0
+    assert state.current_question is None
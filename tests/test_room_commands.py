@@ -0,0 +1,136 @@
+"""RoomCommands: per-room ordering, idempotency keys and forget."""
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from room_commands import RoomCommands
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def queued(commands, room):
+    with commands.lock:
+        return len(commands.queues.get(room, ()))
+
+
+def start(fn):
+    thread = threading.Thread(target=fn)
+    thread.start()
+    return thread
+
+
+def test_commands_in_one_room_run_one_at_a_time_in_order():
+    commands = RoomCommands()
+    release = threading.Event()
+    order = []
+    running = []
+    overlapped = []
+
+    def command(i):
+        def run():
+            if running:
+                overlapped.append(i)
+            running.append(i)
+            if i == 0:
+                release.wait(5)
+            order.append(i)
+            running.remove(i)
+            return i
+        return run
+
+    threads = [start(lambda: commands.run('r', command(0)))]
+    wait_for(lambda: queued(commands, 'r') == 1)
+    for i in range(1, 6):
+        threads.append(start(lambda i=i: commands.run('r', command(i))))
+        wait_for(lambda i=i: queued(commands, 'r') == i + 1)
+    assert order == []
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert order == [0, 1, 2, 3, 4, 5]
+    assert overlapped == []
+    assert commands.queues == {}
+
+
+def test_other_rooms_do_not_wait():
+    commands = RoomCommands()
+    release = threading.Event()
+    blocked = start(lambda: commands.run('a', lambda: release.wait(5)))
+    wait_for(lambda: queued(commands, 'a') == 1)
+    assert commands.run('b', lambda: 'done') == 'done'
+    release.set()
+    blocked.join(5)
+
+
+def test_replayed_key_returns_the_first_result():
+    commands = RoomCommands()
+    calls = []
+
+    def strike():
+        calls.append('strike')
+        return len(calls)
+
+    assert commands.run('r', strike, key='k1') == 1
+    assert commands.run('r', strike, key='k1') == 1
+    assert calls == ['strike']
+    # The same key in another room is a different attempt.
+    assert commands.run('other', strike, key='k1') == 2
+
+
+def test_duplicate_waiting_behind_the_first_attempt_is_not_run():
+    commands = RoomCommands()
+    release = threading.Event()
+    calls = []
+
+    def strike():
+        calls.append('strike')
+        release.wait(5)
+        return 'first'
+
+    results = []
+    first = start(lambda: results.append(commands.run('r', strike, key='k')))
+    wait_for(lambda: queued(commands, 'r') == 1)
+    second = start(lambda: results.append(commands.run('r', strike, key='k')))
+    wait_for(lambda: queued(commands, 'r') == 2)
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert results == ['first', 'first']
+    assert calls == ['strike']
+
+
+def test_failed_command_releases_the_room_and_is_not_remembered():
+    commands = RoomCommands()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    try:
+        commands.run('r', fail, key='k')
+    except RuntimeError:
+        pass
+    assert commands.run('r', lambda: 'retried', key='k') == 'retried'
+
+
+def test_forget_drops_the_rooms_keys():
+    commands = RoomCommands()
+    commands.run('r', lambda: 'old', key='k')
+    commands.run('other', lambda: 'kept', key='k')
+    commands.forget('r')
+    assert commands.run('r', lambda: 'new', key='k') == 'new'
+    assert commands.run('other', lambda: 'not run', key='k') == 'kept'
+
+
+def test_keys_expire():
+    commands = RoomCommands(key_ttl=0.05)
+    commands.run('r', lambda: 'old', key='k')
+    time.sleep(0.1)
+    assert commands.run('r', lambda: 'new', key='k') == 'new'
@@ -0,0 +1,54 @@
+"""RoomManager.release for a room moving to another worker."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from room_manager import RoomManager, RoomMoved
+from room_store import MemoryRoomStore
+
+
+class Room:
+    revision = 0
+
+    def __init__(self, score=0):
+        self.score = score
+
+    def to_dict(self):
+        return {'score': self.score}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['score'])
+
+
+@pytest.fixture
+def manager():
+    return RoomManager(MemoryRoomStore(), Room.from_dict, Room)
+
+
+def test_moved_room_is_not_recreated(manager):
+    manager.get('r').score = 7
+    state, _ = manager.release('r', moving=True)
+    assert state.score == 7
+    with pytest.raises(RoomMoved):
+        manager.get('r')
+    assert manager.stats()['live'] == 0
+    manager.clear_moved('r')
+    assert manager.get('r').score == 0
+
+
+def test_adopting_a_moved_room_back(manager):
+    manager.get('r').score = 3
+    state, version = manager.release('r', moving=True)
+    # The import on the new worker failed and the router hands the room back.
+    manager.adopt('r', state, version)
+    assert manager.get('r').score == 3
+
+
+def test_plain_release_does_not_block_the_room(manager):
+    manager.get('r')
+    manager.release('r')
+    assert manager.get('r').score == 0
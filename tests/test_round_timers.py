@@ -0,0 +1,120 @@
+"""RoomTimers on a simulated clock, alone and wired into the app's rooms."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timing_wheel import TimingWheel
+from round_timers import RoomTimers
+
+TICK = 0.05
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Run:
+    """A wheel on a fake clock, turned a tick at a time."""
+
+    def __init__(self):
+        self.clock = FakeClock()
+        self.wheel = TimingWheel(tick=TICK, clock=self.clock)
+        self.ticks = 0
+
+    def seconds(self, seconds):
+        for _ in range(int(round(seconds / TICK))):
+            self.ticks += 1
+            self.clock.now = self.ticks * TICK
+            self.wheel.advance()
+
+
+def payloads(sent):
+    return [pkt.data[1] for _, pkt in sent]
+
+
+def test_counts_down_once_per_step_then_expires():
+    run = Run()
+    sent, expired = [], []
+    timers = RoomTimers(run.wheel, lambda room, pkt: sent.append((room, pkt)),
+                        lambda room, clock: expired.append((room, clock)), {'answer': 3})
+    msg = timers.start('r', 'answer')
+    run.seconds(3.5)
+    assert [m['remaining'] for m in payloads(sent)] == [3, 2, 1, 0]
+    assert payloads(sent)[-1]['expired'] is True
+    assert len(expired) == 1 and timers.is_current('r', expired[0][1])
+    assert msg['running'] is True and timers.running_count() == 0
+
+
+def test_restart_replaces_the_running_clock():
+    run = Run()
+    sent, expired = [], []
+    timers = RoomTimers(run.wheel, lambda room, pkt: sent.append(pkt),
+                        lambda room, clock: expired.append(clock), {'answer': 2})
+    timers.start('r', 'answer')
+    run.seconds(1.5)
+    timers.start('r', 'answer', 5)
+    run.seconds(3)
+    assert expired == []
+    run.seconds(2.5)
+    assert len(expired) == 1 and expired[0].duration == 5
+
+
+@pytest.mark.parametrize('seconds', ['inf', '-inf', 'nan', '-5', 'soon'])
+def test_rejects_bad_durations(seconds):
+    timers = RoomTimers(Run().wheel, lambda room, pkt: None, lambda room, clock: None, {'answer': 20})
+    with pytest.raises(ValueError):
+        timers.start('r', 'answer', seconds)
+    assert timers.current('r') is None
+
+
+@pytest.fixture(scope='module')
+def app_module():
+    import app
+    app.get_question_bank(app.DEFAULT_QUESTIONS_FILE)
+    return app
+
+
+@pytest.fixture
+def game(app_module, monkeypatch):
+    """A room in play with its clocks on a fake wheel; expiries run inline."""
+    run = Run()
+    timers = RoomTimers(run.wheel, app_module.send_timer, app_module.expire_timer,
+                        dict(app_module.TIMER_DURATIONS, answer=5, steal=3))
+    monkeypatch.setattr(app_module, 'room_timers', timers)
+    room = f'timers-{id(run)}'
+    for name, params in (('setup_round', {'questions': ['0', '1', '2', '3'], 'team1': 'A', 'team2': 'B'}),
+                         ('start', {}), ('show_question', {}),
+                         ('faceoff', {'faceoff_winner': '1', 'playpass': 'play'})):
+        assert app_module.perform_action(room, name, params).ok, name
+    yield run, timers, room
+    app_module.room_manager.evict(room)
+
+
+def test_answer_clock_running_out_is_a_strike_and_restarts(app_module, game):
+    run, timers, room = game
+    assert app_module.perform_action(room, 'start_timer', {'kind': 'answer'}).ok
+    run.seconds(5.1)
+    state = app_module.get_game_state_for_room(room)
+    assert state.team_in_play_strikes == 1
+    clock = timers.current(room)
+    assert clock.kind == 'answer' and not clock.expired
+    run.seconds(10.1)
+    assert state.team_in_play_strikes == 3
+    # The third strike hands the other team the steal clock.
+    assert state.is_steal_attempt and timers.current(room).kind == 'steal'
+    run.seconds(3.1)
+    assert not state.is_steal_attempt and timers.current(room) is None
+
+
+def test_start_timer_action_rejects_infinite_seconds(app_module, game):
+    _, timers, room = game
+    result = app_module.perform_action(room, 'start_timer', {'kind': 'answer', 'seconds': 'inf'})
+    assert not result.ok
+    assert timers.current(room) is None
@@ -0,0 +1,83 @@
+"""TimingWheel on a simulated clock: timers on every level fire on time, cancelled ones never do."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timing_wheel import TimingWheel
+
+TICK = 0.05
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_until(wheel, clock, seconds):
+    # One tick at a time, as the server's loop does.
+    for i in range(1, int(round(seconds / TICK)) + 1):
+        clock.now = i * TICK
+        wheel.advance()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def wheel(clock):
+    # 8 slots: level 0 spans 0.4 s, level 1 3.2 s, level 2 25.6 s.
+    return TimingWheel(tick=TICK, slots=8, levels=3, clock=clock)
+
+
+@pytest.mark.parametrize('delay', [0.05, 0.3, 0.4, 1.0, 3.2, 3.25, 10.0, 25.55])
+def test_fires_on_its_tick_from_any_level(wheel, clock, delay):
+    fired = []
+    wheel.schedule(delay, lambda: fired.append(clock.now))
+    run_until(wheel, clock, 26)
+    assert len(fired) == 1
+    assert delay - 1e-9 <= fired[0] <= delay + TICK + 1e-9
+    assert wheel.count == 0
+
+
+def test_cascades_after_the_wheel_has_turned(wheel, clock):
+    # Scheduled part way through a turn, so the timer's bucket is not aligned to the start.
+    run_until(wheel, clock, 1.35)
+    fired = []
+    wheel.schedule(7.0, lambda: fired.append(clock.now))
+    for i in range(28, int(round(9 / TICK)) + 1):
+        clock.now = i * TICK
+        wheel.advance()
+    assert fired == [pytest.approx(8.35)]
+
+
+def test_cancelled_timer_is_dropped_during_cascade(wheel, clock):
+    fired = []
+    timer = wheel.schedule(10.0, fired.append, 'cancelled')
+    wheel.schedule(10.0, fired.append, 'kept')
+    timer.cancel()
+    run_until(wheel, clock, 11)
+    assert fired == ['kept']
+    assert wheel.count == 0
+
+
+def test_timers_fire_in_due_order(wheel, clock):
+    fired = []
+    for delay in (5.0, 0.2, 3.3, 1.0, 20.0):
+        wheel.schedule(delay, fired.append, delay)
+    run_until(wheel, clock, 21)
+    assert fired == [0.2, 1.0, 3.3, 5.0, 20.0]
+
+
+def test_rejects_delays_it_cannot_hold(wheel):
+    with pytest.raises(ValueError):
+        wheel.schedule(float('inf'), print)
+    with pytest.raises(ValueError):
+        wheel.schedule(26.0, print)  # beyond the top level's span